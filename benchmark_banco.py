@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Benchmark de commits por segundo do banco de dados
+
+Compara o registro de vendas (um commit por venda) em três cenários:
+1. Conexão nova por operação com os padrões do SQLite (comportamento antigo)
+2. Pool de conexões com o perfil 'compatibilidade' (journal de rollback, synchronous=FULL)
+3. Pool de conexões com o perfil 'desempenho' (WAL, synchronous=NORMAL)
+
+Uso:
+    python benchmark_banco.py [numero_de_vendas]
+"""
+
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from src.estoque.database import DatabaseManager
+
+
+def medir_conexao_por_operacao(db_path, vendas):
+    """Simula o comportamento antigo: sqlite3.connect + commit a cada venda"""
+    gerenciador = DatabaseManager(db_path, perfil='compatibilidade', intervalo_checkpoint=None)
+    gerenciador.fechar()
+
+    query = """INSERT INTO historico_vendas
+               (produto, quantidade, preco_unitario, valor_total, data_hora, vendedor, observacoes)
+               VALUES (?, ?, ?, ?, ?, ?, ?)"""
+    inicio = time.perf_counter()
+    for i in range(vendas):
+        data_hora = datetime.now().strftime("%d/%m/%Y %H:%M:%S")
+        with sqlite3.connect(db_path) as conn:
+            conn.execute(query, (f"Produto {i % 20}", 1, 9.9, 9.9, data_hora, '', ''))
+            conn.commit()
+    return time.perf_counter() - inicio
+
+
+def medir_perfil(db_path, vendas, perfil):
+    """Registra vendas pelo DatabaseManager usando o perfil informado"""
+    gerenciador = DatabaseManager(db_path, perfil=perfil, intervalo_checkpoint=None)
+    try:
+        inicio = time.perf_counter()
+        for i in range(vendas):
+            gerenciador.registrar_venda(f"Produto {i % 20}", 1, 9.9)
+        return time.perf_counter() - inicio
+    finally:
+        gerenciador.fechar()
+
+
+def main():
+    vendas = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+
+    cenarios = [
+        ("conexão por operação (antigo)", lambda caminho: medir_conexao_por_operacao(caminho, vendas)),
+        ("pool + perfil compatibilidade", lambda caminho: medir_perfil(caminho, vendas, 'compatibilidade')),
+        ("pool + perfil desempenho (WAL)", lambda caminho: medir_perfil(caminho, vendas, 'desempenho')),
+    ]
+
+    print(f"📊 Benchmark de commits: {vendas} vendas por cenário\n")
+    print(f"{'Cenário':<34} {'Tempo (s)':>10} {'Commits/s':>12}")
+    print("-" * 58)
+
+    for nome, medir in cenarios:
+        pasta = tempfile.mkdtemp()
+        try:
+            duracao = medir(os.path.join(pasta, "benchmark.db"))
+            print(f"{nome:<34} {duracao:>10.3f} {vendas / duracao:>12.1f}")
+        finally:
+            shutil.rmtree(pasta, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
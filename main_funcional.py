@@ -12,6 +12,10 @@ import sqlite3
 from datetime import datetime, timedelta
 import subprocess
 
+from src.estoque.database import DatabaseManager as BancoDeDados
+from src.estoque.database import EstoqueInsuficienteError, ProdutoNaoEncontradoError
+from src.utils.helpers import LeitorCodigoBarras, aguardar_no_tk
+
 def verificar_dependencias():
     """Verificar se as dependências essenciais estão disponíveis"""
     try:
@@ -31,149 +35,46 @@ def centralizar_janela(janela):
     pos_y = (janela.winfo_screenheight() // 2) - (height // 2)
     janela.geometry(f"{width}x{height}+{pos_x}+{pos_y}")
 
-class DatabaseManager:
-    """Gerenciador de banco de dados simplificado"""
+def confirmar_baixa_estoque(janela, operacao):
+    """Executar uma venda com baixa de estoque, perguntando antes de deixar o estoque negativo"""
+    try:
+        return operacao(False)
+    except EstoqueInsuficienteError as e:
+        if not messagebox.askyesno(
+            "Estoque insuficiente",
+            f"Estoque insuficiente de {e.produto}!\n"
+            f"Disponível: {e.disponivel}\nSolicitado: {e.solicitado}\n\n"
+            f"Deseja continuar mesmo assim?",
+            parent=janela
+        ):
+            return None
+        return operacao(True)
+
+class DatabaseManager(BancoDeDados):
+    """Gerenciador de banco de dados da versão funcional (mesmo esquema de src/)"""
     
     def __init__(self):
-        self.db_path = "data/banco.db"
-        self.criar_estrutura()
-    
-    def criar_estrutura(self):
-        """Criar estrutura do banco"""
-        os.makedirs("data", exist_ok=True)
-        
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            
-            # Tabela de estoque
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS estoque (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    produto TEXT NOT NULL,
-                    quantidade INTEGER NOT NULL DEFAULT 0,
-                    preco REAL NOT NULL DEFAULT 0.0,
-                    categoria TEXT DEFAULT 'Geral',
-                    data_cadastro TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            """)
-            
-            # Tabela de vendas
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS historico_vendas (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    produto TEXT NOT NULL,
-                    quantidade INTEGER NOT NULL,
-                    preco_unitario REAL NOT NULL,
-                    total REAL NOT NULL,
-                    data_venda TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            """)
-            
-            # Verificar e corrigir estrutura da tabela
-            cursor.execute("PRAGMA table_info(historico_vendas)")
-            columns = [column[1] for column in cursor.fetchall()]
-            
-            # Se não tem data_venda, recriar tabela
-            if 'data_venda' not in columns and columns:
-                print("🔧 Corrigindo estrutura da tabela historico_vendas...")
-                cursor.execute("DROP TABLE IF EXISTS historico_vendas_old")
-                cursor.execute("ALTER TABLE historico_vendas RENAME TO historico_vendas_old")
-                
-                # Recriar com estrutura correta
-                cursor.execute("""
-                    CREATE TABLE historico_vendas (
-                        id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        produto TEXT NOT NULL,
-                        quantidade INTEGER NOT NULL,
-                        preco_unitario REAL NOT NULL,
-                        total REAL NOT NULL,
-                        data_venda TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                    )
-                """)
-                
-                # Migrar dados se existirem
-                try:
-                    cursor.execute("""
-                        INSERT INTO historico_vendas (produto, quantidade, preco_unitario, total)
-                        SELECT produto, quantidade, 
-                               COALESCE(preco_unitario, 0.0),
-                               COALESCE(total, quantidade * COALESCE(preco_unitario, 0.0))
-                        FROM historico_vendas_old
-                    """)
-                    cursor.execute("DROP TABLE historico_vendas_old")
-                    print("✓ Dados migrados com sucesso")
-                except:
-                    print("ℹ️ Tabela criada limpa")
-            
-            # Verificar se coluna total existe
-            elif 'total' not in columns:
-                cursor.execute("ALTER TABLE historico_vendas ADD COLUMN total REAL DEFAULT 0.0")
-                print("✓ Coluna 'total' adicionada à tabela historico_vendas")
-            
-            # Tabela de contas em aberto (crediário)
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS contas_abertas (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    cliente_nome TEXT NOT NULL,
-                    cliente_telefone TEXT,
-                    produto TEXT NOT NULL,
-                    quantidade INTEGER NOT NULL,
-                    preco_unitario REAL NOT NULL,
-                    total REAL NOT NULL,
-                    data_venda TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    data_vencimento DATE,
-                    pago BOOLEAN DEFAULT FALSE,
-                    data_pagamento TIMESTAMP,
-                    observacoes TEXT
-                )
-            """)
-            
-            # Tabela de caixa
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS caixa (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    data_abertura TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    data_fechamento TIMESTAMP,
-                    valor_inicial REAL NOT NULL,
-                    valor_vendas REAL DEFAULT 0.0,
-                    valor_sangria REAL DEFAULT 0.0,
-                    valor_reforco REAL DEFAULT 0.0,
-                    valor_final REAL DEFAULT 0.0,
-                    funcionario TEXT NOT NULL,
-                    status TEXT DEFAULT 'ABERTO',
-                    observacoes TEXT
-                )
-            """)
-            
-            # Tabela de movimentações do caixa
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS movimentacoes_caixa (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    caixa_id INTEGER,
-                    tipo TEXT NOT NULL,
-                    valor REAL NOT NULL,
-                    descricao TEXT,
-                    data_hora TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    funcionario TEXT NOT NULL,
-                    FOREIGN KEY (caixa_id) REFERENCES caixa (id)
-                )
-            """)
-            
-            # Tabela de backups
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS backups (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    nome_arquivo TEXT NOT NULL,
-                    caminho_arquivo TEXT NOT NULL,
-                    data_backup TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    tamanho_mb REAL,
-                    tipo TEXT NOT NULL,
-                    status TEXT DEFAULT 'CONCLUIDO'
-                )
-            """)
-            
-            conn.commit()
-            print("✓ Banco de dados configurado")
+        # As migrações do esquema rodam uma única vez em BancoDeDados.__init__
+        super().__init__("data/banco.db")
+    
+    def registrar_contas_lote(self, cliente, telefone, itens, data_vencimento, observacoes,
+                              permitir_estoque_negativo=False):
+        """Baixar o estoque e registrar o carrinho fiado em contas_abertas atomicamente"""
+        data_atual = datetime.now().strftime("%d/%m/%Y %H:%M:%S")
+        with self._escrita(imediata=True) as conn:
+            for item in itens:
+                self._baixar_estoque(conn, item['produto'], item['quantidade'],
+                                     permitir_estoque_negativo, data_atual)
+            conn.executemany("""
+                INSERT INTO contas_abertas 
+                (cliente_nome, cliente_telefone, produto, quantidade, preco_unitario, total,
+                 data_vencimento, observacoes, produto_id)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, (SELECT id FROM estoque WHERE produto = ?))
+            """, [(cliente, telefone, item['produto'], item['quantidade'],
+                   item['preco_unitario'], item['total'], data_vencimento, observacoes, item['produto'])
+                  for item in itens])
+            ultimo_id = conn.execute("SELECT last_insert_rowid()").fetchone()[0]
+        return list(range(ultimo_id - len(itens) + 1, ultimo_id + 1))
 
 class MainWindow:
     """Janela principal do sistema"""
@@ -659,17 +560,16 @@ class ConfigWindow:
                 cursor.execute("SELECT COUNT(*) FROM estoque")
                 total_produtos = cursor.fetchone()[0]
                 
-                # Contar vendas
-                cursor.execute("SELECT COUNT(*) FROM historico_vendas")
-                total_vendas = cursor.fetchone()[0]
+                # Vendas e receita de todo o período: o agregado de tamanho
+                # fixo também soma os meses arquivados
+                cursor.execute("SELECT SUM(num_vendas), SUM(receita) FROM vendas_semana_hora")
+                total_vendas, receita_total = cursor.fetchone()
+                total_vendas = total_vendas or 0
+                receita_total = receita_total or 0
                 
                 # Valor total do estoque
                 cursor.execute("SELECT SUM(quantidade * preco) FROM estoque")
                 valor_estoque = cursor.fetchone()[0] or 0
-                
-                # Receita total
-                cursor.execute("SELECT SUM(total) FROM historico_vendas")
-                receita_total = cursor.fetchone()[0] or 0
             
             # Mostrar estatísticas
             ttk.Label(parent, text=f"Produtos cadastrados: {total_produtos}").pack(anchor="w", pady=2)
@@ -1050,6 +950,9 @@ class VendasWindow:
         
         # Configurar atalhos APÓS criar interface
         self.configurar_atalhos()
+        
+        # Scanner de código de barras: a leitura vai direto para o carrinho
+        self.leitor = LeitorCodigoBarras(self.window, self.adicionar_por_codigo)
     
     def configurar_atalhos(self):
         """Configurar atalhos de teclado para facilitar o uso"""
@@ -1160,6 +1063,7 @@ Ctrl+2     - Finalizar fiado
 • Digite quantidade → total calcula sozinho
 • Use Enter para adicionar rapidamente
 • Use F2/F3 para finalizar sem usar mouse
+• Leitor de código de barras: leia o produto e ele entra no carrinho
 
 👥 ACESSIBILIDADE:
 • Textos grandes e contrastados
@@ -1269,6 +1173,10 @@ Ctrl+2     - Finalizar fiado
         instrucoes.grid(row=6, column=0, columnspan=2, pady=(15, 0))
         instrucoes.bind("<Button-1>", self.mostrar_ajuda)
         
+        # Resultado da última leitura do scanner
+        self.scanner_label = ttk.Label(left_panel, text="", font=("Arial", 11, "bold"))
+        self.scanner_label.grid(row=7, column=0, columnspan=2, pady=(10, 0))
+        
         left_panel.columnconfigure(0, weight=1)
         
         # Binding para cálculos
@@ -1374,18 +1282,16 @@ Ctrl+2     - Finalizar fiado
     def carregar_produtos(self):
         """Carregar produtos do estoque"""
         try:
-            with sqlite3.connect(self.db.db_path) as conn:
-                cursor = conn.cursor()
-                cursor.execute("SELECT produto, preco FROM estoque ORDER BY produto")
-                produtos = cursor.fetchall()
-                
-                # Adicionar produtos ao combobox
-                produtos_lista = [f"{produto} - R$ {preco:.2f}" for produto, preco in produtos]
-                self.produto_combo['values'] = produtos_lista
+            # Textos do combobox montados uma vez por versão do catálogo em memória
+            produtos_lista = self.db.catalogo.derivado(
+                'rotulos_caixa',
+                lambda produtos: [f"{produto} - R$ {preco:.2f}" for _, produto, preco in produtos]
+            )
+            self.produto_combo['values'] = produtos_lista
+            
+            if not produtos_lista:
+                self.produto_combo['values'] = ["Nenhum produto cadastrado"]
                 
-                if not produtos_lista:
-                    self.produto_combo['values'] = ["Nenhum produto cadastrado"]
-                    
         except Exception as e:
             messagebox.showerror("Erro", f"Erro ao carregar produtos: {e}")
     
@@ -1422,18 +1328,9 @@ Ctrl+2     - Finalizar fiado
                 return
             
             produto_nome = produto_info.split(" - R$ ")[0]
-            total_item = quantidade * preco
             
             # Adicionar ao carrinho
-            self.carrinho.append({
-                'produto': produto_nome,
-                'quantidade': quantidade,
-                'preco_unitario': preco,
-                'total': total_item
-            })
-            
-            # Atualizar interface
-            self.atualizar_carrinho()
+            self.adicionar_ao_carrinho(produto_nome, quantidade, preco)
             
             # Limpar campos e focar no próximo produto
             self.limpar_campos_rapido()
@@ -1452,6 +1349,51 @@ Ctrl+2     - Finalizar fiado
         except Exception as e:
             messagebox.showerror("Erro", f"Erro ao adicionar produto: {e}")
     
+    def adicionar_por_codigo(self, codigo):
+        """Adicionar ao carrinho o produto lido pelo scanner (1 unidade, preço do cadastro)"""
+        encontrado = self.db.catalogo.por_codigo_barras(codigo)
+        if encontrado is None:
+            # Sem caixa de diálogo: o operador segue lendo os próximos itens
+            self.window.bell()
+            self.scanner_label.config(text=f"❌ Código {codigo} não cadastrado", foreground="red")
+            return
+        
+        _, produto, preco = encontrado
+        self.adicionar_ao_carrinho(produto, 1, preco)
+        self.scanner_label.config(text=f"✅ {produto} adicionado (código {codigo})", foreground="green")
+    
+    def adicionar_ao_carrinho(self, produto, quantidade, preco):
+        """Adicionar item ao carrinho alterando só a linha afetada da tabela"""
+        # Mesmo produto e preço: soma na linha existente (leituras repetidas do scanner)
+        for indice in range(len(self.carrinho) - 1, -1, -1):
+            item = self.carrinho[indice]
+            if item['produto'] == produto and item['preco_unitario'] == preco:
+                item['quantidade'] += quantidade
+                item['total'] = item['quantidade'] * preco
+                linha = self.carrinho_tree.get_children()[indice]
+                self.carrinho_tree.item(linha, values=self._valores_item(item))
+                break
+        else:
+            item = {
+                'produto': produto,
+                'quantidade': quantidade,
+                'preco_unitario': preco,
+                'total': quantidade * preco
+            }
+            self.carrinho.append(item)
+            self.carrinho_tree.insert("", "end", values=self._valores_item(item))
+        
+        self.atualizar_totais()
+    
+    def _valores_item(self, item):
+        """Colunas de um item na tabela do carrinho"""
+        return (
+            item['produto'],
+            item['quantidade'],
+            f"R$ {item['preco_unitario']:.2f}",
+            f"R$ {item['total']:.2f}"
+        )
+    
     def atualizar_carrinho(self):
         """Atualizar exibição do carrinho"""
         # Limpar treeview
@@ -1459,17 +1401,14 @@ Ctrl+2     - Finalizar fiado
             self.carrinho_tree.delete(item)
         
         # Adicionar itens
-        self.total_geral = 0.0
         for item in self.carrinho:
-            self.carrinho_tree.insert("", "end", values=(
-                item['produto'],
-                item['quantidade'],
-                f"R$ {item['preco_unitario']:.2f}",
-                f"R$ {item['total']:.2f}"
-            ))
-            self.total_geral += item['total']
-        
-        # Atualizar total geral e contador
+            self.carrinho_tree.insert("", "end", values=self._valores_item(item))
+        
+        self.atualizar_totais()
+    
+    def atualizar_totais(self):
+        """Atualizar total geral e contador de itens"""
+        self.total_geral = sum(item['total'] for item in self.carrinho)
         self.total_geral_label.config(text=f"R$ {self.total_geral:.2f}")
         
         # Atualizar contador de itens
@@ -1523,15 +1462,13 @@ Ctrl+2     - Finalizar fiado
                              f"Total: R$ {self.total_geral:.2f}"):
             
             try:
-                # Registrar todas as vendas
-                with sqlite3.connect(self.db.db_path) as conn:
-                    cursor = conn.cursor()
-                    for item in self.carrinho:
-                        cursor.execute("""
-                            INSERT INTO historico_vendas (produto, quantidade, preco_unitario, total)
-                            VALUES (?, ?, ?, ?)
-                        """, (item['produto'], item['quantidade'], item['preco_unitario'], item['total']))
-                    conn.commit()
+                # Baixar estoque e registrar todas as vendas em uma única transação
+                ids = confirmar_baixa_estoque(
+                    self.window,
+                    lambda permitir: self.db.vender_lote(self.carrinho, permitir_estoque_negativo=permitir)
+                )
+                if ids is None:
+                    return
                 
                 # Tocar som de sucesso
                 try:
@@ -1663,17 +1600,15 @@ class VendaFiadoCarrinhoWindow:
             data_venc = self.data_vencimento_var.get().strip()
             observacoes = self.observacoes_var.get().strip()
             
-            # Registrar na tabela de contas abertas
-            with sqlite3.connect(self.db.db_path) as conn:
-                cursor = conn.cursor()
-                for item in self.carrinho:
-                    cursor.execute("""
-                        INSERT INTO contas_abertas 
-                        (cliente_nome, cliente_telefone, produto, quantidade, preco_unitario, total, data_vencimento, observacoes)
-                        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-                    """, (self.cliente, telefone, item['produto'], item['quantidade'], 
-                          item['preco_unitario'], item['total'], data_venc, observacoes))
-                conn.commit()
+            # Baixar estoque e registrar em contas abertas em uma única transação
+            ids = confirmar_baixa_estoque(
+                self.window,
+                lambda permitir: self.db.registrar_contas_lote(
+                    self.cliente, telefone, self.carrinho, data_venc, observacoes, permitir
+                )
+            )
+            if ids is None:
+                return
             
             # Som de confirmação fiado
             try:
@@ -1820,15 +1755,17 @@ class VendaFiadoWindow:
             # Extrair nome do produto
             produto = self.produto_selecionado.split(" - R$")[0]
             
-            # Registrar no banco
-            with sqlite3.connect(self.db.db_path) as conn:
-                cursor = conn.cursor()
-                cursor.execute("""
-                    INSERT INTO contas_abertas 
-                    (cliente_nome, cliente_telefone, produto, quantidade, preco_unitario, total, data_vencimento, observacoes)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-                """, (cliente_nome, cliente_telefone, produto, self.quantidade, self.preco, self.total, data_vencimento, observacoes))
-                conn.commit()
+            # Baixar estoque e registrar em contas abertas como no fiado do carrinho
+            item = {'produto': produto, 'quantidade': self.quantidade,
+                    'preco_unitario': self.preco, 'total': self.total}
+            ids = confirmar_baixa_estoque(
+                self.window,
+                lambda permitir: self.db.registrar_contas_lote(
+                    cliente_nome, cliente_telefone, [item], data_vencimento, observacoes, permitir
+                )
+            )
+            if ids is None:
+                return
             
             messagebox.showinfo("Sucesso", f"Venda fiado registrada com sucesso!\n\n"
                                          f"Cliente: {cliente_nome}\n"
@@ -1838,6 +1775,8 @@ class VendaFiadoWindow:
             
             self.window.destroy()
             
+        except ProdutoNaoEncontradoError as e:
+            messagebox.showerror("Erro", f"Produto '{e.produto}' não encontrado no estoque!")
         except Exception as e:
             messagebox.showerror("Erro", f"Erro ao registrar venda fiado: {e}")
 
@@ -1933,79 +1872,86 @@ class ContasAbertasWindow:
     
     def carregar_contas(self):
         """Carregar contas em aberto"""
+        filtro = self.filtro_var.get()
+        
+        # Nome atual do produto; contas de produto sem cadastro mostram o nome gravado
+        colunas = """c.id, c.cliente_nome, c.cliente_telefone, COALESCE(e.produto, c.produto),
+                     c.quantidade, c.preco_unitario, c.total, c.data_venda, c.data_vencimento,
+                     c.pago, c.data_pagamento, c.observacoes"""
+        origem = "contas_abertas c LEFT JOIN estoque e ON e.id = c.produto_id"
+        if filtro == "pendentes":
+            query = f"SELECT {colunas} FROM {origem} WHERE c.pago = 0 ORDER BY c.data_venda DESC"
+        elif filtro == "pagas":
+            query = f"SELECT {colunas} FROM {origem} WHERE c.pago = 1 ORDER BY c.data_pagamento DESC"
+        else:
+            query = f"SELECT {colunas} FROM {origem} ORDER BY c.pago ASC, c.data_venda DESC"
+        
+        # Consulta em thread de trabalho; a lista é preenchida quando o resultado chegar
+        self.stats_label.config(text="Carregando contas...")
+        futuro = self.db.assincrono.execute_query(query)
+        aguardar_no_tk(self.window, futuro, self._exibir_contas,
+                       lambda e: messagebox.showerror("Erro", f"Erro ao carregar contas: {e}"))
+    
+    def _exibir_contas(self, contas):
+        """Preencher a lista com as contas já carregadas"""
         # Limpar lista
         for item in self.contas_tree.get_children():
             self.contas_tree.delete(item)
-        
+
         try:
-            filtro = self.filtro_var.get()
-            
-            with sqlite3.connect(self.db.db_path) as conn:
-                cursor = conn.cursor()
-                
-                if filtro == "pendentes":
-                    query = "SELECT * FROM contas_abertas WHERE pago = 0 ORDER BY data_venda DESC"
-                elif filtro == "pagas":
-                    query = "SELECT * FROM contas_abertas WHERE pago = 1 ORDER BY data_pagamento DESC"
+            total_pendente = 0
+            total_pago = 0
+            count_pendente = 0
+            count_pago = 0
+
+            for conta in contas:
+                id_conta, cliente_nome, cliente_telefone, produto, quantidade, preco_unitario, total, data_venda, data_vencimento, pago, data_pagamento, observacoes = conta
+
+                # Formatar datas
+                try:
+                    data_venda_fmt = datetime.fromisoformat(data_venda).strftime("%d/%m/%Y")
+                except:
+                    data_venda_fmt = data_venda[:10] if data_venda else ""
+
+                data_venc_fmt = data_vencimento if data_vencimento else ""
+                status = "✅ PAGO" if pago else "⏰ PENDENTE"
+
+                # Estatísticas
+                if pago:
+                    total_pago += total
+                    count_pago += 1
                 else:
-                    query = "SELECT * FROM contas_abertas ORDER BY pago ASC, data_venda DESC"
-                
-                cursor.execute(query)
-                contas = cursor.fetchall()
-                
-                total_pendente = 0
-                total_pago = 0
-                count_pendente = 0
-                count_pago = 0
-                
-                for conta in contas:
-                    id_conta, cliente_nome, cliente_telefone, produto, quantidade, preco_unitario, total, data_venda, data_vencimento, pago, data_pagamento, observacoes = conta
-                    
-                    # Formatar datas
+                    total_pendente += total
+                    count_pendente += 1
+
+                # Inserir na árvore
+                item = self.contas_tree.insert("", "end", iid=id_conta, values=(
+                    cliente_nome,
+                    cliente_telefone or "",
+                    produto,
+                    quantidade,
+                    f"R$ {total:.2f}",
+                    data_venda_fmt,
+                    data_venc_fmt,
+                    status
+                ))
+
+                # Colorir linha se vencida
+                if not pago and data_vencimento:
                     try:
-                        data_venda_fmt = datetime.fromisoformat(data_venda).strftime("%d/%m/%Y")
+                        venc_date = datetime.strptime(data_vencimento, "%d/%m/%Y")
+                        if venc_date < datetime.now():
+                            self.contas_tree.set(item, "status", "🔴 VENCIDO")
                     except:
-                        data_venda_fmt = data_venda[:10] if data_venda else ""
-                    
-                    data_venc_fmt = data_vencimento if data_vencimento else ""
-                    status = "✅ PAGO" if pago else "⏰ PENDENTE"
-                    
-                    # Estatísticas
-                    if pago:
-                        total_pago += total
-                        count_pago += 1
-                    else:
-                        total_pendente += total
-                        count_pendente += 1
-                    
-                    # Inserir na árvore
-                    item = self.contas_tree.insert("", "end", values=(
-                        cliente_nome,
-                        cliente_telefone or "",
-                        produto,
-                        quantidade,
-                        f"R$ {total:.2f}",
-                        data_venda_fmt,
-                        data_venc_fmt,
-                        status
-                    ))
-                    
-                    # Colorir linha se vencida
-                    if not pago and data_vencimento:
-                        try:
-                            venc_date = datetime.strptime(data_vencimento, "%d/%m/%Y")
-                            if venc_date < datetime.now():
-                                self.contas_tree.set(item, "status", "🔴 VENCIDO")
-                        except:
-                            pass
-                
-                # Atualizar estatísticas
-                stats_text = f"Pendentes: {count_pendente} (R$ {total_pendente:.2f}) | Pagas: {count_pago} (R$ {total_pago:.2f})"
-                self.stats_label.config(text=stats_text)
-                
+                        pass
+
+            # Atualizar estatísticas
+            stats_text = f"Pendentes: {count_pendente} (R$ {total_pendente:.2f}) | Pagas: {count_pago} (R$ {total_pago:.2f})"
+            self.stats_label.config(text=stats_text)
+
         except Exception as e:
             messagebox.showerror("Erro", f"Erro ao carregar contas: {e}")
-    
+
     def marcar_como_pago(self):
         """Marcar conta selecionada como paga"""
         selection = self.contas_tree.selection()
@@ -2013,7 +1959,9 @@ class ContasAbertasWindow:
             messagebox.showerror("Erro", "Selecione uma conta para marcar como paga")
             return
         
-        item = self.contas_tree.item(selection[0])
+        # O iid da linha é o id da conta: o nome exibido do produto pode ter mudado
+        id_conta = selection[0]
+        item = self.contas_tree.item(id_conta)
         values = item['values']
         cliente = values[0]
         produto = values[2]
@@ -2025,14 +1973,15 @@ class ContasAbertasWindow:
         
         if messagebox.askyesno("Confirmar Pagamento", f"Marcar como paga?\n\nCliente: {cliente}\nProduto: {produto}\nValor: {total}"):
             try:
-                with sqlite3.connect(self.db.db_path) as conn:
-                    cursor = conn.cursor()
-                    cursor.execute("""
-                        UPDATE contas_abertas 
-                        SET pago = 1, data_pagamento = CURRENT_TIMESTAMP 
-                        WHERE cliente_nome = ? AND produto = ? AND total = ? AND pago = 0
-                    """, (cliente, produto, float(total.replace("R$ ", ""))))
-                    conn.commit()
+                alteradas = self.db.execute_update("""
+                    UPDATE contas_abertas 
+                    SET pago = 1, data_pagamento = CURRENT_TIMESTAMP 
+                    WHERE id = ? AND pago = 0
+                """, (int(id_conta),))
+                if alteradas == 0:
+                    messagebox.showerror("Erro", "Conta não encontrada ou já paga. Atualize a lista.")
+                    self.carregar_contas()
+                    return
                 
                 messagebox.showinfo("Sucesso", f"Conta de {cliente} marcada como paga!")
                 self.carregar_contas()
@@ -2062,8 +2011,10 @@ class ContasAbertasWindow:
                     cursor = conn.cursor()
                     cursor.execute("""
                         DELETE FROM contas_abertas 
-                        WHERE cliente_nome = ? AND produto = ?
-                    """, (cliente, produto))
+                        WHERE cliente_nome = ?
+                          AND (produto_id = (SELECT id FROM estoque WHERE produto = ?)
+                               OR (produto_id IS NULL AND produto = ?))
+                    """, (cliente, produto, produto))
                     conn.commit()
                 
                 messagebox.showinfo("Sucesso", "Conta excluída com sucesso!")
@@ -2232,7 +2183,7 @@ class CaixaWindow:
                 cursor = conn.cursor()
                 
                 # Vendas do dia
-                cursor.execute("SELECT SUM(total) FROM historico_vendas WHERE DATE(data_venda) = DATE('now')")
+                cursor.execute("SELECT SUM(valor_total) FROM historico_vendas WHERE data_iso >= DATE('now', 'localtime') AND data_iso < DATE('now', 'localtime', '+1 day')")
                 vendas_dia = cursor.fetchone()[0] or 0
                 
                 # Movimentações
@@ -2287,7 +2238,7 @@ VALOR TEÓRICO EM CAIXA: R$ {valor_teorico:.2f}"""
                     cursor.execute("""
                         SELECT tipo, valor, descricao, data_hora, funcionario 
                         FROM movimentacoes_caixa 
-                        WHERE DATE(data_hora) = DATE('now')
+                        WHERE data_hora >= DATE('now') AND data_hora < DATE('now', '+1 day')
                         ORDER BY data_hora DESC
                     """)
                 
@@ -2319,7 +2270,7 @@ VALOR TEÓRICO EM CAIXA: R$ {valor_teorico:.2f}"""
                 cursor = conn.cursor()
                 
                 # Vendas do dia
-                cursor.execute("SELECT COUNT(*), SUM(total) FROM historico_vendas WHERE DATE(data_venda) = DATE('now')")
+                cursor.execute("SELECT COUNT(*), SUM(valor_total) FROM historico_vendas WHERE data_iso >= DATE('now', 'localtime') AND data_iso < DATE('now', 'localtime', '+1 day')")
                 count_vendas, total_vendas = cursor.fetchone()
                 count_vendas = count_vendas or 0
                 total_vendas = total_vendas or 0
@@ -2597,7 +2548,7 @@ class FecharCaixaDialog:
                 cursor = conn.cursor()
                 
                 # Vendas do dia
-                cursor.execute("SELECT COUNT(*), SUM(total) FROM historico_vendas WHERE DATE(data_venda) = DATE('now')")
+                cursor.execute("SELECT COUNT(*), SUM(valor_total) FROM historico_vendas WHERE data_iso >= DATE('now', 'localtime') AND data_iso < DATE('now', 'localtime', '+1 day')")
                 count_vendas, total_vendas = cursor.fetchone()
                 count_vendas = count_vendas or 0
                 total_vendas = total_vendas or 0
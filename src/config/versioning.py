@@ -6,11 +6,12 @@ import os
 import json
 import requests
 from datetime import datetime
-from src.estoque.database import DatabaseManager
+from src.estoque.database import obter_banco
+from src.estoque.migracoes import aplicar_migracoes, versao_banco
 
 class VersionManager:
-    def __init__(self):
-        self.db = DatabaseManager()
+    def __init__(self, db=None):
+        self.db = db or obter_banco()
         self.versao_atual = "1.0.0"
         self.config_file = "data/config.json"
         
@@ -92,60 +93,23 @@ class VersionManager:
         except Exception:
             return False
             
-    def migrar_banco(self, versao_origem, versao_destino):
-        """Executa migrações do banco de dados"""
-        migrações = {
-            "1.0.0_to_1.1.0": self._migrar_1_0_0_para_1_1_0,
-            "1.1.0_to_1.2.0": self._migrar_1_1_0_para_1_2_0,
-        }
-        
-        chave_migracao = f"{versao_origem}_to_{versao_destino}"
-        if chave_migracao in migrações:
-            try:
-                migrações[chave_migracao]()
-                return True
-            except Exception as e:
-                print(f"Erro na migração: {e}")
-                return False
-        return True
-        
-    def _migrar_1_0_0_para_1_1_0(self):
-        """Migração da versão 1.0.0 para 1.1.0"""
-        # Adicionar colunas de preço se não existirem
-        with self.db.get_connection() as conn:
-            cursor = conn.cursor()
-            
-            # Verificar se coluna preco existe na tabela estoque
-            cursor.execute("PRAGMA table_info(estoque)")
-            colunas = [col[1] for col in cursor.fetchall()]
-            
-            if 'preco' not in colunas:
-                cursor.execute("ALTER TABLE estoque ADD COLUMN preco REAL DEFAULT 0.0")
-                cursor.execute("ALTER TABLE estoque ADD COLUMN categoria TEXT DEFAULT 'Geral'")
-                cursor.execute("ALTER TABLE estoque ADD COLUMN codigo_barras TEXT DEFAULT ''")
-                cursor.execute("ALTER TABLE estoque ADD COLUMN data_cadastro TEXT DEFAULT ''")
-                cursor.execute("ALTER TABLE estoque ADD COLUMN data_atualizacao TEXT DEFAULT ''")
-                
-            # Verificar se colunas financeiras existem no histórico
-            cursor.execute("PRAGMA table_info(historico_vendas)")
-            colunas = [col[1] for col in cursor.fetchall()]
+    def obter_versao_esquema(self):
+        """Obtém a versão do esquema do banco (PRAGMA user_version)"""
+        with self.db.pool.leitura() as conn:
+            return versao_banco(conn)
             
-            if 'preco_unitario' not in colunas:
-                cursor.execute("ALTER TABLE historico_vendas ADD COLUMN preco_unitario REAL DEFAULT 0.0")
-                cursor.execute("ALTER TABLE historico_vendas ADD COLUMN valor_total REAL DEFAULT 0.0")
-                cursor.execute("ALTER TABLE historico_vendas ADD COLUMN vendedor TEXT DEFAULT ''")
-                cursor.execute("ALTER TABLE historico_vendas ADD COLUMN observacoes TEXT DEFAULT ''")
-                
-            conn.commit()
-            
-    def _migrar_1_1_0_para_1_2_0(self):
-        """Migração da versão 1.1.0 para 1.2.0"""
-        # Futuras migrações
-        pass
+    def migrar_banco(self):
+        """Aplica as migrações de esquema pendentes; retorna True se o banco ficou na versão atual"""
+        try:
+            aplicar_migracoes(self.db.pool)
+            return True
+        except Exception as e:
+            print(f"Erro na migração: {e}")
+            return False
 
 class UpdateChecker:
-    def __init__(self):
-        self.version_manager = VersionManager()
+    def __init__(self, version_manager=None):
+        self.version_manager = version_manager or VersionManager()
         
     def verificar_ao_iniciar(self):
         """Verifica atualizações na inicialização do sistema"""
@@ -3,7 +3,12 @@ Módulo de controle de estoque
 Contém a lógica de banco de dados e controle de produtos
 """
 
-from .database import DatabaseManager
+from .database import (DashboardSnapshot, DatabaseManager, EstoqueInsuficienteError, ProdutoNaoEncontradoError,
+                       obter_banco)
 from .controller import EstoqueController
+from .pool import ConnectionPool
+from .assincrono import BancoAssincrono
+from .perfis import PERFIS_DESEMPENHO
 
-__all__ = ['DatabaseManager', 'EstoqueController']
+__all__ = ['DatabaseManager', 'obter_banco', 'EstoqueController', 'ConnectionPool', 'BancoAssincrono', 'PERFIS_DESEMPENHO',
+           'EstoqueInsuficienteError', 'ProdutoNaoEncontradoError', 'DashboardSnapshot']
@@ -0,0 +1,162 @@
+"""
+Tabelas de agregados mantidas por triggers sobre historico_vendas
+"""
+
+
+# produto_id de uma venda: id do produto no estoque, ou 0 para vendas de
+# produtos que não estão (ou não estão mais) cadastrados.
+_SQL_PRODUTO_ID = "COALESCE({linha}.produto_id, 0)"
+
+_SQL_DIA = "SUBSTR({linha}.data_iso, 1, 10)"
+_SQL_HORA = "CAST(SUBSTR({linha}.data_iso, 12, 2) AS INTEGER)"
+# 0 = segunda ... 6 = domingo (mesma convenção de date.weekday())
+_SQL_DIA_SEMANA = "(CAST(STRFTIME('%w', {linha}.data_iso) AS INTEGER) + 6) % 7"
+
+# tabela -> colunas de chave (além de produto_id) e a expressão que as calcula
+AGREGADOS = {
+    # Receita/quantidade por dia: períodos, tendências e resumo mensal
+    'vendas_diarias': [
+        ('dia', 'TEXT', _SQL_DIA),
+    ],
+    # Dia x hora: cubo de horários filtrado por janela de datas
+    'vendas_hora': [
+        ('dia', 'TEXT', _SQL_DIA),
+        ('hora', 'INTEGER', _SQL_HORA),
+    ],
+    # Cubo 7x24 de todo o período: tamanho fixo, independe do histórico
+    'vendas_semana_hora': [
+        ('dia_semana', 'INTEGER', _SQL_DIA_SEMANA),
+        ('hora', 'INTEGER', _SQL_HORA),
+    ],
+}
+
+
+def _somar_venda(tabela, linha, sinal):
+    """SQL que soma (sinal='+') ou subtrai (sinal='-') a venda NEW/OLD do agregado"""
+    chave = AGREGADOS[tabela]
+    nomes = [nome for nome, _, _ in chave] + ['produto_id']
+    valores = [expressao.format(linha=linha) for _, _, expressao in chave]
+    valores.append(_SQL_PRODUTO_ID.format(linha=linha))
+
+    if sinal == '+':
+        return f"""
+            INSERT INTO {tabela} ({', '.join(nomes)}, quantidade, receita, num_vendas)
+            SELECT {', '.join(valores)}, {linha}.quantidade, COALESCE({linha}.valor_total, 0), 1
+            WHERE {linha}.data_iso IS NOT NULL
+            ON CONFLICT ({', '.join(nomes)}) DO UPDATE SET
+                quantidade = quantidade + excluded.quantidade,
+                receita = receita + excluded.receita,
+                num_vendas = num_vendas + 1;
+        """
+
+    filtro = " AND ".join(f"{nome} = {valor}" for nome, valor in zip(nomes, valores))
+    return f"""
+        UPDATE {tabela} SET
+            quantidade = quantidade - {linha}.quantidade,
+            receita = receita - COALESCE({linha}.valor_total, 0),
+            num_vendas = num_vendas - 1
+        WHERE {linha}.data_iso IS NOT NULL AND {filtro};
+        DELETE FROM {tabela}
+        WHERE {linha}.data_iso IS NOT NULL AND {filtro} AND num_vendas <= 0;
+    """
+
+
+def criar_agregados(cursor):
+    """
+    Cria as tabelas de agregados e seus triggers.
+
+    Retorna a lista de tabelas recém-criadas (que precisam de backfill).
+    """
+    colunas = {coluna[1] for coluna in cursor.execute("PRAGMA table_info(historico_vendas)")}
+    if not {'data_iso', 'produto_id'} <= colunas:
+        return []
+
+    novas = []
+    for tabela, chave in AGREGADOS.items():
+        existe = cursor.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (tabela,)
+        ).fetchone()
+        if not existe:
+            novas.append(tabela)
+
+        colunas_chave = "".join(f"{nome} {tipo} NOT NULL, " for nome, tipo, _ in chave)
+        nomes_chave = ", ".join(nome for nome, _, _ in chave)
+        cursor.execute(f'''
+            CREATE TABLE IF NOT EXISTS {tabela} (
+                {colunas_chave}
+                produto_id INTEGER NOT NULL,
+                quantidade INTEGER NOT NULL DEFAULT 0,
+                receita REAL NOT NULL DEFAULT 0.0,
+                num_vendas INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY ({nomes_chave}, produto_id)
+            ) WITHOUT ROWID
+        ''')
+
+        # Triggers sempre recriados para acompanhar mudanças na definição
+        for evento in ('insert', 'update', 'delete'):
+            cursor.execute(f"DROP TRIGGER IF EXISTS trg_{tabela}_{evento}")
+        cursor.execute(f'''
+            CREATE TRIGGER trg_{tabela}_insert
+            AFTER INSERT ON historico_vendas
+            BEGIN
+                {_somar_venda(tabela, 'NEW', '+')}
+            END
+        ''')
+        # Também cobre o preenchimento de data_iso/produto_id feito por outros triggers
+        cursor.execute(f'''
+            CREATE TRIGGER trg_{tabela}_update
+            AFTER UPDATE OF produto_id, quantidade, valor_total, data_iso ON historico_vendas
+            BEGIN
+                {_somar_venda(tabela, 'OLD', '-')}
+                {_somar_venda(tabela, 'NEW', '+')}
+            END
+        ''')
+        cursor.execute(f'''
+            CREATE TRIGGER trg_{tabela}_delete
+            AFTER DELETE ON historico_vendas
+            BEGIN
+                {_somar_venda(tabela, 'OLD', '-')}
+            END
+        ''')
+    return novas
+
+
+def sql_agrupar_vendas(tabela, origem='historico_vendas'):
+    """SELECT que agrupa as vendas de origem nas colunas do agregado (chave, quantidade, receita, num_vendas)"""
+    chave = AGREGADOS[tabela]
+    valores = [expressao.format(linha=origem) for _, _, expressao in chave]
+    valores.append(_SQL_PRODUTO_ID.format(linha=origem))
+    posicoes = ", ".join(str(i + 1) for i in range(len(valores)))
+    return f'''
+        SELECT {', '.join(valores)}, SUM(quantidade), SUM(COALESCE(valor_total, 0)), COUNT(*)
+        FROM {origem}
+        WHERE data_iso IS NOT NULL
+        GROUP BY {posicoes}
+    '''
+
+
+def _colunas_agregado(tabela):
+    """Colunas do agregado na ordem de sql_agrupar_vendas"""
+    return [nome for nome, _, _ in AGREGADOS[tabela]] + ['produto_id', 'quantidade', 'receita', 'num_vendas']
+
+
+def reconstruir_agregado(cursor, tabela):
+    """Recalcula um agregado inteiro a partir de historico_vendas"""
+    cursor.execute(f"DELETE FROM {tabela}")
+    cursor.execute(f'''
+        INSERT INTO {tabela} ({', '.join(_colunas_agregado(tabela))})
+        {sql_agrupar_vendas(tabela)}
+    ''')
+
+
+def somar_ao_agregado(cursor, tabela, linhas):
+    """Acrescenta linhas já agrupadas (ex.: de arquivos de meses fechados) ao agregado"""
+    colunas = _colunas_agregado(tabela)
+    chave = colunas[:-3]
+    cursor.executemany(f'''
+        INSERT INTO {tabela} ({', '.join(colunas)}) VALUES ({', '.join('?' * len(colunas))})
+        ON CONFLICT ({', '.join(chave)}) DO UPDATE SET
+            quantidade = quantidade + excluded.quantidade,
+            receita = receita + excluded.receita,
+            num_vendas = num_vendas + excluded.num_vendas
+    ''', linhas)
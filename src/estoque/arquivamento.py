@@ -0,0 +1,198 @@
+"""
+Arquivamento do histórico de vendas em bancos por mês (data/arquivo/vendas_AAAA_MM.db)
+"""
+
+import glob
+import os
+import re
+import sqlite3
+from contextlib import closing, contextmanager
+from datetime import date
+from urllib.request import pathname2url
+
+from .agregados import AGREGADOS, criar_agregados, sql_agrupar_vendas
+
+
+DIRETORIO_ARQUIVO = "arquivo"
+
+# Configurações (tabela configuracoes): meses mantidos em historico_vendas e
+# se a janela principal arquiva os meses fechados ao abrir ('1' liga; o
+# padrão é não arquivar, já que os totais por produto leem só os meses ativos)
+CONFIG_MESES_ATIVOS = 'meses_historico_ativo'
+CONFIG_ARQUIVAMENTO_AUTOMATICO = 'arquivamento_automatico'
+
+# Meses que permanecem em historico_vendas (o atual e os anteriores) quando
+# a configuração CONFIG_MESES_ATIVOS não está definida
+MESES_ATIVOS_PADRAO = 12
+
+# Limite padrão do SQLite para bancos anexados a uma conexão (SQLITE_MAX_ATTACHED)
+MAX_ARQUIVOS_ANEXADOS = 10
+
+COLUNAS_HISTORICO = ('id', 'produto', 'quantidade', 'preco_unitario', 'valor_total',
+                     'data_hora', 'vendedor', 'observacoes', 'data_iso', 'produto_id')
+
+# Mesmas colunas de historico_vendas, sem a FK para estoque (que fica no banco principal)
+_SQL_CRIAR_ARQUIVO = """
+    CREATE TABLE IF NOT EXISTS {esquema}.historico_vendas (
+        id INTEGER PRIMARY KEY,
+        produto TEXT NOT NULL,
+        quantidade INTEGER NOT NULL,
+        preco_unitario REAL DEFAULT 0.0,
+        valor_total REAL DEFAULT 0.0,
+        data_hora TEXT NOT NULL,
+        vendedor TEXT DEFAULT '',
+        observacoes TEXT DEFAULT '',
+        data_iso TEXT,
+        produto_id INTEGER
+    )
+"""
+
+_PADRAO_ARQUIVO = re.compile(r"vendas_(\d{4})_(\d{2})\.db$")
+
+
+def diretorio_arquivo(db_path):
+    """Pasta dos arquivos mensais, ao lado do banco principal"""
+    return os.path.join(os.path.dirname(os.path.abspath(db_path)), DIRETORIO_ARQUIVO)
+
+
+def caminho_arquivo(db_path, ano, mes):
+    """Caminho do arquivo de um mês"""
+    return os.path.join(diretorio_arquivo(db_path), f"vendas_{ano:04d}_{mes:02d}.db")
+
+
+def listar_arquivos(db_path):
+    """Arquivos existentes como [(ano, mes, caminho)], do mês mais antigo ao mais recente"""
+    arquivos = []
+    for caminho in glob.glob(os.path.join(diretorio_arquivo(db_path), "vendas_*.db")):
+        encontrado = _PADRAO_ARQUIVO.search(caminho)
+        if encontrado:
+            arquivos.append((int(encontrado.group(1)), int(encontrado.group(2)), caminho))
+    return sorted(arquivos)
+
+
+def _intervalo_mes(ano, mes):
+    """Intervalo [inicio, fim) do mês em data_iso"""
+    proximo_ano, proximo_mes = (ano + 1, 1) if mes == 12 else (ano, mes + 1)
+    return f"{ano:04d}-{mes:02d}-01", f"{proximo_ano:04d}-{proximo_mes:02d}-01"
+
+
+def inicio_periodo_ativo(manter_meses, hoje=None):
+    """Primeiro dia (data_iso) do período que fica no banco principal"""
+    hoje = hoje or date.today()
+    indice = hoje.year * 12 + hoje.month - 1 - (max(manter_meses, 1) - 1)
+    return f"{indice // 12:04d}-{indice % 12 + 1:02d}-01"
+
+
+@contextmanager
+def anexar(conn, caminho, esquema="arquivo"):
+    """ATTACH do arquivo durante o bloco (a conexão não pode estar em transação)"""
+    conn.execute(f"ATTACH DATABASE ? AS {esquema}", (caminho,))
+    try:
+        yield esquema
+    finally:
+        conn.execute(f"DETACH DATABASE {esquema}")
+
+
+def arquivar_mes(pool, ano, mes):
+    """
+    Move as vendas de um mês de historico_vendas para o arquivo do mês.
+
+    São duas transações: a primeira copia as vendas (INSERT OR IGNORE pelo
+    id) e a segunda apaga do banco principal apenas o que já está no
+    arquivo. Uma queda entre as duas deixa as vendas nos dois lugares, e a
+    próxima execução termina o serviço; nenhuma venda se perde. Os
+    agregados (vendas_diarias...) continuam contando as vendas arquivadas.
+    Retorna o número de vendas movidas.
+    """
+    inicio, fim = _intervalo_mes(ano, mes)
+    caminho = caminho_arquivo(pool.db_path, ano, mes)
+    os.makedirs(os.path.dirname(caminho), exist_ok=True)
+    colunas = ", ".join(COLUNAS_HISTORICO)
+
+    with pool.escrita() as conn:
+        if conn.in_transaction:
+            raise sqlite3.OperationalError("Arquivamento não pode rodar dentro de outra transação")
+        with anexar(conn, caminho):
+            try:
+                conn.execute("BEGIN IMMEDIATE")
+                conn.execute(_SQL_CRIAR_ARQUIVO.format(esquema='arquivo'))
+                conn.execute("CREATE INDEX IF NOT EXISTS arquivo.idx_arquivo_data_iso ON historico_vendas (data_iso)")
+                conn.execute(f'''
+                    INSERT OR IGNORE INTO arquivo.historico_vendas ({colunas})
+                    SELECT {colunas} FROM main.historico_vendas WHERE data_iso >= ? AND data_iso < ?
+                ''', (inicio, fim))
+                conn.commit()
+
+                conn.execute("BEGIN IMMEDIATE")
+                cursor = conn.cursor()
+                # Sem os triggers de DELETE: a venda sai do histórico, não dos agregados
+                for tabela in AGREGADOS:
+                    cursor.execute(f"DROP TRIGGER IF EXISTS main.trg_{tabela}_delete")
+                cursor.execute('''
+                    DELETE FROM main.historico_vendas
+                    WHERE data_iso >= ? AND data_iso < ?
+                      AND id IN (SELECT id FROM arquivo.historico_vendas)
+                ''', (inicio, fim))
+                movidas = cursor.rowcount
+                criar_agregados(cursor)
+                conn.commit()
+            except BaseException:
+                conn.rollback()
+                raise
+    return movidas
+
+
+def arquivar_meses_fechados(pool, manter_meses=MESES_ATIVOS_PADRAO, hoje=None):
+    """Arquiva todos os meses anteriores ao período ativo; retorna os meses movidos ('AAAA-MM')"""
+    limite = inicio_periodo_ativo(manter_meses, hoje)
+    with pool.leitura() as conn:
+        meses = [mes for (mes,) in conn.execute(
+            "SELECT DISTINCT SUBSTR(data_iso, 1, 7) FROM historico_vendas WHERE data_iso < ? ORDER BY 1",
+            (limite,)
+        )]
+
+    arquivados = []
+    for mes in meses:
+        ano, numero = (int(parte) for parte in mes.split('-'))
+        if arquivar_mes(pool, ano, numero):
+            arquivados.append(mes)
+    return arquivados
+
+
+def agregar_arquivos(db_path, tabela):
+    """Linhas do agregado calculadas a partir de todos os arquivos (para somar_ao_agregado)"""
+    linhas = []
+    for _, _, caminho in listar_arquivos(db_path):
+        with closing(sqlite3.connect(f"file:{pathname2url(caminho)}?mode=ro", uri=True)) as conn:
+            linhas.extend(conn.execute(sql_agrupar_vendas(tabela)).fetchall())
+    return linhas
+
+
+@contextmanager
+def view_historico_completo(conn, arquivos):
+    """
+    Cria a view temporária historico_completo na conexão.
+
+    A view é o UNION ALL de historico_vendas com os arquivos informados
+    ([(ano, mes, caminho)]), anexados só enquanto o bloco durar. Filtros
+    por data_iso são repassados a cada parte da união pelo SQLite.
+    """
+    if len(arquivos) > MAX_ARQUIVOS_ANEXADOS:
+        raise ValueError(f"Período abrange {len(arquivos)} meses arquivados; "
+                         f"o limite por consulta é {MAX_ARQUIVOS_ANEXADOS}")
+
+    colunas = ", ".join(COLUNAS_HISTORICO)
+    esquemas = []
+    try:
+        for ano, mes, caminho in arquivos:
+            esquema = f"arquivo_{ano:04d}_{mes:02d}"
+            conn.execute(f"ATTACH DATABASE ? AS {esquema}", (caminho,))
+            esquemas.append(esquema)
+        partes = [f"SELECT {colunas} FROM main.historico_vendas"]
+        partes += [f"SELECT {colunas} FROM {esquema}.historico_vendas" for esquema in esquemas]
+        conn.execute("CREATE TEMP VIEW historico_completo AS " + " UNION ALL ".join(partes))
+        yield conn
+    finally:
+        conn.execute("DROP VIEW IF EXISTS temp.historico_completo")
+        for esquema in esquemas:
+            conn.execute(f"DETACH DATABASE {esquema}")
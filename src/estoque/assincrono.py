@@ -0,0 +1,43 @@
+"""
+Fachada assíncrona do DatabaseManager (consultas fora da thread da interface)
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+
+
+class BancoAssincrono:
+    """
+    Executa métodos do DatabaseManager em threads de trabalho dedicadas.
+
+    Qualquer método do banco pode ser chamado por aqui com os mesmos
+    argumentos; em vez do resultado, a chamada devolve um
+    concurrent.futures.Future. Cada thread de trabalho usa sua própria
+    conexão de leitura do pool (por isso max_workers não deve passar de
+    pool.max_leitores) e as escritas continuam serializadas pelo pool.
+    """
+
+    def __init__(self, db, max_workers=2):
+        self.db = db
+        self._executor = ThreadPoolExecutor(
+            max_workers=min(max_workers, db.pool.max_leitores),
+            thread_name_prefix="banco"
+        )
+
+    def executar(self, funcao, *args, **kwargs):
+        """Agenda uma função qualquer (ex.: várias consultas juntas) e retorna o Future"""
+        return self._executor.submit(funcao, *args, **kwargs)
+
+    def __getattr__(self, nome):
+        metodo = getattr(self.db, nome)
+        if not callable(metodo):
+            return metodo
+
+        def agendar(*args, **kwargs):
+            return self.executar(metodo, *args, **kwargs)
+        agendar.__name__ = nome
+        agendar.__doc__ = metodo.__doc__
+        return agendar
+
+    def fechar(self, esperar=True):
+        """Encerra as threads de trabalho (tarefas pendentes ainda não iniciadas são canceladas)"""
+        self._executor.shutdown(wait=esperar, cancel_futures=True)
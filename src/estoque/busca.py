@@ -0,0 +1,98 @@
+"""
+Índice de busca textual (FTS5) do estoque: nome, categoria e código de barras
+"""
+
+import re
+import sqlite3
+
+
+TABELA_BUSCA = 'estoque_busca'
+
+# Colunas indexadas, na ordem dos pesos abaixo
+COLUNAS_BUSCA = ('produto', 'categoria', 'codigo_barras')
+
+# Pesos do bm25 por coluna: acertar o nome vale mais que o código, e este mais que a categoria
+PESOS_BUSCA = (10.0, 2.0, 5.0)
+
+# remove_diacritics 2: "hamburguer" encontra "Hambúrguer" (e vice-versa);
+# prefix: índices de prefixo de 2 e 3 letras para a busca enquanto se digita
+_SQL_CRIAR_BUSCA = f"""
+    CREATE VIRTUAL TABLE {TABELA_BUSCA} USING fts5(
+        {', '.join(COLUNAS_BUSCA)},
+        content='estoque', content_rowid='id',
+        tokenize="unicode61 remove_diacritics 2",
+        prefix='2 3'
+    )
+"""
+
+
+def _valores(linha):
+    """Lista de valores das colunas indexadas para NEW/OLD"""
+    return ", ".join(f"{linha}.{coluna}" for coluna in COLUNAS_BUSCA)
+
+
+def busca_disponivel(conn):
+    """True se o índice de busca existe neste banco"""
+    return conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (TABELA_BUSCA,)
+    ).fetchone() is not None
+
+
+def criar_indice_busca(cursor):
+    """
+    Cria o índice de busca e os triggers que o mantêm igual ao estoque.
+
+    O índice é "external content": não guarda cópia dos textos, só os
+    termos, e lê as colunas de estoque quando precisa. Sem FTS5 no SQLite
+    em uso, avisa e retorna False (as buscas passam a usar LIKE).
+    """
+    novo = not busca_disponivel(cursor.connection)
+    if novo:
+        try:
+            cursor.execute(_SQL_CRIAR_BUSCA)
+        except sqlite3.OperationalError as e:
+            print(f"Aviso: busca textual indisponível (SQLite sem FTS5): {e}")
+            return False
+
+    colunas = ", ".join(COLUNAS_BUSCA)
+    remover = f"""
+        INSERT INTO {TABELA_BUSCA} ({TABELA_BUSCA}, rowid, {colunas})
+        VALUES ('delete', OLD.id, {_valores('OLD')});
+    """
+    inserir = f"""
+        INSERT INTO {TABELA_BUSCA} (rowid, {colunas}) VALUES (NEW.id, {_valores('NEW')});
+    """
+    # Triggers sempre recriados para acompanhar mudanças na definição
+    for evento in ('insert', 'update', 'delete'):
+        cursor.execute(f"DROP TRIGGER IF EXISTS trg_{TABELA_BUSCA}_{evento}")
+    cursor.execute(f"CREATE TRIGGER trg_{TABELA_BUSCA}_insert AFTER INSERT ON estoque BEGIN {inserir} END")
+    # Só mudanças nas colunas indexadas: baixas de quantidade não tocam o índice
+    cursor.execute(f'''
+        CREATE TRIGGER trg_{TABELA_BUSCA}_update AFTER UPDATE OF {colunas} ON estoque
+        BEGIN {remover} {inserir} END
+    ''')
+    cursor.execute(f"CREATE TRIGGER trg_{TABELA_BUSCA}_delete AFTER DELETE ON estoque BEGIN {remover} END")
+
+    if novo:
+        reconstruir_indice_busca(cursor)
+    return True
+
+
+def reconstruir_indice_busca(cursor):
+    """Refaz o índice inteiro a partir da tabela estoque"""
+    cursor.execute(f"INSERT INTO {TABELA_BUSCA} ({TABELA_BUSCA}) VALUES ('rebuild')")
+
+
+def consulta_fts(termo):
+    """
+    Converte o texto digitado em consulta FTS5.
+
+    Cada palavra vira um prefixo ("hamb trad" -> "hamb"* "trad"*) e todas
+    precisam aparecer, em qualquer coluna e ordem. Aspas e operadores do
+    FTS5 digitados pelo usuário são tratados como texto. Retorna None se
+    o termo não tem nenhuma palavra.
+    """
+    palavras = re.findall(r"\w+", termo or "")
+    if not palavras:
+        return None
+    return " ".join(f'"{palavra}"*' for palavra in palavras)
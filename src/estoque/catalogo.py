@@ -0,0 +1,105 @@
+"""
+Catálogo de produtos em memória (consultas do caixa sem ir ao banco)
+"""
+
+import threading
+
+
+class CatalogoProdutos:
+    """
+    Produtos do estoque em memória, indexados por id, nome e código de barras.
+
+    Cada registro é (id, produto, preco). O catálogo é recarregado numa
+    única leitura quando fica desatualizado, o que é percebido de dois modos:
+    - o DatabaseManager o invalida em seu único ponto de escrita
+      (DatabaseManager._escrita) a cada gravação no cadastro (inserir,
+      atualizar quantidade/preço/produto, remover) e a cada SQL livre;
+    - pool.versao_dados() muda quando outra conexão grava no banco
+      (conexões avulsas, main_funcional.py, outro processo). Conferir isso
+      não lê nada do arquivo.
+
+    Vendas feitas pelo pool não mexem em id, nome, preço nem código de
+    barras, então não recarregam o catálogo.
+    """
+
+    def __init__(self, db):
+        self.db = db
+        # A carga acontece com o lock: uma invalidação durante a leitura
+        # espera e descarta o resultado logo em seguida
+        self._lock = threading.Lock()
+        self._versao_dados = None
+        # (registros, por_id, por_nome, por_codigo, derivados); None = recarregar
+        self._mapas = None
+        # Diagnóstico: leituras completas da tabela de estoque
+        self.cargas = 0
+
+    def invalidar(self):
+        """Descarta os mapas; serão recarregados na próxima consulta"""
+        with self._lock:
+            self._mapas = None
+
+    def _desatualizado(self):
+        """Confere se alguém gravou no banco desde a carga"""
+        versao = self.db.pool.versao_dados()
+        mudou = versao != self._versao_dados
+        self._versao_dados = versao
+        return mudou
+
+    def _carregar_mapas(self):
+        """Mapas atuais, recarregados se preciso (um único SELECT)"""
+        with self._lock:
+            if self._desatualizado() or self._mapas is None:
+                registros, por_id, por_nome, por_codigo = [], {}, {}, {}
+                # Lida depois da versão: nunca mais antiga do que a versão registrada
+                for produto_id, produto, preco, codigo in self.db.execute_query(
+                    "SELECT id, produto, preco, codigo_barras FROM estoque ORDER BY produto"
+                ):
+                    registro = (produto_id, produto, preco)
+                    registros.append(registro)
+                    por_id[produto_id] = registro
+                    por_nome[produto] = registro
+                    if codigo:
+                        por_codigo[codigo] = registro
+                self._mapas = (registros, por_id, por_nome, por_codigo, {})
+                self.cargas += 1
+            return self._mapas
+
+    def carregar(self):
+        """Garante o catálogo em memória e atualizado; retorna os registros ordenados por nome"""
+        return self._carregar_mapas()[0]
+
+    def derivado(self, nome, calcular):
+        """
+        Valor calculado a partir dos registros (ex.: textos de um combobox),
+        guardado até a próxima recarga do catálogo.
+        """
+        registros, *_, derivados = self._carregar_mapas()
+        if nome not in derivados:
+            derivados[nome] = calcular(registros)
+        return derivados[nome]
+
+    def por_id(self, produto_id):
+        """Registro do produto pelo id, ou None"""
+        return self._carregar_mapas()[1].get(produto_id)
+
+    def por_nome(self, produto):
+        """Registro do produto pelo nome exato, ou None"""
+        return self._carregar_mapas()[2].get(produto)
+
+    def por_codigo_barras(self, codigo):
+        """Registro do produto pelo código de barras, ou None"""
+        codigo = str(codigo or '').strip()
+        if not codigo:
+            return None
+        return self._carregar_mapas()[3].get(codigo)
+
+    def preco(self, produto):
+        """Preço cadastrado do produto, ou None se não existir"""
+        registro = self.por_nome(produto)
+        return registro[2] if registro else None
+
+    def fechar(self):
+        """Esquece o catálogo carregado"""
+        with self._lock:
+            self._versao_dados = None
+            self._mapas = None
@@ -2,12 +2,14 @@
 Controlador para gerenciamento de estoque
 """
 
-from .database import DatabaseManager
+from .database import obter_banco
 
 
 class EstoqueController:
-    def __init__(self):
-        self.db = DatabaseManager()
+    def __init__(self, db=None):
+        self.db = db or obter_banco()
+        # Consultas de cadastro (preço, código de barras) servidas da memória
+        self.catalogo = self.db.catalogo
         
     def adicionar_produto(self, produto, quantidade, preco=0.0, categoria='Geral', codigo_barras=''):
         """Adiciona um novo produto ao estoque"""
@@ -23,6 +25,7 @@ class EstoqueController:
         produto = produto.strip().title()  # Capitalizar nome do produto
         categoria = categoria.strip().title() if categoria else 'Geral'
         codigo_barras = codigo_barras.strip() if codigo_barras else ''
+        self._verificar_codigo_barras(codigo_barras, produto)
         
         return self.db.inserir_produto(produto, quantidade, preco, categoria, codigo_barras)
         
@@ -61,9 +64,16 @@ class EstoqueController:
         produto = produto.strip().title()
         categoria = categoria.strip().title() if categoria else 'Geral'
         codigo_barras = codigo_barras.strip() if codigo_barras else ''
+        self._verificar_codigo_barras(codigo_barras, produto)
         
         return self.db.atualizar_produto_completo(produto, quantidade, preco, categoria, codigo_barras)
         
+    def _verificar_codigo_barras(self, codigo_barras, produto):
+        """Impede usar o código de barras de outro produto"""
+        encontrado = self.catalogo.por_codigo_barras(codigo_barras)
+        if encontrado and encontrado[1] != produto:
+            raise ValueError(f"Código de barras já cadastrado para '{encontrado[1]}'")
+        
     def consultar_produto(self, produto):
         """Consulta a quantidade disponível de um produto"""
         if not produto or not produto.strip():
@@ -80,6 +90,17 @@ class EstoqueController:
         produto = produto.strip().title()
         return self.db.consultar_produto_completo(produto)
         
+    def consultar_codigo_barras(self, codigo_barras):
+        """Produto lido pelo scanner: (id, produto, preco) ou None (sem ir ao banco)"""
+        return self.catalogo.por_codigo_barras(codigo_barras)
+        
+    def consultar_preco(self, produto):
+        """Preço cadastrado de um produto, ou None (sem ir ao banco)"""
+        if not produto or not produto.strip():
+            return None
+            
+        return self.catalogo.preco(produto.strip().title())
+        
     def listar_estoque(self):
         """Lista todos os produtos em estoque"""
         return self.db.listar_estoque()
@@ -118,17 +139,9 @@ class EstoqueController:
                 
         return valor_total
         
-    def buscar_produtos(self, termo):
-        """Busca produtos por termo"""
+    def buscar_produtos(self, termo, limite=50):
+        """Busca produtos por termo (nome, categoria ou código), os mais relevantes primeiro"""
         if not termo or not termo.strip():
             return self.listar_estoque()
             
-        termo = termo.strip().lower()
-        estoque = self.listar_estoque()
-        produtos_encontrados = []
-        
-        for produto, quantidade in estoque:
-            if termo in produto.lower():
-                produtos_encontrados.append((produto, quantidade))
-                
-        return produtos_encontrados
+        return [(produto, quantidade) for produto, quantidade, *_ in self.db.buscar_produtos(termo.strip(), limite)]
@@ -4,135 +4,366 @@ Gerenciador de banco de dados SQLite
 
 import sqlite3
 import os
-from datetime import datetime
+import threading
+from contextlib import closing, contextmanager
+from datetime import datetime, timedelta
+from itertools import islice
+
+from .perfis import PERFIL_PADRAO, aplicar_perfil, obter_perfil
+from .agregados import AGREGADOS, reconstruir_agregado, somar_ao_agregado
+from .arquivamento import (CONFIG_MESES_ATIVOS, MESES_ATIVOS_PADRAO, agregar_arquivos, anexar,
+                           arquivar_meses_fechados, listar_arquivos, view_historico_completo)
+from .assincrono import BancoAssincrono
+from .busca import PESOS_BUSCA, TABELA_BUSCA, busca_disponivel, consulta_fts
+from .catalogo import CatalogoProdutos
+from .incremental import AgregadosVendas
+from .indices import criar_indices
+from .metricas import TTL_METRICAS_PADRAO, CacheMetricas
+from .migracoes import aplicar_migracoes
+from .pool import ConnectionPool
+
+
+# produto guarda o nome na hora da venda; produto_id liga ao cadastro atual (NULL se não houver)
+_SQL_INSERIR_VENDA = """
+    INSERT INTO historico_vendas
+    (produto, quantidade, preco_unitario, valor_total, data_hora, vendedor, observacoes, data_iso, produto_id)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, (SELECT id FROM estoque WHERE produto = ?))
+"""
+
+# Vendas com o nome atual do produto; vendas sem cadastro mostram o nome gravado na venda
+_SQL_VENDAS_COM_PRODUTO = "historico_vendas h LEFT JOIN estoque e ON e.id = h.produto_id"
+# O mesmo para um mês arquivado anexado como 'arquivo'
+_SQL_VENDAS_ARQUIVADAS = "arquivo.historico_vendas h LEFT JOIN main.estoque e ON e.id = h.produto_id"
+_SQL_NOME_PRODUTO = "COALESCE(e.produto, h.produto)"
+_SQL_COLUNAS_VENDA = f"h.id, {_SQL_NOME_PRODUTO}, h.quantidade, h.data_hora"
+_SQL_COLUNAS_VENDA_COMPLETA = f"""h.id, {_SQL_NOME_PRODUTO}, h.quantidade, h.preco_unitario, h.valor_total,
+                                 h.data_hora, h.vendedor, h.observacoes"""
+
+
+def _sql_totais_por_produto(filtro=None):
+    """
+    SQL com totais de venda por produto (produto, total_vendido, receita_total,
+    preco_medio, num_vendas).
+
+    Vendas ligadas ao estoque são agrupadas por produto_id e exibidas com o
+    nome atual; as sem vínculo, pelo nome gravado. Com filtro, os parâmetros
+    devem ser passados duas vezes (um conjunto para cada grupo). Lê só
+    historico_vendas: os meses arquivados ficam de fora.
+    """
+    filtro = f" AND {filtro}" if filtro else ""
+    return f"""
+        SELECT nome AS produto, SUM(quantidade) AS total_vendido, SUM(receita) AS receita_total,
+               SUM(soma_precos) / SUM(num_precos) AS preco_medio, SUM(num_vendas) AS num_vendas
+        FROM (
+            SELECT e.produto AS nome, t.quantidade, t.receita, t.soma_precos, t.num_precos, t.num_vendas
+            FROM (
+                SELECT produto_id, SUM(quantidade) AS quantidade, SUM(valor_total) AS receita,
+                       SUM(preco_unitario) AS soma_precos, COUNT(preco_unitario) AS num_precos,
+                       COUNT(*) AS num_vendas
+                FROM historico_vendas
+                WHERE produto_id IS NOT NULL{filtro}
+                GROUP BY produto_id
+            ) t
+            JOIN estoque e ON e.id = t.produto_id
+            UNION ALL
+            SELECT produto, SUM(quantidade), SUM(valor_total),
+                   SUM(preco_unitario), COUNT(preco_unitario), COUNT(*)
+            FROM historico_vendas
+            WHERE produto_id IS NULL{filtro}
+            GROUP BY produto
+        )
+        GROUP BY nome
+    """
+
+
+def _data_para_iso(data):
+    """Converte date/datetime ou texto 'DD/MM/YYYY' para 'YYYY-MM-DD'"""
+    if hasattr(data, 'strftime'):
+        return data.strftime("%Y-%m-%d")
+    partes = str(data).split('/')
+    if len(partes) == 3:
+        return f"{partes[2]}-{partes[1].zfill(2)}-{partes[0].zfill(2)}"
+    return str(data)
+
+
+def _intervalo_iso(data_inicio, data_fim):
+    """Retorna o intervalo [inicio, fim) em data_iso que cobre os dias informados (inclusive)"""
+    inicio = _data_para_iso(data_inicio)
+    fim = datetime.strptime(_data_para_iso(data_fim), "%Y-%m-%d") + timedelta(days=1)
+    return inicio, fim.strftime("%Y-%m-%d")
+
+
+# Chaves aceitas pelo filtro de iter_historico/pagina_historico/resumo_historico
+_FILTROS_HISTORICO = ('data_inicio', 'data_fim', 'produto', 'vendedor')
+
+
+def _sql_vendas_do_produto(termo, busca_fts):
+    """
+    Condição (e parâmetros) das vendas cujo produto atende ao termo.
+
+    Com o índice de busca, as vendas ligadas ao estoque são achadas pelo
+    produto_id dos produtos encontrados (nome, categoria ou código, por
+    prefixo e sem acentos); as sem vínculo, pelo nome gravado na venda.
+    Sem o índice, LIKE '%termo%' no nome.
+    """
+    consulta = consulta_fts(termo) if busca_fts else None
+    if consulta is None:
+        return f"{_SQL_NOME_PRODUTO} LIKE ?", (f"%{termo}%",)
+    return (f"""(h.produto_id IN (SELECT rowid FROM {TABELA_BUSCA} WHERE {TABELA_BUSCA} MATCH ?)
+                 OR (h.produto_id IS NULL AND h.produto LIKE ?))""",
+            (consulta, f"%{termo}%"))
+
+
+def _sql_filtro_historico(filtro=None, apos_id=None, busca_fts=False):
+    """
+    Cláusula WHERE (e parâmetros) das consultas do histórico.
+
+    filtro: data_inicio/data_fim (dias inclusivos, DD/MM/AAAA ou date),
+    produto (termo de busca, ver _sql_vendas_do_produto) e vendedor (nome
+    exato). apos_id restringe às vendas anteriores a esse id (paginação
+    por chave).
+    """
+    filtro = filtro or {}
+    desconhecidos = set(filtro) - set(_FILTROS_HISTORICO)
+    if desconhecidos:
+        raise ValueError(f"Filtro de histórico desconhecido: {', '.join(sorted(desconhecidos))}")
+
+    condicoes = []
+    params = []
+    if filtro.get('data_inicio'):
+        condicoes.append("h.data_iso >= ?")
+        params.append(_data_para_iso(filtro['data_inicio']))
+    if filtro.get('data_fim'):
+        condicoes.append("h.data_iso < ?")
+        params.append(_intervalo_iso(filtro['data_fim'], filtro['data_fim'])[1])
+    if filtro.get('produto'):
+        condicao, params_produto = _sql_vendas_do_produto(filtro['produto'], busca_fts)
+        condicoes.append(condicao)
+        params.extend(params_produto)
+    if filtro.get('vendedor'):
+        condicoes.append("h.vendedor = ?")
+        params.append(filtro['vendedor'])
+    if apos_id is not None:
+        condicoes.append("h.id < ?")
+        params.append(apos_id)
+
+    where = " WHERE " + " AND ".join(condicoes) if condicoes else ""
+    return where, tuple(params)
+
+
+def _ler_em_lotes(cursor, tamanho_lote):
+    """Percorre o resultado com fetchmany, sem carregar todas as linhas de uma vez"""
+    try:
+        while True:
+            linhas = cursor.fetchmany(tamanho_lote)
+            if not linhas:
+                return
+            yield from linhas
+    finally:
+        cursor.close()
+
+
+class ProdutoNaoEncontradoError(ValueError):
+    """Venda de produto que não está cadastrado no estoque"""
+    
+    def __init__(self, produto):
+        super().__init__(f"Produto '{produto}' não encontrado no estoque")
+        self.produto = produto
+
+
+class EstoqueInsuficienteError(ValueError):
+    """Venda maior que a quantidade disponível com estoque negativo bloqueado"""
+    
+    def __init__(self, produto, disponivel, solicitado):
+        super().__init__(
+            f"Estoque insuficiente de '{produto}': disponível {disponivel}, solicitado {solicitado}"
+        )
+        self.produto = produto
+        self.disponivel = disponivel
+        self.solicitado = solicitado
+
+
+class DashboardSnapshot:
+    """
+    Números dos cartões e alertas do dashboard num mesmo instante do banco.
+
+    Criado por DatabaseManager.obter_snapshot_dashboard(); os valores
+    derivados (ticket médio, crescimento) são calculados daqui.
+    """
+    
+    def __init__(self, data, receita_hoje=0.0, vendas_hoje=0, produto_top="Nenhum", valor_estoque=0.0,
+                 produtos_estoque_baixo=0, receita_mes=0.0, receita_semana_passada=0.0):
+        self.data = data
+        self.receita_hoje = receita_hoje
+        self.vendas_hoje = vendas_hoje
+        self.produto_top = produto_top
+        self.valor_estoque = valor_estoque
+        self.produtos_estoque_baixo = produtos_estoque_baixo
+        self.receita_mes = receita_mes
+        # Mesmo dia da semana passada (base do crescimento)
+        self.receita_semana_passada = receita_semana_passada
+        
+    @property
+    def ticket_medio(self):
+        """Receita por venda do dia (0 sem vendas)"""
+        return self.receita_hoje / self.vendas_hoje if self.vendas_hoje > 0 else 0.0
+        
+    @property
+    def crescimento(self):
+        """Variação percentual sobre o mesmo dia da semana passada, ou None sem base de comparação"""
+        if self.receita_semana_passada > 0:
+            return (self.receita_hoje - self.receita_semana_passada) / self.receita_semana_passada * 100
+        return None
+        
+    def __repr__(self):
+        campos = ", ".join(f"{nome}={valor!r}" for nome, valor in vars(self).items())
+        return f"DashboardSnapshot({campos})"
+
+
+class _ConexaoAvulsa(sqlite3.Connection):
+    """Conexão fora do pool que é fechada ao sair do bloco with"""
+    
+    def __exit__(self, *exc_info):
+        try:
+            return super().__exit__(*exc_info)
+        finally:
+            self.close()
 
 
 class DatabaseManager:
-    def __init__(self, db_path="data/banco.db"):
+    def __init__(self, db_path="data/banco.db", max_leitores=4, cached_statements=128,
+                 perfil=PERFIL_PADRAO, intervalo_checkpoint=60.0, permitir_estoque_negativo=False,
+                 ttl_metricas=TTL_METRICAS_PADRAO):
         self.db_path = db_path
+        # Política padrão de vender() quando o estoque não cobre a quantidade
+        self.permitir_estoque_negativo = permitir_estoque_negativo
+        # Fachada assíncrona criada sob demanda (ver propriedade assincrono)
+        self._assincrono = None
+        self._lock_assincrono = threading.Lock()
+        # Produtos em memória (id, nome, código de barras e preço), ver CatalogoProdutos
+        self.catalogo = CatalogoProdutos(self)
         # Garantir que diretório existe
         os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        # Conexões persistentes: evita abrir/fechar o arquivo a cada consulta
+        self.pool = ConnectionPool(db_path, max_leitores=max_leitores,
+                                   cached_statements=cached_statements, perfil=perfil)
+        # Métricas do dashboard guardadas até o banco mudar (ver CacheMetricas)
+        self.metricas = CacheMetricas(self.pool, ttl_metricas)
+        # Totais do dashboard atualizados só com as vendas novas (ver AgregadosVendas)
+        self.agregados_vendas = AgregadosVendas(self)
         self.init_database()
         
+        # Em WAL, manter o arquivo -wal sob controle com checkpoints periódicos
+        if intervalo_checkpoint and str(obter_perfil(perfil).get('journal_mode', '')).upper() == 'WAL':
+            self.pool.iniciar_checkpoint_automatico(intervalo_checkpoint)
+        
     def init_database(self):
-        """Inicializa o banco de dados e cria as tabelas necessárias"""
+        """Leva o banco à versão atual do esquema aplicando as migrações pendentes"""
         # Criar diretório data se não existir
         os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        if aplicar_migracoes(self.pool):
+            # Esquema mudou: confere o conjunto atual de índices gerenciados (os
+            # passos só criam os seus, fixos); sem migração pendente, nada a sondar
+            with self.pool.escrita() as conn:
+                criar_indices(conn.cursor())
+        with self.pool.leitura() as conn:
+            # Sem FTS5 no SQLite em uso, as buscas caem para LIKE
+            self.busca_fts = busca_disponivel(conn)
         
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            
-            # Verificar se precisa fazer migração da estrutura antiga
-            self._migrar_estrutura_antiga(cursor)
-            
-            # Criar tabela estoque
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS estoque (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    produto TEXT NOT NULL,
-                    quantidade INTEGER NOT NULL DEFAULT 0,
-                    preco REAL DEFAULT 0.0,
-                    categoria TEXT DEFAULT 'Geral',
-                    codigo_barras TEXT DEFAULT '',
-                    data_cadastro TEXT DEFAULT '',
-                    data_atualizacao TEXT DEFAULT ''
-                )
-            ''')
-            
-            # Criar tabela historico_vendas
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS historico_vendas (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    produto TEXT NOT NULL,
-                    quantidade INTEGER NOT NULL,
-                    preco_unitario REAL DEFAULT 0.0,
-                    valor_total REAL DEFAULT 0.0,
-                    data_hora TEXT NOT NULL,
-                    vendedor TEXT DEFAULT '',
-                    observacoes TEXT DEFAULT ''
-                )
-            ''')
-            
-            # Criar tabela configuracoes para versioning e configurações do sistema
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS configuracoes (
-                    chave TEXT PRIMARY KEY,
-                    valor TEXT NOT NULL,
-                    data_atualizacao TEXT DEFAULT ''
-                )
-            ''')
-            
-            # Inserir configurações padrão
-            cursor.execute('''
-                INSERT OR IGNORE INTO configuracoes (chave, valor, data_atualizacao) 
-                VALUES ('versao_sistema', '2.0.0', ?)
-            ''', (datetime.now().strftime("%d/%m/%Y %H:%M:%S"),))
-            
-            cursor.execute('''
-                INSERT OR IGNORE INTO configuracoes (chave, valor, data_atualizacao) 
-                VALUES ('nome_empresa', 'Minha Lanchonete', ?)
-            ''', (datetime.now().strftime("%d/%m/%Y %H:%M:%S"),))
-            
-            cursor.execute('''
-                INSERT OR IGNORE INTO configuracoes (chave, valor, data_atualizacao) 
-                VALUES ('moeda', 'R$', ?)
-            ''', (datetime.now().strftime("%d/%m/%Y %H:%M:%S"),))
-            
-            conn.commit()
-            
-    def _migrar_estrutura_antiga(self, cursor):
-        """Migra estruturas antigas do banco de dados"""
+    def reconstruir_agregados(self):
+        """Recalcula os agregados (vendas_diarias, vendas_hora...) a partir do histórico completo"""
         try:
-            # Verificar se tabela estoque existe e tem estrutura antiga
-            cursor.execute("PRAGMA table_info(estoque)")
-            colunas_estoque = [col[1] for col in cursor.fetchall()]
+            with self._escrita() as conn:
+                cursor = conn.cursor()
+                for tabela in AGREGADOS:
+                    reconstruir_agregado(cursor, tabela)
+                    # Meses arquivados também fazem parte dos agregados
+                    somar_ao_agregado(cursor, tabela, agregar_arquivos(self.db_path, tabela))
+            return True
+        except Exception as e:
+            print(f"Erro ao reconstruir agregados: {e}")
+            return False
             
-            if 'estoque' in [table[0] for table in cursor.execute("SELECT name FROM sqlite_master WHERE type='table'").fetchall()]:
-                # Se tabela existe mas não tem coluna preço, adicionar
-                if 'preco' not in colunas_estoque:
-                    cursor.execute('ALTER TABLE estoque ADD COLUMN preco REAL DEFAULT 0.0')
-                if 'categoria' not in colunas_estoque:
-                    cursor.execute('ALTER TABLE estoque ADD COLUMN categoria TEXT DEFAULT "Geral"')
-                if 'codigo_barras' not in colunas_estoque:
-                    cursor.execute('ALTER TABLE estoque ADD COLUMN codigo_barras TEXT DEFAULT ""')
-                if 'data_cadastro' not in colunas_estoque:
-                    cursor.execute('ALTER TABLE estoque ADD COLUMN data_cadastro TEXT DEFAULT ""')
-                if 'data_atualizacao' not in colunas_estoque:
-                    cursor.execute('ALTER TABLE estoque ADD COLUMN data_atualizacao TEXT DEFAULT ""')
+    def get_connection(self):
+        """Retorna uma conexão avulsa com o banco de dados (fora do pool, fechada ao sair do with)"""
+        conn = sqlite3.connect(self.db_path, factory=_ConexaoAvulsa)
+        aplicar_perfil(conn, self.pool.perfil)
+        return conn
+        
+    # === ARQUIVAMENTO DO HISTÓRICO ===
+    
+    def arquivar_historico(self, manter_meses=None):
+        """Move os meses fechados do histórico para data/arquivo/vendas_AAAA_MM.db; retorna os meses movidos"""
+        try:
+            if manter_meses is None:
+                manter_meses = int(self.obter_configuracao(CONFIG_MESES_ATIVOS) or MESES_ATIVOS_PADRAO)
+            # As transações do arquivamento rodam dentro do bloco (o pool as aninha)
+            with self._escrita():
+                meses = arquivar_meses_fechados(self.pool, manter_meses)
+            return meses
+        except Exception as e:
+            print(f"Erro ao arquivar histórico: {e}")
+            return []
             
-            # Verificar se tabela historico_vendas existe e tem estrutura antiga
-            cursor.execute("PRAGMA table_info(historico_vendas)")
-            colunas_historico = [col[1] for col in cursor.fetchall()]
+    def inicio_historico_ativo(self):
+        """Dia ('YYYY-MM-DD') da venda mais antiga ainda no banco principal, ou None"""
+        # MIN sobre idx_historico_data_iso: uma descida no índice
+        inicio = self.execute_query("SELECT MIN(data_iso) FROM historico_vendas")[0][0]
+        return inicio[:10] if inicio else None
             
-            if 'historico_vendas' in [table[0] for table in cursor.execute("SELECT name FROM sqlite_master WHERE type='table'").fetchall()]:
-                # Se tabela existe mas não tem colunas de preço, adicionar
-                if 'preco_unitario' not in colunas_historico:
-                    cursor.execute('ALTER TABLE historico_vendas ADD COLUMN preco_unitario REAL DEFAULT 0.0')
-                if 'valor_total' not in colunas_historico:
-                    cursor.execute('ALTER TABLE historico_vendas ADD COLUMN valor_total REAL DEFAULT 0.0')
-                if 'vendedor' not in colunas_historico:
-                    cursor.execute('ALTER TABLE historico_vendas ADD COLUMN vendedor TEXT DEFAULT ""')
-                if 'observacoes' not in colunas_historico:
-                    cursor.execute('ALTER TABLE historico_vendas ADD COLUMN observacoes TEXT DEFAULT ""')
+    def listar_meses_arquivados(self):
+        """Lista os meses arquivados ('AAAA-MM'), do mais antigo ao mais recente"""
+        return [f"{ano:04d}-{mes:02d}" for ano, mes, _ in listar_arquivos(self.db_path)]
+        
+    @contextmanager
+    def historico_completo(self, data_inicio=None, data_fim=None):
+        """
+        Conexão avulsa com a view temporária historico_completo para relatórios históricos.
+
+        Só os meses arquivados que cruzam o período (datas DD/MM/AAAA) são
+        anexados; sem período, todos (até o limite de ATTACH do SQLite).
+        """
+        with self.get_connection() as conn:
+            with view_historico_completo(conn, self._arquivos_no_periodo(data_inicio, data_fim)):
+                yield conn
                 
-                # Atualizar registros antigos que não têm valores financeiros
-                cursor.execute('''
-                    UPDATE historico_vendas 
-                    SET preco_unitario = 0.0, valor_total = 0.0 
-                    WHERE preco_unitario IS NULL OR valor_total IS NULL
-                ''')
-            
-        except Exception as e:
-            print(f"Aviso: Erro na migração do banco de dados: {e}")
-            # Continuar mesmo com erro de migração
-            
-    def get_connection(self):
-        """Retorna uma conexão com o banco de dados"""
-        return sqlite3.connect(self.db_path)
+    def _arquivos_no_periodo(self, data_inicio=None, data_fim=None):
+        """Arquivos mensais que cruzam o período (sem datas, todos)"""
+        inicio = _data_para_iso(data_inicio)[:7] if data_inicio else "0000-00"
+        fim = _data_para_iso(data_fim)[:7] if data_fim else "9999-99"
+        return [(ano, mes, caminho) for ano, mes, caminho in listar_arquivos(self.db_path)
+                if inicio <= f"{ano:04d}-{mes:02d}" <= fim]
+                
+    def leitura_consistente(self):
+        """Bloco em que as consultas deste banco na thread atual enxergam um único snapshot (somente leitura)"""
+        return self.pool.leitura_consistente()
+
+    @property
+    def assincrono(self):
+        """Fachada que executa os métodos deste banco em threads de trabalho e retorna Futures"""
+        with self._lock_assincrono:
+            if self._assincrono is None:
+                self._assincrono = BancoAssincrono(self)
+            return self._assincrono
+
+    def fechar(self):
+        """Fecha as conexões persistentes do pool"""
+        with self._lock_assincrono:
+            if self._assincrono is not None:
+                self._assincrono.fechar()
+                self._assincrono = None
+        self.catalogo.fechar()
+        self.metricas.invalidar()
+        self.agregados_vendas.fechar()
+        self.pool.fechar()
+        with _lock_bancos:
+            chave = os.path.abspath(self.db_path)
+            if _bancos.get(chave) is self:
+                del _bancos[chave]
         
     def execute_query(self, query, params=None):
         """Executa uma query e retorna os resultados"""
-        with self.get_connection() as conn:
+        with self.pool.leitura() as conn:
             cursor = conn.cursor()
             if params:
                 cursor.execute(query, params)
@@ -140,27 +371,39 @@ class DatabaseManager:
                 cursor.execute(query)
             return cursor.fetchall()
             
-    def execute_update(self, query, params=None):
-        """Executa uma query de atualização e retorna o número de linhas afetadas"""
-        with self.get_connection() as conn:
+    @contextmanager
+    def _escrita(self, imediata=False, cadastro=False):
+        """
+        Transação de escrita do pool que, ao confirmar, invalida os caches em memória.
+
+        Toda escrita deste banco passa por aqui. As métricas são sempre
+        descartadas; o catálogo de produtos só com cadastro=True (escritas em
+        estoque fora das vendas e SQL livre), para que vender não o recarregue.
+        """
+        with self.pool.escrita(imediata=imediata) as conn:
+            yield conn
+        self.metricas.invalidar()
+        if cadastro:
+            self.catalogo.invalidar()
+            
+    def _executar_escrita(self, query, params=None, cadastro=False):
+        """Executa uma única escrita e retorna o cursor"""
+        with self._escrita(cadastro=cadastro) as conn:
             cursor = conn.cursor()
             if params:
                 cursor.execute(query, params)
             else:
                 cursor.execute(query)
-            conn.commit()
-            return cursor.rowcount
+        return cursor
+            
+    def execute_update(self, query, params=None):
+        """Executa uma query de atualização e retorna o número de linhas afetadas"""
+        # SQL livre pode ter mexido no cadastro
+        return self._executar_escrita(query, params, cadastro=True).rowcount
             
     def execute_insert(self, query, params=None):
         """Executa uma query de inserção e retorna o ID da linha inserida"""
-        with self.get_connection() as conn:
-            cursor = conn.cursor()
-            if params:
-                cursor.execute(query, params)
-            else:
-                cursor.execute(query)
-            conn.commit()
-            return cursor.lastrowid
+        return self._executar_escrita(query, params, cadastro=True).lastrowid
             
     # Métodos específicos para estoque
     def inserir_produto(self, produto, quantidade, preco=0.0, categoria='Geral', codigo_barras=''):
@@ -173,7 +416,7 @@ class DatabaseManager:
             self.execute_insert(query, (produto, quantidade, preco, categoria, codigo_barras, data_atual, data_atual))
             return True
         except sqlite3.IntegrityError:
-            # Produto já existe
+            # Produto ou código de barras já existe
             return False
         except Exception:
             return False
@@ -197,7 +440,11 @@ class DatabaseManager:
         data_atual = datetime.now().strftime("%d/%m/%Y %H:%M:%S")
         query = """UPDATE estoque SET quantidade = ?, preco = ?, categoria = ?, 
                    codigo_barras = ?, data_atualizacao = ? WHERE produto = ?"""
-        rows_affected = self.execute_update(query, (quantidade, preco, categoria, codigo_barras, data_atual, produto))
+        try:
+            rows_affected = self.execute_update(query, (quantidade, preco, categoria, codigo_barras, data_atual, produto))
+        except sqlite3.IntegrityError:
+            # Código de barras já usado por outro produto
+            return False
         return rows_affected > 0
         
     def consultar_produto(self, produto):
@@ -206,6 +453,14 @@ class DatabaseManager:
         result = self.execute_query(query, (produto,))
         return result[0][0] if result else None
         
+    def consultar_por_codigo_barras(self, codigo_barras):
+        """Produto com o código de barras: (produto, quantidade, preco, categoria, codigo_barras) ou None"""
+        # A condição repetida permite usar o índice parcial idx_estoque_codigo_barras
+        query = """SELECT produto, quantidade, preco, categoria, codigo_barras FROM estoque
+                   WHERE codigo_barras = ? AND codigo_barras <> ''"""
+        result = self.execute_query(query, (codigo_barras,))
+        return result[0] if result else None
+        
     def consultar_produto_completo(self, produto):
         """Consulta todas as informações de um produto"""
         query = """SELECT produto, quantidade, preco, categoria, codigo_barras, 
@@ -224,6 +479,30 @@ class DatabaseManager:
                    data_cadastro, data_atualizacao FROM estoque ORDER BY produto"""
         return self.execute_query(query)
         
+    def buscar_produtos(self, termo, limite=50):
+        """
+        Produtos que atendem ao termo, os mais relevantes primeiro.
+
+        Procura no nome, na categoria e no código de barras, por prefixo
+        ("hamb" encontra "Hambúrguer") e sem diferenciar acentos. Colunas:
+        produto, quantidade, preco, categoria, codigo_barras.
+        """
+        consulta = consulta_fts(termo) if self.busca_fts else None
+        if consulta is not None:
+            pesos = ", ".join(str(peso) for peso in PESOS_BUSCA)
+            query = f"""SELECT e.produto, e.quantidade, e.preco, e.categoria, e.codigo_barras
+                        FROM {TABELA_BUSCA} JOIN estoque e ON e.id = {TABELA_BUSCA}.rowid
+                        WHERE {TABELA_BUSCA} MATCH ?
+                        ORDER BY bm25({TABELA_BUSCA}, {pesos}), e.produto LIMIT ?"""
+            return self.execute_query(query, (consulta, limite))
+        if not termo or not termo.strip():
+            return []
+        padrao = f"%{termo.strip()}%"
+        query = """SELECT produto, quantidade, preco, categoria, codigo_barras FROM estoque
+                   WHERE produto LIKE ? OR categoria LIKE ? OR codigo_barras LIKE ?
+                   ORDER BY produto LIMIT ?"""
+        return self.execute_query(query, (padrao, padrao, padrao, limite))
+        
     def remover_produto(self, produto):
         """Remove um produto do estoque"""
         query = "DELETE FROM estoque WHERE produto = ?"
@@ -233,63 +512,191 @@ class DatabaseManager:
     # Métodos específicos para histórico de vendas
     def registrar_venda(self, produto, quantidade, preco_unitario=0.0, vendedor='', observacoes=''):
         """Registra uma venda no histórico"""
-        data_hora = datetime.now().strftime("%d/%m/%Y %H:%M:%S")
+        agora = datetime.now()
+        data_hora = agora.strftime("%d/%m/%Y %H:%M:%S")
+        data_iso = agora.strftime("%Y-%m-%d %H:%M:%S")
         valor_total = quantidade * preco_unitario
-        query = """INSERT INTO historico_vendas 
-                   (produto, quantidade, preco_unitario, valor_total, data_hora, vendedor, observacoes) 
-                   VALUES (?, ?, ?, ?, ?, ?, ?)"""
         try:
-            venda_id = self.execute_insert(query, (produto, quantidade, preco_unitario, valor_total, data_hora, vendedor, observacoes))
+            cursor = self._executar_escrita(_SQL_INSERIR_VENDA, (produto, quantidade, preco_unitario, valor_total,
+                                                                 data_hora, vendedor, observacoes, data_iso, produto))
+            venda_id = cursor.lastrowid
             return venda_id is not None
         except Exception:
             return False
             
+    def _inserir_vendas(self, conn, itens, vendedor, observacoes):
+        """Insere os itens em historico_vendas com executemany e retorna os ids gerados"""
+        agora = datetime.now()
+        data_hora = agora.strftime("%d/%m/%Y %H:%M:%S")
+        data_iso = agora.strftime("%Y-%m-%d %H:%M:%S")
+        linhas = []
+        for item in itens:
+            preco_unitario = item.get('preco_unitario', 0.0)
+            linhas.append((
+                item['produto'], item['quantidade'], preco_unitario,
+                item['quantidade'] * preco_unitario, data_hora,
+                item.get('vendedor', vendedor), item.get('observacoes', observacoes), data_iso,
+                item['produto']
+            ))
+        
+        conn.executemany(_SQL_INSERIR_VENDA, linhas)
+        # AUTOINCREMENT + escritor único: os ids do lote são consecutivos
+        ultimo_id = conn.execute("SELECT last_insert_rowid()").fetchone()[0]
+        return list(range(ultimo_id - len(linhas) + 1, ultimo_id + 1))
+        
+    def registrar_vendas_lote(self, itens, vendedor='', observacoes=''):
+        """
+        Registra todos os itens de um carrinho em uma única transação.
+        
+        Cada item é um dicionário com 'produto', 'quantidade' e, opcionalmente,
+        'preco_unitario', 'vendedor' e 'observacoes'. Retorna a lista de ids
+        gerados (na ordem dos itens) ou None se nada foi gravado.
+        """
+        if not itens:
+            return []
+        
+        try:
+            with self._escrita() as conn:
+                ids = self._inserir_vendas(conn, itens, vendedor, observacoes)
+            return ids
+        except Exception as e:
+            print(f"Erro ao registrar lote de vendas: {e}")
+            return None
+            
+    def _baixar_estoque(self, conn, produto, quantidade, permitir_estoque_negativo, data_atual):
+        """Decrementa o estoque dentro da transação aberta ou levanta o erro adequado"""
+        if permitir_estoque_negativo:
+            cursor = conn.execute(
+                "UPDATE estoque SET quantidade = quantidade - ?, data_atualizacao = ? WHERE produto = ?",
+                (quantidade, data_atual, produto)
+            )
+        else:
+            cursor = conn.execute(
+                """UPDATE estoque SET quantidade = quantidade - ?, data_atualizacao = ?
+                   WHERE produto = ? AND quantidade >= ?""",
+                (quantidade, data_atual, produto, quantidade)
+            )
+        if cursor.rowcount == 0:
+            # Só chega aqui no caminho de erro: descobrir qual foi o motivo
+            linha = conn.execute("SELECT quantidade FROM estoque WHERE produto = ?", (produto,)).fetchone()
+            if linha is None:
+                raise ProdutoNaoEncontradoError(produto)
+            raise EstoqueInsuficienteError(produto, linha[0], quantidade)
+            
+    def vender_lote(self, itens, vendedor='', observacoes='', permitir_estoque_negativo=None):
+        """
+        Baixa o estoque e registra a venda de todos os itens atomicamente.
+        
+        Roda em uma única transação IMMEDIATE: ou todos os itens são vendidos
+        ou nada é gravado. Levanta ProdutoNaoEncontradoError ou
+        EstoqueInsuficienteError (este último só se a política não permitir
+        estoque negativo). Retorna os ids das vendas na ordem dos itens.
+        """
+        if not itens:
+            return []
+        if permitir_estoque_negativo is None:
+            permitir_estoque_negativo = self.permitir_estoque_negativo
+        
+        data_atual = datetime.now().strftime("%d/%m/%Y %H:%M:%S")
+        with self._escrita(imediata=True) as conn:
+            for item in itens:
+                self._baixar_estoque(conn, item['produto'], item['quantidade'],
+                                     permitir_estoque_negativo, data_atual)
+            ids = self._inserir_vendas(conn, itens, vendedor, observacoes)
+        return ids
+        
+    def vender(self, produto, quantidade, preco_unitario=0.0, vendedor='', observacoes='',
+               permitir_estoque_negativo=None):
+        """Baixa o estoque e registra a venda em uma única transação; retorna o id da venda"""
+        item = {'produto': produto, 'quantidade': quantidade, 'preco_unitario': preco_unitario}
+        return self.vender_lote([item], vendedor, observacoes, permitir_estoque_negativo)[0]
+            
     def listar_historico(self, limite=None):
         """Lista o histórico de vendas"""
-        query = "SELECT id, produto, quantidade, data_hora FROM historico_vendas ORDER BY id DESC"
+        query = f"SELECT {_SQL_COLUNAS_VENDA} FROM {_SQL_VENDAS_COM_PRODUTO} ORDER BY h.id DESC"
         if limite:
-            query += f" LIMIT {limite}"
+            return self.execute_query(query + " LIMIT ?", (limite,))
         return self.execute_query(query)
         
-    def listar_historico_completo(self, limite=None):
-        """Lista o histórico completo de vendas"""
-        query = """SELECT id, produto, quantidade, preco_unitario, valor_total, 
-                   data_hora, vendedor, observacoes FROM historico_vendas ORDER BY id DESC"""
-        if limite:
-            query += f" LIMIT {limite}"
-        return self.execute_query(query)
+    def listar_historico_completo(self, limite=None, incluir_arquivados=False):
+        """Lista o histórico completo de vendas (com incluir_arquivados, também os meses arquivados)"""
+        with closing(self.iter_historico(incluir_arquivados=incluir_arquivados)) as vendas:
+            return list(islice(vendas, limite))
+            
+    def iter_historico(self, filtro=None, tamanho_lote=1000, incluir_arquivados=False):
+        """
+        Percorre o histórico (mais recentes primeiro) lendo tamanho_lote linhas por vez.
+
+        Mesmas colunas de listar_historico_completo; filtro como em
+        pagina_historico. Os meses arquivados vêm depois, um de cada vez,
+        pulando os que estão fora do período do filtro.
+        """
+        where, params = _sql_filtro_historico(filtro, busca_fts=self.busca_fts)
+        query = f"SELECT {_SQL_COLUNAS_VENDA_COMPLETA} FROM {{origem}}{where} ORDER BY h.id DESC"
+        
+        with self.pool.leitura() as conn:
+            yield from _ler_em_lotes(conn.execute(query.format(origem=_SQL_VENDAS_COM_PRODUTO), params),
+                                     tamanho_lote)
+        if not incluir_arquivados:
+            return
+            
+        filtro = filtro or {}
+        with self.get_connection() as conn:
+            for _, _, caminho in reversed(self._arquivos_no_periodo(filtro.get('data_inicio'),
+                                                                     filtro.get('data_fim'))):
+                with anexar(conn, caminho):
+                    yield from _ler_em_lotes(conn.execute(query.format(origem=_SQL_VENDAS_ARQUIVADAS), params),
+                                             tamanho_lote)
+                    
+    def pagina_historico(self, apos_id=None, tamanho=100, filtro=None):
+        """
+        Uma página do histórico, das vendas mais recentes para as mais antigas.
+
+        Para a página seguinte, passe em apos_id o id da última venda
+        recebida. filtro aceita data_inicio, data_fim, produto (termo de
+        busca) e vendedor. Colunas: id, produto, quantidade, preco_unitario,
+        valor_total, data_hora, vendedor, observacoes.
+        """
+        where, params = _sql_filtro_historico(filtro, apos_id, self.busca_fts)
+        query = f"SELECT {_SQL_COLUNAS_VENDA_COMPLETA} FROM {_SQL_VENDAS_COM_PRODUTO}{where} ORDER BY h.id DESC LIMIT ?"
+        return self.execute_query(query, params + (tamanho,))
+        
+    def resumo_historico(self, filtro=None):
+        """Totais das vendas que atendem ao filtro: (num_vendas, itens, receita)"""
+        where, params = _sql_filtro_historico(filtro, busca_fts=self.busca_fts)
+        query = f"""SELECT COUNT(*), COALESCE(SUM(h.quantidade), 0), COALESCE(SUM(h.valor_total), 0)
+                    FROM {_SQL_VENDAS_COM_PRODUTO}{where}"""
+        return self.execute_query(query, params)[0]
         
     def buscar_vendas_por_produto(self, produto):
-        """Busca vendas de um produto específico"""
-        query = "SELECT id, produto, quantidade, data_hora FROM historico_vendas WHERE produto LIKE ? ORDER BY id DESC"
-        return self.execute_query(query, (f"%{produto}%",))
+        """Busca vendas de um produto específico (mesma busca de buscar_produtos)"""
+        condicao, params = _sql_vendas_do_produto(produto, self.busca_fts)
+        query = f"""SELECT {_SQL_COLUNAS_VENDA} FROM {_SQL_VENDAS_COM_PRODUTO}
+                    WHERE {condicao} ORDER BY h.id DESC"""
+        return self.execute_query(query, params)
         
     def obter_estatisticas_vendas(self):
-        """Obtém estatísticas de vendas por produto"""
-        query = """
-            SELECT produto, SUM(quantidade) as total_vendido, COUNT(*) as num_vendas
-            FROM historico_vendas 
-            GROUP BY produto 
+        """Obtém estatísticas de vendas por produto (meses ativos, sem os arquivados)"""
+        query = f"""
+            SELECT produto, total_vendido, num_vendas
+            FROM ({_sql_totais_por_produto()})
             ORDER BY total_vendido DESC
         """
         return self.execute_query(query)
         
     def obter_estatisticas_financeiras(self):
-        """Obtém estatísticas financeiras de vendas"""
-        query = """
-            SELECT produto, SUM(quantidade) as total_vendido, 
-                   SUM(valor_total) as receita_total, 
-                   AVG(preco_unitario) as preco_medio,
-                   COUNT(*) as num_vendas
-            FROM historico_vendas 
-            GROUP BY produto 
+        """Obtém estatísticas financeiras de vendas (meses ativos, sem os arquivados)"""
+        query = f"""
+            SELECT produto, total_vendido, receita_total, preco_medio, num_vendas
+            FROM ({_sql_totais_por_produto()})
             ORDER BY receita_total DESC
         """
         return self.execute_query(query)
         
     def obter_receita_total(self):
-        """Obtém a receita total de todas as vendas"""
-        query = "SELECT SUM(valor_total) FROM historico_vendas"
+        """Obtém a receita total de todas as vendas, inclusive dos meses arquivados"""
+        # O agregado de tamanho fixo já soma os meses arquivados
+        query = "SELECT SUM(receita) FROM vendas_semana_hora"
         result = self.execute_query(query)
         return result[0][0] if result and result[0][0] else 0.0
         
@@ -312,25 +719,12 @@ class DatabaseManager:
     def obter_receita_periodo(self, data_inicio, data_fim):
         """Obtém receita total de um período específico"""
         try:
-            # Converter datas DD/MM/YYYY para formato SQLite YYYY-MM-DD
-            def converter_data(data_str):
-                partes = data_str.split('/')
-                if len(partes) == 3:
-                    return f"{partes[2]}-{partes[1].zfill(2)}-{partes[0].zfill(2)}"
-                return data_str
-            
-            data_inicio_sql = converter_data(data_inicio)
-            data_fim_sql = converter_data(data_fim)
-            
             query = """
-                SELECT COALESCE(SUM(valor_total), 0) 
-                FROM historico_vendas 
-                WHERE DATE(SUBSTR(data_hora, 7, 4) || '-' || 
-                          SUBSTR(data_hora, 4, 2) || '-' || 
-                          SUBSTR(data_hora, 1, 2)) 
-                BETWEEN ? AND ?
+                SELECT COALESCE(SUM(receita), 0) 
+                FROM vendas_diarias 
+                WHERE dia BETWEEN ? AND ?
             """
-            result = self.execute_query(query, (data_inicio_sql, data_fim_sql))
+            result = self.execute_query(query, (_data_para_iso(data_inicio), _data_para_iso(data_fim)))
             return result[0][0] if result else 0.0
         except Exception as e:
             print(f"Erro ao obter receita do período: {e}")
@@ -339,42 +733,55 @@ class DatabaseManager:
     def contar_vendas_periodo(self, data_inicio, data_fim):
         """Conta número de vendas em um período"""
         try:
-            def converter_data(data_str):
-                partes = data_str.split('/')
-                if len(partes) == 3:
-                    return f"{partes[2]}-{partes[1].zfill(2)}-{partes[0].zfill(2)}"
-                return data_str
-            
-            data_inicio_sql = converter_data(data_inicio)
-            data_fim_sql = converter_data(data_fim)
-            
             query = """
-                SELECT COUNT(*) 
-                FROM historico_vendas 
-                WHERE DATE(SUBSTR(data_hora, 7, 4) || '-' || 
-                          SUBSTR(data_hora, 4, 2) || '-' || 
-                          SUBSTR(data_hora, 1, 2)) 
-                BETWEEN ? AND ?
+                SELECT COALESCE(SUM(num_vendas), 0) 
+                FROM vendas_diarias 
+                WHERE dia BETWEEN ? AND ?
             """
-            result = self.execute_query(query, (data_inicio_sql, data_fim_sql))
+            result = self.execute_query(query, (_data_para_iso(data_inicio), _data_para_iso(data_fim)))
             return result[0][0] if result else 0
         except Exception as e:
             print(f"Erro ao contar vendas do período: {e}")
             return 0
     
+    def contar_vendas_periodos(self, periodos):
+        """
+        Número de vendas de cada período [(data_inicio, data_fim)], dias inclusivos.
+
+        Uma única consulta ao agregado diário, limitada ao intervalo que
+        cobre todos os períodos; retorna as contagens na ordem recebida.
+        """
+        if not periodos:
+            return []
+        intervalos = [(_data_para_iso(inicio), _data_para_iso(fim)) for inicio, fim in periodos]
+        somas = ", ".join(["COALESCE(SUM(CASE WHEN dia BETWEEN ? AND ? THEN num_vendas END), 0)"] * len(intervalos))
+        params = [data for intervalo in intervalos for data in intervalo]
+        params += [min(inicio for inicio, _ in intervalos), max(fim for _, fim in intervalos)]
+        try:
+            query = f"SELECT {somas} FROM vendas_diarias WHERE dia BETWEEN ? AND ?"
+            return list(self.execute_query(query, params)[0])
+        except Exception as e:
+            print(f"Erro ao contar vendas dos períodos: {e}")
+            return [0] * len(periodos)
+    
+    def listar_vendas_periodo(self, data_inicio=None, data_fim=None):
+        """Lista vendas (id, produto, quantidade, data_hora) entre duas datas, inclusive"""
+        where, params = _sql_filtro_historico({'data_inicio': data_inicio, 'data_fim': data_fim})
+        query = f"SELECT {_SQL_COLUNAS_VENDA} FROM {_SQL_VENDAS_COM_PRODUTO}{where} ORDER BY h.id DESC"
+        return self.execute_query(query, params)
+    
     def obter_produto_mais_vendido(self):
         """Obtém o produto mais vendido do dia atual"""
         try:
-            hoje = datetime.now().strftime("%d/%m/%Y")
-            query = """
-                SELECT produto, SUM(quantidade) as total_vendido
-                FROM historico_vendas 
-                WHERE SUBSTR(data_hora, 1, 10) = ?
-                GROUP BY produto 
+            hoje = datetime.now().date()
+            query = f"""
+                SELECT produto, total_vendido
+                FROM ({_sql_totais_por_produto("data_iso >= ? AND data_iso < ?")})
                 ORDER BY total_vendido DESC 
                 LIMIT 1
             """
-            result = self.execute_query(query, (hoje,))
+            # Mesmo filtro nas vendas com e sem vínculo ao estoque
+            result = self.execute_query(query, _intervalo_iso(hoje, hoje) * 2)
             return result[0][0] if result else "Nenhum"
         except Exception as e:
             print(f"Erro ao obter produto mais vendido: {e}")
@@ -400,37 +807,104 @@ class DatabaseManager:
             print(f"Erro ao contar produtos com estoque baixo: {e}")
             return 0
     
+    def obter_snapshot_dashboard(self, limite_estoque_baixo=5, data=None):
+        """
+        Todos os números dos cartões e alertas do dashboard num mesmo snapshot.
+
+        Os números do dia (receita, vendas e produto mais vendido) vêm de
+        agregados_vendas, que só lê as vendas novas desde a última vez. O
+        mês, a semana passada e o estoque vêm de uma única consulta: um
+        trecho do agregado diário e uma leitura da tabela de estoque.
+        Retorna um DashboardSnapshot, ou None em caso de erro.
+        """
+        try:
+            hoje = data or datetime.now().date()
+            query = """
+                WITH periodos AS (
+                    SELECT
+                        COALESCE(SUM(CASE WHEN dia >= :inicio_mes THEN receita END), 0) AS receita_mes,
+                        COALESCE(SUM(CASE WHEN dia = :semana_passada THEN receita END), 0) AS receita_semana_passada
+                    FROM vendas_diarias
+                    WHERE dia BETWEEN MIN(:inicio_mes, :semana_passada) AND :hoje
+                ),
+                estoque_atual AS (
+                    SELECT COALESCE(SUM(quantidade * preco), 0) AS valor_estoque,
+                           COALESCE(SUM(quantidade < :limite), 0) AS produtos_estoque_baixo
+                    FROM estoque
+                )
+                SELECT valor_estoque, produtos_estoque_baixo, receita_mes, receita_semana_passada
+                FROM periodos, estoque_atual
+            """
+            params = {'hoje': _data_para_iso(hoje), 'inicio_mes': _data_para_iso(hoje.replace(day=1)),
+                      'semana_passada': _data_para_iso(hoje - timedelta(days=7)), 'limite': limite_estoque_baixo}
+            with self.leitura_consistente():
+                receita_hoje, vendas_hoje, produto_top = self.agregados_vendas.resumo_dia(hoje)
+                periodos_estoque = self.execute_query(query, params)[0]
+            valor_estoque, produtos_baixo, receita_mes, receita_semana_passada = periodos_estoque
+            return DashboardSnapshot(hoje, receita_hoje, vendas_hoje, produto_top, valor_estoque,
+                                     produtos_baixo, receita_mes, receita_semana_passada)
+        except Exception as e:
+            print(f"Erro ao obter snapshot do dashboard: {e}")
+            return None
+    
     def obter_vendas_ultimos_dias(self, dias=7):
         """Obtém dados de vendas dos últimos X dias"""
         try:
+            hoje = datetime.now().date()
+            inicio = _data_para_iso(hoje - timedelta(days=dias - 1))
             query = """
                 SELECT 
-                    SUBSTR(data_hora, 1, 10) as data,
-                    COALESCE(SUM(valor_total), 0) as receita,
+                    SUBSTR(dia, 9, 2) || '/' || SUBSTR(dia, 6, 2) || '/' || SUBSTR(dia, 1, 4) as data,
+                    COALESCE(SUM(receita), 0) as receita,
                     COALESCE(SUM(quantidade), 0) as quantidade_total
-                FROM historico_vendas 
-                GROUP BY SUBSTR(data_hora, 1, 10)
-                ORDER BY DATE(SUBSTR(data_hora, 7, 4) || '-' || 
-                            SUBSTR(data_hora, 4, 2) || '-' || 
-                            SUBSTR(data_hora, 1, 2)) DESC
-                LIMIT ?
+                FROM vendas_diarias 
+                WHERE dia BETWEEN ? AND ?
+                GROUP BY dia
+                ORDER BY dia
             """
-            result = self.execute_query(query, (dias,))
-            return result[::-1]  # Inverter para ordem cronológica
+            return self.execute_query(query, (inicio, _data_para_iso(hoje)))
         except Exception as e:
             print(f"Erro ao obter vendas dos últimos dias: {e}")
             return []
     
-    def obter_top_produtos_receita(self, limite=10):
-        """Obtém top produtos por receita total"""
+    def obter_resumo_mensal(self, meses=6):
+        """Obtém receita e número de vendas dos últimos X meses (inclui meses sem venda)"""
         try:
+            hoje = datetime.now().date()
+            chaves = []
+            ano, mes = hoje.year, hoje.month
+            for _ in range(meses):
+                chaves.append(f"{ano:04d}-{mes:02d}")
+                ano, mes = (ano - 1, 12) if mes == 1 else (ano, mes - 1)
+            chaves.reverse()
+            
             query = """
+                SELECT SUBSTR(dia, 1, 7) as mes, SUM(receita), SUM(num_vendas)
+                FROM vendas_diarias 
+                WHERE dia >= ?
+                GROUP BY SUBSTR(dia, 1, 7)
+            """
+            totais = {mes: (receita, vendas) for mes, receita, vendas
+                      in self.execute_query(query, (chaves[0] + "-01",))}
+            
+            resumo = []
+            for chave in chaves:
+                receita, vendas = totais.get(chave, (0.0, 0))
+                resumo.append({'mes': f"{chave[5:]}/{chave[:4]}", 'receita': receita, 'vendas': vendas})
+            return resumo
+        except Exception as e:
+            print(f"Erro ao obter resumo mensal: {e}")
+            return []
+    
+    def obter_top_produtos_receita(self, limite=10):
+        """Obtém top produtos por receita total dos meses ativos (sem os arquivados)"""
+        try:
+            query = f"""
                 SELECT 
                     produto,
-                    COALESCE(SUM(valor_total), 0) as receita_total,
-                    COALESCE(SUM(quantidade), 0) as quantidade_total
-                FROM historico_vendas 
-                GROUP BY produto 
+                    COALESCE(receita_total, 0) as receita_total,
+                    COALESCE(total_vendido, 0) as quantidade_total
+                FROM ({_sql_totais_por_produto()})
                 ORDER BY receita_total DESC 
                 LIMIT ?
             """
@@ -444,16 +918,86 @@ class DatabaseManager:
         """Obtém análise de vendas por horário do dia"""
         try:
             query = """
-                SELECT 
-                    CAST(SUBSTR(data_hora, 12, 2) AS INTEGER) as hora,
-                    COALESCE(SUM(valor_total), 0) as receita_hora
-                FROM historico_vendas 
-                WHERE LENGTH(data_hora) >= 13
-                GROUP BY CAST(SUBSTR(data_hora, 12, 2) AS INTEGER)
+                SELECT hora, COALESCE(SUM(receita), 0) as receita_hora
+                FROM vendas_semana_hora 
+                GROUP BY hora
                 ORDER BY hora
             """
-            result = self.execute_query(query)
-            return result
+            return self.execute_query(query)
         except Exception as e:
             print(f"Erro ao obter vendas por horário: {e}")
             return []
+    
+    def obter_cubo_horarios(self, data_inicio=None, data_fim=None, produto=None, medida='receita'):
+        """
+        Obtém a grade 7x24 (dia da semana x hora) de vendas.
+        
+        Linhas: 0 = segunda ... 6 = domingo. medida: 'receita', 'quantidade'
+        ou 'num_vendas'. Sem janela de datas lê o cubo fixo de todo o período;
+        com janela soma vendas_hora só nos dias pedidos. produto aceita nome
+        ou id do estoque.
+        """
+        if medida not in ('receita', 'quantidade', 'num_vendas'):
+            raise ValueError(f"Medida inválida: {medida}")
+        
+        grade = [[0.0] * 24 for _ in range(7)]
+        try:
+            condicoes = []
+            params = []
+            if produto is not None:
+                if isinstance(produto, int):
+                    produto_id = produto
+                else:
+                    linha = self.execute_query("SELECT id FROM estoque WHERE produto = ?", (produto,))
+                    if not linha:
+                        return grade
+                    produto_id = linha[0][0]
+                condicoes.append("produto_id = ?")
+                params.append(produto_id)
+            
+            if data_inicio is None and data_fim is None:
+                query = f"SELECT dia_semana, hora, SUM({medida}) FROM vendas_semana_hora"
+                agrupamento = " GROUP BY dia_semana, hora"
+            else:
+                # Mesma convenção do cubo fixo: 0 = segunda
+                query = f"""SELECT (CAST(STRFTIME('%w', dia) AS INTEGER) + 6) % 7, hora, SUM({medida})
+                            FROM vendas_hora"""
+                agrupamento = " GROUP BY 1, hora"
+                if data_inicio is not None:
+                    condicoes.append("dia >= ?")
+                    params.append(_data_para_iso(data_inicio))
+                if data_fim is not None:
+                    condicoes.append("dia <= ?")
+                    params.append(_data_para_iso(data_fim))
+            
+            if condicoes:
+                query += " WHERE " + " AND ".join(condicoes)
+            for dia_semana, hora, valor in self.execute_query(query + agrupamento, tuple(params)):
+                if 0 <= dia_semana <= 6 and 0 <= hora <= 23:
+                    grade[dia_semana][hora] = float(valor or 0)
+            return grade
+        except Exception as e:
+            print(f"Erro ao obter cubo de horários: {e}")
+            return grade
+
+
+# Instâncias compartilhadas por arquivo de banco (uma por processo)
+_bancos = {}
+_lock_bancos = threading.Lock()
+
+
+def obter_banco(db_path="data/banco.db", **opcoes):
+    """
+    Retorna o DatabaseManager compartilhado do processo para db_path.
+    
+    Só a primeira chamada abre o pool e verifica o esquema; as opções
+    (perfil, max_leitores...) valem apenas para essa criação. Depois de
+    fechar(), a próxima chamada cria uma nova instância.
+    """
+    chave = os.path.abspath(db_path)
+    with _lock_bancos:
+        banco = _bancos.get(chave)
+        if banco is None:
+            banco = DatabaseManager(db_path, **opcoes)
+            _bancos[chave] = banco
+        return banco
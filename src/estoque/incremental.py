@@ -0,0 +1,212 @@
+"""
+Totais de vendas em memória atualizados pelas vendas novas (marca d'água no id)
+"""
+
+import threading
+from datetime import date, datetime, timedelta
+
+
+TABELA_ALTERACOES = 'alteracoes_tabelas'
+
+# Colunas de historico_vendas que entram nos totais: só mudanças nelas
+# obrigam a recalcular tudo (vendedor/observações não contam)
+_COLUNAS_TOTAIS = ('produto', 'quantidade', 'valor_total', 'data_iso', 'produto_id')
+
+
+def criar_contador_alteracoes(cursor):
+    """
+    Cria o contador de alterações de historico_vendas e os triggers que o mantêm.
+
+    Inserções não contam (são lidas pela marca d'água do id); UPDATE das
+    colunas dos totais e DELETE somam 1, avisando quem guarda totais em
+    memória que eles precisam ser recalculados. A migração 7 recria o
+    trigger de UPDATE sem contar preenchimentos (NULL -> valor).
+    """
+    cursor.execute(f'''
+        CREATE TABLE IF NOT EXISTS {TABELA_ALTERACOES} (
+            tabela TEXT PRIMARY KEY,
+            alteracoes INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+    cursor.execute(f"INSERT OR IGNORE INTO {TABELA_ALTERACOES} (tabela) VALUES ('historico_vendas')")
+    somar = f"UPDATE {TABELA_ALTERACOES} SET alteracoes = alteracoes + 1 WHERE tabela = 'historico_vendas';"
+    for nome in ('trg_historico_vendas_alteracao', 'trg_historico_vendas_remocao'):
+        cursor.execute(f"DROP TRIGGER IF EXISTS {nome}")
+    cursor.execute(f'''
+        CREATE TRIGGER trg_historico_vendas_alteracao
+        AFTER UPDATE OF {', '.join(_COLUNAS_TOTAIS)} ON historico_vendas
+        BEGIN {somar} END
+    ''')
+    cursor.execute(f"CREATE TRIGGER trg_historico_vendas_remocao AFTER DELETE ON historico_vendas BEGIN {somar} END")
+
+
+class AgregadosVendas:
+    """
+    Totais do dashboard mantidos em memória a partir das vendas novas.
+
+    Guarda a receita e o número de vendas do dia, a quantidade do dia por
+    produto, receita e quantidade por produto de todo o histórico ativo e a
+    grade 7x24 (dia da semana x hora) de receita. A cada atualização lê
+    só as vendas com id acima do último visto e as soma aos totais; o
+    custo depende do número de vendas novas, não do tamanho do histórico.
+    Tudo é recalculado quando o contador de alterações muda (UPDATE/DELETE
+    no histórico, ex.: arquivamento ou correção de venda) ou o dia muda.
+
+    Todos os totais cobrem só os meses ativos (historico_vendas), como
+    obter_top_produtos_receita: os meses arquivados ficam de fora tanto do
+    ranking de produtos quanto da grade, que descrevem o mesmo período.
+
+    Os produtos ligados ao estoque são guardados pelo id e exibidos com o
+    nome atual do catálogo, como em _sql_totais_por_produto.
+    """
+
+    def __init__(self, db):
+        self.db = db
+        self._lock = threading.Lock()
+        self._ultimo_id = None  # None = recalcular tudo
+        self._alteracoes = None
+        self._dia = None
+        self._totais = {}          # chave -> [receita, quantidade]
+        self._hoje = [0.0, 0]      # receita, número de vendas
+        self._hoje_produtos = {}   # chave -> quantidade
+        self._cubo = [[0.0] * 24 for _ in range(7)]
+        # Diagnóstico: recálculos completos e vendas somadas incrementalmente
+        self.recalculos = 0
+        self.vendas_incrementais = 0
+
+    def invalidar(self):
+        """Descarta os totais; a próxima leitura recalcula tudo"""
+        with self._lock:
+            self._ultimo_id = None
+
+    def atualizar(self, dia=None):
+        """Traz os totais até o estado atual do banco (dia: data de 'hoje', padrão a atual)"""
+        dia = _data_iso(dia or date.today())
+        with self._lock, self.db.leitura_consistente():
+            alteracoes, ultimo_id = self.db.execute_query(f"""
+                SELECT (SELECT alteracoes FROM {TABELA_ALTERACOES} WHERE tabela = 'historico_vendas'),
+                       (SELECT COALESCE(MAX(id), 0) FROM historico_vendas)
+            """)[0]
+            if self._ultimo_id is None or alteracoes != self._alteracoes or dia != self._dia:
+                self._recalcular(dia, ultimo_id)
+            elif ultimo_id > self._ultimo_id:
+                novas = self.db.execute_query(
+                    """SELECT produto_id, produto, quantidade, valor_total, data_iso
+                       FROM historico_vendas WHERE id > ? AND id <= ?""",
+                    (self._ultimo_id, ultimo_id)
+                )
+                for venda in novas:
+                    self._somar(*venda)
+                self.vendas_incrementais += len(novas)
+            self._ultimo_id = ultimo_id
+            self._alteracoes = alteracoes
+            self._dia = dia
+
+    def _recalcular(self, dia, ultimo_id):
+        """Recalcula todos os totais até a venda ultimo_id"""
+        self._totais = {}
+        for produto_id, produto, receita, quantidade in self.db.execute_query(
+            """SELECT produto_id, NULL, SUM(valor_total), SUM(quantidade)
+               FROM historico_vendas WHERE produto_id IS NOT NULL AND id <= ? GROUP BY produto_id
+               UNION ALL
+               SELECT NULL, produto, SUM(valor_total), SUM(quantidade)
+               FROM historico_vendas WHERE produto_id IS NULL AND id <= ? GROUP BY produto""",
+            (ultimo_id, ultimo_id)
+        ):
+            self._totais[_chave(produto_id, produto)] = [receita or 0.0, quantidade or 0]
+
+        self._hoje = [0.0, 0]
+        self._hoje_produtos = {}
+        fim = _data_iso(datetime.strptime(dia, "%Y-%m-%d") + timedelta(days=1))
+        for produto_id, produto, quantidade, valor_total in self.db.execute_query(
+            """SELECT produto_id, produto, quantidade, valor_total FROM historico_vendas
+               WHERE data_iso >= ? AND data_iso < ? AND id <= ?""",
+            (dia, fim, ultimo_id)
+        ):
+            self._somar_ao_dia(_chave(produto_id, produto), quantidade, valor_total)
+
+        # Grade lida do próprio histórico, como o ranking (vendas_semana_hora
+        # também soma os meses arquivados); 0 = segunda, como nos agregados
+        self._cubo = [[0.0] * 24 for _ in range(7)]
+        for dia_semana, hora, receita in self.db.execute_query(
+            """SELECT (CAST(STRFTIME('%w', data_iso) AS INTEGER) + 6) % 7,
+                      CAST(SUBSTR(data_iso, 12, 2) AS INTEGER), SUM(valor_total)
+               FROM historico_vendas WHERE data_iso IS NOT NULL AND id <= ? GROUP BY 1, 2""",
+            (ultimo_id,)
+        ):
+            if 0 <= dia_semana <= 6 and 0 <= hora <= 23:
+                self._cubo[dia_semana][hora] = float(receita or 0)
+        self.recalculos += 1
+
+    def _somar(self, produto_id, produto, quantidade, valor_total, data_iso):
+        """Soma uma venda nova a todos os totais"""
+        chave = _chave(produto_id, produto)
+        total = self._totais.setdefault(chave, [0.0, 0])
+        total[0] += valor_total or 0.0
+        total[1] += quantidade
+        if not data_iso:
+            return
+        if data_iso[:10] == self._dia:
+            self._somar_ao_dia(chave, quantidade, valor_total)
+        # Mesma convenção dos agregados: 0 = segunda
+        dia_semana = datetime.strptime(data_iso[:10], "%Y-%m-%d").weekday()
+        self._cubo[dia_semana][int(data_iso[11:13] or 0)] += valor_total or 0.0
+
+    def _somar_ao_dia(self, chave, quantidade, valor_total):
+        """Soma uma venda aos totais do dia"""
+        self._hoje[0] += valor_total or 0.0
+        self._hoje[1] += 1
+        self._hoje_produtos[chave] = self._hoje_produtos.get(chave, 0) + quantidade
+
+    def _por_nome(self, valores):
+        """Soma os valores {chave: valor} pelo nome exibido de cada produto"""
+        nomes = self.db.catalogo.derivado('nomes_por_id', lambda registros: {r[0]: r[1] for r in registros})
+        por_nome = {}
+        for (tipo, valor), total in valores.items():
+            nome = nomes.get(valor) if tipo == 'id' else valor
+            if nome is None:
+                continue
+            if isinstance(total, list):
+                acumulado = por_nome.setdefault(nome, [0.0, 0])
+                acumulado[0] += total[0]
+                acumulado[1] += total[1]
+            else:
+                por_nome[nome] = por_nome.get(nome, 0) + total
+        return por_nome
+
+    def resumo_dia(self, dia=None):
+        """(receita, número de vendas, produto mais vendido ou "Nenhum") do dia"""
+        self.atualizar(dia)
+        with self._lock:
+            receita, vendas = self._hoje
+            quantidades = self._por_nome(self._hoje_produtos)
+        produto_top = max(quantidades, key=quantidades.get) if quantidades else "Nenhum"
+        return receita, vendas, produto_top
+
+    def top_produtos(self, limite=10):
+        """Produtos com maior receita: [(produto, receita, quantidade)], como obter_top_produtos_receita"""
+        self.atualizar()
+        with self._lock:
+            totais = self._por_nome(self._totais)
+        ordenados = sorted(totais.items(), key=lambda item: item[1][0], reverse=True)
+        return [(produto, receita, quantidade) for produto, (receita, quantidade) in ordenados[:limite]]
+
+    def cubo_horarios(self):
+        """Grade 7x24 de receita dos meses ativos (obter_cubo_horarios() inclui os arquivados)"""
+        self.atualizar()
+        with self._lock:
+            return [list(linha) for linha in self._cubo]
+
+    def fechar(self):
+        """Esquece os totais calculados"""
+        self.invalidar()
+
+
+def _chave(produto_id, produto):
+    """Chave dos totais: id do estoque ou, para vendas sem vínculo, o nome gravado"""
+    return ('id', produto_id) if produto_id is not None else ('nome', produto)
+
+
+def _data_iso(data):
+    """date/datetime ou texto 'YYYY-MM-DD' -> 'YYYY-MM-DD'"""
+    return data.strftime("%Y-%m-%d") if hasattr(data, 'strftime') else str(data)[:10]
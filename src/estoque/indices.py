@@ -0,0 +1,98 @@
+"""
+Conjunto gerenciado de índices secundários do banco de dados
+"""
+
+import sqlite3
+
+
+# (nome, tabela, colunas, único[, condição de índice parcial])
+# Colunas extras no fim do índice tornam-no "covering": as agregações do
+# dashboard são respondidas só pelo índice, sem ler as linhas da tabela.
+# Índices de tabelas/colunas inexistentes no banco atual são ignorados.
+INDICES_GERENCIADOS = [
+    # Busca por nome em toda troca de combobox/consulta de produto
+    ('idx_estoque_produto', 'estoque', ('produto',), True),
+    # Leitura do código de barras no caixa; produtos sem código ('') ficam fora do índice
+    ('idx_estoque_codigo_barras', 'estoque', ('codigo_barras',), True, "codigo_barras <> ''"),
+    # Estoque baixo (quantidade < ?) e valor total do estoque (quantidade * preco)
+    ('idx_estoque_quantidade', 'estoque', ('quantidade', 'preco'), False),
+
+    # Receita/contagem por período
+    ('idx_historico_data_iso', 'historico_vendas', ('data_iso', 'valor_total'), False),
+    # Estatísticas agrupadas por produto_id (SUM/AVG sem ler a tabela);
+    # também serve à FK produto_id -> estoque.id
+    ('idx_historico_produto_id', 'historico_vendas',
+     ('produto_id', 'quantidade', 'valor_total', 'preco_unitario'), False),
+    # Vendas sem vínculo com o estoque: agrupadas pelo nome gravado na venda
+    ('idx_historico_sem_produto', 'historico_vendas',
+     ('produto', 'quantidade', 'valor_total', 'preco_unitario'), False, 'produto_id IS NULL'),
+
+    # Contas em aberto/pagas ordenadas por data
+    ('idx_contas_pago_data_venda', 'contas_abertas', ('pago', 'data_venda'), False),
+    ('idx_contas_pago_data_pagamento', 'contas_abertas', ('pago', 'data_pagamento'), False),
+    # Baixa e exclusão de conta pelo cliente/produto
+    ('idx_contas_cliente_produto', 'contas_abertas', ('cliente_nome', 'produto'), False),
+    ('idx_contas_produto_id', 'contas_abertas', ('produto_id',), False),
+    ('idx_contas_sem_produto', 'contas_abertas', ('produto',), False, 'produto_id IS NULL'),
+
+    # Resumo do caixa por tipo de movimentação
+    ('idx_movimentacoes_caixa', 'movimentacoes_caixa', ('caixa_id', 'tipo', 'valor'), False),
+    ('idx_movimentacoes_data_hora', 'movimentacoes_caixa', ('data_hora',), False),
+
+    # Caixa aberto mais recente
+    ('idx_caixa_status', 'caixa', ('status', 'data_abertura'), False),
+
+    # Exclusão do registro de um backup pelo nome do arquivo
+    ('idx_backups_nome_arquivo', 'backups', ('nome_arquivo',), False),
+]
+
+
+# Índices substituídos por outros do conjunto acima
+INDICES_OBSOLETOS = [
+    'idx_historico_produto',  # agrupamento por nome -> idx_historico_produto_id
+    'idx_historico_data_venda',  # histórico de main_funcional.py, unificado -> idx_historico_data_iso
+]
+
+
+def _colunas(cursor, tabela):
+    """Retorna o conjunto de colunas de uma tabela (vazio se não existir)"""
+    cursor.execute(f"PRAGMA table_info({tabela})")
+    return {coluna[1] for coluna in cursor.fetchall()}
+
+
+def criar_indices(cursor):
+    """Cria os índices gerenciados que se aplicam ao esquema atual"""
+    return aplicar_indices(cursor, INDICES_GERENCIADOS, INDICES_OBSOLETOS)
+
+
+def aplicar_indices(cursor, indices, obsoletos=()):
+    """
+    Remove os índices obsoletos e cria os da lista informada (mesmo formato
+    de INDICES_GERENCIADOS) que se aplicam ao esquema atual.
+
+    As migrações passam listas próprias e fixas; retorna os nomes criados.
+    """
+    for nome in obsoletos:
+        cursor.execute(f"DROP INDEX IF EXISTS {nome}")
+
+    criados = []
+    for nome, tabela, colunas, unico, *condicao in indices:
+        existentes = _colunas(cursor, tabela)
+        if not existentes or not set(colunas) <= existentes:
+            continue
+
+        definicao = f"{nome} ON {tabela} ({', '.join(colunas)})"
+        if condicao:
+            definicao += f" WHERE {condicao[0]}"
+        if unico:
+            try:
+                cursor.execute(f"CREATE UNIQUE INDEX IF NOT EXISTS {definicao}")
+            except sqlite3.IntegrityError:
+                # Banco antigo com valores repetidos: mantém a busca indexada sem a restrição
+                print(f"Aviso: valores duplicados em {tabela}({', '.join(colunas)}); "
+                      f"índice {nome} criado sem UNIQUE")
+                cursor.execute(f"CREATE INDEX IF NOT EXISTS {definicao}")
+        else:
+            cursor.execute(f"CREATE INDEX IF NOT EXISTS {definicao}")
+        criados.append(nome)
+    return criados
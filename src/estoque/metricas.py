@@ -0,0 +1,94 @@
+"""
+Cache das métricas do dashboard, válido enquanto o banco não muda
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+
+
+# Segundos que um valor vale mesmo sem nenhuma gravação no banco
+TTL_METRICAS_PADRAO = 30.0
+
+
+class CacheMetricas:
+    """
+    Valores de métricas por (métrica, período), recalculados só quando preciso.
+
+    Uma entrada deixa de valer quando:
+    - pool.versao_dados() muda (outra conexão gravou no banco, até outro processo);
+    - invalidar() é chamado (toda escrita feita pelo próprio pool);
+    - passa o TTL desde o cálculo (ttl=None: sem vencimento).
+
+    Dentro de rodada() a versão é conferida uma única vez, na entrada, e cada
+    métrica é calculada no máximo uma vez. Abra a rodada antes de
+    leitura_consistente(): assim nenhum valor fica registrado com uma versão
+    mais nova que o snapshot de onde foi lido.
+    """
+
+    def __init__(self, pool, ttl=TTL_METRICAS_PADRAO):
+        self.pool = pool
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._valores = {}  # (metrica, periodo) -> (valor, calculado_em)
+        self._versao_dados = None
+        # Muda a cada limpeza: cálculo iniciado antes dela não é guardado
+        self._geracao = 0
+        self._local = threading.local()
+        # Métricas efetivamente calculadas (não servidas do cache)
+        self.calculos = 0
+
+    def invalidar(self, metrica=None):
+        """Descarta todas as métricas, ou só as de um nome"""
+        with self._lock:
+            if metrica is None:
+                self._valores.clear()
+            else:
+                for chave in [chave for chave in self._valores if chave[0] == metrica]:
+                    del self._valores[chave]
+            self._geracao += 1
+
+    def _conferir_versao(self):
+        """Limpa o cache se o banco mudou desde a última conferência"""
+        versao = self.pool.versao_dados()
+        with self._lock:
+            if versao != self._versao_dados:
+                self._valores.clear()
+                self._versao_dados = versao
+                self._geracao += 1
+
+    @contextmanager
+    def rodada(self):
+        """Bloco de uma atualização completa (ex.: do dashboard)"""
+        if getattr(self._local, 'em_rodada', False):
+            yield self
+            return
+        self._conferir_versao()
+        self._local.em_rodada = True
+        try:
+            yield self
+        finally:
+            self._local.em_rodada = False
+
+    def obter(self, metrica, periodo, calcular, *args):
+        """
+        Valor da métrica no período (qualquer valor hashable: datas, limite...).
+
+        Vem do cache se ainda vale; senão chama calcular(*args) e guarda.
+        """
+        if not getattr(self._local, 'em_rodada', False):
+            self._conferir_versao()
+        chave = (metrica, periodo)
+        with self._lock:
+            entrada = self._valores.get(chave)
+            if entrada is not None and (self.ttl is None or time.monotonic() - entrada[1] < self.ttl):
+                return entrada[0]
+            geracao = self._geracao
+
+        calculado_em = time.monotonic()
+        valor = calcular(*args)
+        with self._lock:
+            self.calculos += 1
+            if geracao == self._geracao:
+                self._valores[chave] = (valor, calculado_em)
+        return valor
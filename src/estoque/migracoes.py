@@ -0,0 +1,404 @@
+"""
+Migrações versionadas do esquema do banco (PRAGMA user_version)
+"""
+
+from datetime import datetime
+
+from .agregados import AGREGADOS, criar_agregados, reconstruir_agregado
+from .busca import criar_indice_busca
+from .incremental import criar_contador_alteracoes
+from .indices import aplicar_indices
+from .referencias import adicionar_colunas_produto_id, vincular_produtos
+
+
+# Converte data_hora ('DD/MM/YYYY HH:MM:SS') para data_iso ('YYYY-MM-DD HH:MM:SS'),
+# que é ordenável como texto e pode ser servida por índice em consultas por período
+_SQL_DATA_ISO = """
+    CASE
+        WHEN {col} GLOB '[0-9][0-9]/[0-9][0-9]/[0-9][0-9][0-9][0-9]*'
+            THEN SUBSTR({col}, 7, 4) || '-' || SUBSTR({col}, 4, 2) || '-' ||
+                 SUBSTR({col}, 1, 2) || SUBSTR({col}, 11)
+        WHEN {col} GLOB '[0-9][0-9][0-9][0-9]-[0-9][0-9]-[0-9][0-9]*'
+            THEN {col}
+    END
+"""
+
+# id é a chave referenciada por produto_id nas tabelas de vendas
+_SQL_CRIAR_ESTOQUE = """
+    CREATE TABLE {nome} (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        produto TEXT NOT NULL,
+        quantidade INTEGER NOT NULL DEFAULT 0,
+        preco REAL DEFAULT 0.0,
+        categoria TEXT DEFAULT 'Geral',
+        codigo_barras TEXT DEFAULT '',
+        data_cadastro TEXT DEFAULT '',
+        data_atualizacao TEXT DEFAULT ''
+    )
+"""
+
+_SQL_CRIAR_HISTORICO = """
+    CREATE TABLE {nome} (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        produto TEXT NOT NULL,
+        quantidade INTEGER NOT NULL,
+        preco_unitario REAL DEFAULT 0.0,
+        valor_total REAL DEFAULT 0.0,
+        data_hora TEXT NOT NULL,
+        vendedor TEXT DEFAULT '',
+        observacoes TEXT DEFAULT '',
+        data_iso TEXT,
+        produto_id INTEGER REFERENCES estoque(id) ON DELETE SET NULL
+    )
+"""
+
+# Tabelas de crediário, caixa e backups (vindas de main_funcional.py)
+_SQL_TABELAS_OPERACAO = [
+    """
+    CREATE TABLE IF NOT EXISTS contas_abertas (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        cliente_nome TEXT NOT NULL,
+        cliente_telefone TEXT,
+        produto TEXT NOT NULL,
+        quantidade INTEGER NOT NULL,
+        preco_unitario REAL NOT NULL,
+        total REAL NOT NULL,
+        data_venda TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        data_vencimento DATE,
+        pago BOOLEAN DEFAULT FALSE,
+        data_pagamento TIMESTAMP,
+        observacoes TEXT,
+        produto_id INTEGER REFERENCES estoque(id) ON DELETE SET NULL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS caixa (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        data_abertura TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        data_fechamento TIMESTAMP,
+        valor_inicial REAL NOT NULL,
+        valor_vendas REAL DEFAULT 0.0,
+        valor_sangria REAL DEFAULT 0.0,
+        valor_reforco REAL DEFAULT 0.0,
+        valor_final REAL DEFAULT 0.0,
+        funcionario TEXT NOT NULL,
+        status TEXT DEFAULT 'ABERTO',
+        observacoes TEXT
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS movimentacoes_caixa (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        caixa_id INTEGER,
+        tipo TEXT NOT NULL,
+        valor REAL NOT NULL,
+        descricao TEXT,
+        data_hora TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        funcionario TEXT NOT NULL,
+        FOREIGN KEY (caixa_id) REFERENCES caixa (id)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS backups (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        nome_arquivo TEXT NOT NULL,
+        caminho_arquivo TEXT NOT NULL,
+        data_backup TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        tamanho_mb REAL,
+        tipo TEXT NOT NULL,
+        status TEXT DEFAULT 'CONCLUIDO'
+    )
+    """,
+]
+
+
+# Índices criados por cada passo, congelados como eram quando o passo foi escrito:
+# mudanças em INDICES_GERENCIADOS não alteram o que um passo antigo faz.
+# (nome, tabela, colunas, único[, condição]), como em indices.py
+_INDICES_ESTOQUE = [
+    ('idx_estoque_produto', 'estoque', ('produto',), True),
+    ('idx_estoque_quantidade', 'estoque', ('quantidade', 'preco'), False),
+]
+
+_INDICES_HISTORICO = [
+    ('idx_historico_data_iso', 'historico_vendas', ('data_iso', 'valor_total'), False),
+    ('idx_historico_produto_id', 'historico_vendas',
+     ('produto_id', 'quantidade', 'valor_total', 'preco_unitario'), False),
+    ('idx_historico_sem_produto', 'historico_vendas',
+     ('produto', 'quantidade', 'valor_total', 'preco_unitario'), False, 'produto_id IS NULL'),
+]
+
+_INDICES_OPERACAO = [
+    ('idx_contas_pago_data_venda', 'contas_abertas', ('pago', 'data_venda'), False),
+    ('idx_contas_pago_data_pagamento', 'contas_abertas', ('pago', 'data_pagamento'), False),
+    ('idx_contas_cliente_produto', 'contas_abertas', ('cliente_nome', 'produto'), False),
+    ('idx_contas_produto_id', 'contas_abertas', ('produto_id',), False),
+    ('idx_contas_sem_produto', 'contas_abertas', ('produto',), False, 'produto_id IS NULL'),
+    ('idx_movimentacoes_caixa', 'movimentacoes_caixa', ('caixa_id', 'tipo', 'valor'), False),
+    ('idx_movimentacoes_data_hora', 'movimentacoes_caixa', ('data_hora',), False),
+    ('idx_caixa_status', 'caixa', ('status', 'data_abertura'), False),
+]
+
+_INDICES_SUBSTITUIDOS = ['idx_historico_produto', 'idx_historico_data_venda']
+
+
+def _colunas(cursor, tabela):
+    """Retorna o conjunto de colunas de uma tabela (vazio se não existir)"""
+    cursor.execute(f"PRAGMA table_info({tabela})")
+    return {coluna[1] for coluna in cursor.fetchall()}
+
+
+# === AUXILIARES DOS PASSOS ===
+
+def _completar_estoque(cursor):
+    """Acrescenta colunas de versões antigas e garante id numérico em estoque"""
+    colunas = _colunas(cursor, 'estoque')
+    if not colunas:
+        return
+    for coluna, definicao in [('preco', 'REAL DEFAULT 0.0'), ('categoria', "TEXT DEFAULT 'Geral'"),
+                              ('codigo_barras', "TEXT DEFAULT ''"), ('data_cadastro', "TEXT DEFAULT ''"),
+                              ('data_atualizacao', "TEXT DEFAULT ''")]:
+        if coluna not in colunas:
+            cursor.execute(f"ALTER TABLE estoque ADD COLUMN {coluna} {definicao}")
+    if 'id' not in colunas:
+        # Estoque antigo com produto como chave: id = rowid preserva a ordem de cadastro
+        cursor.execute("ALTER TABLE estoque RENAME TO estoque_sem_id")
+        cursor.execute(_SQL_CRIAR_ESTOQUE.format(nome='estoque'))
+        cursor.execute('''
+            INSERT INTO estoque (id, produto, quantidade, preco, categoria, codigo_barras,
+                                 data_cadastro, data_atualizacao)
+            SELECT rowid, produto, quantidade, preco, categoria, codigo_barras,
+                   data_cadastro, data_atualizacao
+            FROM estoque_sem_id
+        ''')
+        cursor.execute("DROP TABLE estoque_sem_id")
+
+
+def _completar_historico(cursor):
+    """Acrescenta colunas de versões antigas do histórico no formato de src/"""
+    colunas = _colunas(cursor, 'historico_vendas')
+    if not colunas:
+        return
+    for coluna, definicao in [('preco_unitario', 'REAL DEFAULT 0.0'), ('valor_total', 'REAL DEFAULT 0.0'),
+                              ('vendedor', "TEXT DEFAULT ''"), ('observacoes', "TEXT DEFAULT ''"),
+                              ('data_iso', 'TEXT')]:
+        if coluna not in colunas:
+            cursor.execute(f"ALTER TABLE historico_vendas ADD COLUMN {coluna} {definicao}")
+    cursor.execute('''
+        UPDATE historico_vendas
+        SET preco_unitario = COALESCE(preco_unitario, 0.0), valor_total = COALESCE(valor_total, 0.0)
+        WHERE preco_unitario IS NULL OR valor_total IS NULL
+    ''')
+
+
+def _unificar_historico(cursor):
+    """
+    Converte o histórico no formato de main_funcional.py (total, data_venda em UTC)
+    para o formato canônico (valor_total, data_hora/data_iso no horário local).
+
+    Retorna True se houve conversão.
+    """
+    colunas = _colunas(cursor, 'historico_vendas')
+    if not colunas or 'data_hora' in colunas:
+        return False
+
+    valor = "quantidade * COALESCE(preco_unitario, 0.0)"
+    if 'total' in colunas:
+        valor = f"COALESCE(total, {valor})"
+    momento = "COALESCE(data_venda, CURRENT_TIMESTAMP)" if 'data_venda' in colunas else "CURRENT_TIMESTAMP"
+    produto_id = "produto_id" if 'produto_id' in colunas else "NULL"
+    if 'id' in _colunas(cursor, 'estoque'):
+        produto_id = (f"COALESCE({produto_id}, "
+                      f"(SELECT id FROM estoque WHERE estoque.produto = historico_vendas.produto))")
+
+    cursor.execute(_SQL_CRIAR_HISTORICO.format(nome='historico_vendas_unificado'))
+    cursor.execute(f'''
+        INSERT INTO historico_vendas_unificado
+            (id, produto, quantidade, preco_unitario, valor_total, data_hora, data_iso, produto_id)
+        SELECT id, produto, quantidade, COALESCE(preco_unitario, 0.0), {valor},
+               STRFTIME('%d/%m/%Y %H:%M:%S', {momento}, 'localtime'),
+               DATETIME({momento}, 'localtime'),
+               {produto_id}
+        FROM historico_vendas
+    ''')
+    # Sem reescrever triggers de outras tabelas que citam historico_vendas
+    cursor.execute("PRAGMA legacy_alter_table = ON")
+    try:
+        cursor.execute("DROP TABLE historico_vendas")
+        cursor.execute("ALTER TABLE historico_vendas_unificado RENAME TO historico_vendas")
+    finally:
+        cursor.execute("PRAGMA legacy_alter_table = OFF")
+    return True
+
+
+def _preparar_data_iso(cursor):
+    """Cria os triggers de data_iso e preenche registros antigos"""
+    # Garante data_iso mesmo para quem insere/edita sem informá-la
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_historico_data_iso_insert
+        AFTER INSERT ON historico_vendas
+        WHEN NEW.data_iso IS NULL
+        BEGIN
+            UPDATE historico_vendas SET data_iso = {_SQL_DATA_ISO.format(col="NEW.data_hora")}
+            WHERE id = NEW.id;
+        END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_historico_data_iso_update
+        AFTER UPDATE OF data_hora ON historico_vendas
+        BEGIN
+            UPDATE historico_vendas SET data_iso = {_SQL_DATA_ISO.format(col="NEW.data_hora")}
+            WHERE id = NEW.id;
+        END
+    ''')
+
+    # Backfill: usa o próprio índice (data_iso IS NULL), barato quando já migrado
+    cursor.execute(f'''
+        UPDATE historico_vendas SET data_iso = {_SQL_DATA_ISO.format(col="data_hora")}
+        WHERE data_iso IS NULL
+    ''')
+
+
+def _estrutura_derivada(cursor, indices, tabelas_sem_vinculo=(), reconstruir=False):
+    """Índices do passo, vínculos por produto_id, data_iso e agregados sobre as tabelas atuais"""
+    # Índices secundários antes dos backfills, que usam idx_historico_data_iso
+    aplicar_indices(cursor, indices, _INDICES_SUBSTITUIDOS)
+    vincular_produtos(cursor, tabelas_sem_vinculo)
+    _preparar_data_iso(cursor)
+
+    # Agregados mantidos por triggers (backfill na criação ou quando os dados mudaram)
+    novas = criar_agregados(cursor)
+    for tabela in (AGREGADOS if reconstruir or tabelas_sem_vinculo else novas):
+        reconstruir_agregado(cursor, tabela)
+
+
+# === PASSOS ===
+
+def _m001_estrutura_base(cursor):
+    """Estoque, histórico de vendas e configurações, com índices e agregados"""
+    _completar_estoque(cursor)
+    _unificar_historico(cursor)
+    _completar_historico(cursor)
+
+    cursor.execute(_SQL_CRIAR_ESTOQUE.format(nome='IF NOT EXISTS estoque'))
+    cursor.execute(_SQL_CRIAR_HISTORICO.format(nome='IF NOT EXISTS historico_vendas'))
+    tabelas_sem_vinculo = adicionar_colunas_produto_id(cursor)
+
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS configuracoes (
+            chave TEXT PRIMARY KEY,
+            valor TEXT NOT NULL,
+            data_atualizacao TEXT DEFAULT ''
+        )
+    ''')
+    agora = datetime.now().strftime("%d/%m/%Y %H:%M:%S")
+    cursor.executemany('''
+        INSERT OR IGNORE INTO configuracoes (chave, valor, data_atualizacao) VALUES (?, ?, ?)
+    ''', [('versao_sistema', '2.0.0', agora), ('nome_empresa', 'Minha Lanchonete', agora),
+          ('moeda', 'R$', agora)])
+
+    _estrutura_derivada(cursor, _INDICES_ESTOQUE + _INDICES_HISTORICO, tabelas_sem_vinculo)
+
+
+def _m002_unificar_main_funcional(cursor):
+    """Histórico de main_funcional.py no formato canônico e tabelas de caixa/crediário"""
+    # Bancos já na versão 1 podem ter sido reescritos por versões antigas de main_funcional.py
+    convertido = _unificar_historico(cursor)
+    for sql in _SQL_TABELAS_OPERACAO:
+        cursor.execute(sql)
+    tabelas_sem_vinculo = adicionar_colunas_produto_id(cursor)
+    # A conversão recria historico_vendas sem índices
+    _estrutura_derivada(cursor, _INDICES_HISTORICO + _INDICES_OPERACAO, tabelas_sem_vinculo,
+                        reconstruir=convertido)
+
+
+def _m003_busca_produtos(cursor):
+    """Índice de busca textual (FTS5) de produtos, mantido por triggers"""
+    criar_indice_busca(cursor)
+
+
+def _m004_codigo_barras_unico(cursor):
+    """Índice único (parcial) de código de barras"""
+    aplicar_indices(cursor, [
+        ('idx_estoque_codigo_barras', 'estoque', ('codigo_barras',), True, "codigo_barras <> ''"),
+    ])
+
+
+def _m005_contador_alteracoes(cursor):
+    """Contador de UPDATE/DELETE no histórico (totais incrementais do dashboard)"""
+    criar_contador_alteracoes(cursor)
+
+
+def _m006_indice_backups(cursor):
+    """Índice de backups pelo nome do arquivo"""
+    aplicar_indices(cursor, [('idx_backups_nome_arquivo', 'backups', ('nome_arquivo',), False)])
+
+
+def _m007_alteracoes_sem_preenchimento(cursor):
+    """Contador de alterações ignora data_iso/produto_id preenchidos pelos triggers"""
+    # NULL -> valor é preenchimento (data_iso na inserção, vínculo com produto
+    # cadastrado depois) e não muda os totais; UPDATE sem mudança também não conta
+    cursor.execute("DROP TRIGGER IF EXISTS trg_historico_vendas_alteracao")
+    cursor.execute('''
+        CREATE TRIGGER trg_historico_vendas_alteracao
+        AFTER UPDATE OF produto, quantidade, valor_total, data_iso, produto_id ON historico_vendas
+        WHEN OLD.produto IS NOT NEW.produto
+          OR OLD.quantidade IS NOT NEW.quantidade
+          OR OLD.valor_total IS NOT NEW.valor_total
+          OR (OLD.data_iso IS NOT NULL AND OLD.data_iso IS NOT NEW.data_iso)
+          OR (OLD.produto_id IS NOT NULL AND OLD.produto_id IS NOT NEW.produto_id)
+        BEGIN
+            UPDATE alteracoes_tabelas SET alteracoes = alteracoes + 1 WHERE tabela = 'historico_vendas';
+        END
+    ''')
+
+
+# (versão, descrição, passo) em ordem; cada passo roda uma única vez, em sua
+# própria transação, e a versão é gravada em PRAGMA user_version no mesmo commit.
+# Passos novos entram sempre no fim, com o próximo número.
+MIGRACOES = [
+    (1, "Estrutura base", _m001_estrutura_base),
+    (2, "Unificação com o esquema de main_funcional.py", _m002_unificar_main_funcional),
+    (3, "Busca textual de produtos", _m003_busca_produtos),
+    (4, "Código de barras único", _m004_codigo_barras_unico),
+    (5, "Contador de alterações do histórico", _m005_contador_alteracoes),
+    (6, "Índice de backups por nome do arquivo", _m006_indice_backups),
+    (7, "Contador de alterações sem preenchimentos", _m007_alteracoes_sem_preenchimento),
+]
+
+VERSAO_ESQUEMA = MIGRACOES[-1][0]
+
+
+def versao_banco(conn):
+    """Versão do esquema gravada no banco (0 = nunca migrado)"""
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def aplicar_migracoes(pool, ate=VERSAO_ESQUEMA):
+    """
+    Aplica, em ordem, os passos ainda não executados até a versão indicada.
+
+    Cada passo abre uma transação IMMEDIATE e confere a versão de novo já com
+    a escrita reservada, de modo que dois processos iniciando juntos não
+    repetem o mesmo passo. Um passo com erro é desfeito e o erro propagado;
+    os anteriores continuam gravados. Retorna as versões aplicadas.
+    """
+    with pool.leitura() as conn:
+        if versao_banco(conn) >= ate:
+            return []
+
+    aplicadas = []
+    for versao, descricao, passo in MIGRACOES:
+        if versao > ate:
+            break
+        with pool.escrita(imediata=True) as conn:
+            if versao_banco(conn) >= versao:
+                continue
+            try:
+                passo(conn.cursor())
+            except Exception as e:
+                print(f"Erro ao aplicar migração {versao} ({descricao}): {e}")
+                raise
+            conn.execute(f"PRAGMA user_version = {versao}")
+        aplicadas.append(versao)
+    return aplicadas
@@ -0,0 +1,70 @@
+"""
+Perfis de desempenho (PRAGMAs) aplicados às conexões SQLite
+"""
+
+import sqlite3
+
+
+# Cada perfil é aplicado em toda conexão aberta pelo pool.
+# cache_size negativo = tamanho em KiB (convenção do SQLite).
+PERFIS_DESEMPENHO = {
+    # Comportamento padrão do SQLite: journal de rollback e fsync em todo commit
+    'compatibilidade': {
+        'journal_mode': 'DELETE',
+        'synchronous': 'FULL',
+        'cache_size': -2000,
+        'mmap_size': 0,
+        'temp_store': 'DEFAULT',
+        'busy_timeout': 5000,
+    },
+    # Uso normal do PDV: leitores não bloqueiam o escritor e o commit não faz fsync
+    # (com WAL + NORMAL o banco continua íntegro após queda de energia; no pior caso
+    # perdem-se apenas as últimas transações ainda não checkpointadas)
+    'desempenho': {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'cache_size': -16000,
+        'mmap_size': 64 * 1024 * 1024,
+        'temp_store': 'MEMORY',
+        'busy_timeout': 5000,
+        'wal_autocheckpoint': 1000,
+        'journal_size_limit': 32 * 1024 * 1024,
+    },
+}
+
+PERFIL_PADRAO = 'desempenho'
+
+# Ordem importa: journal_mode precisa vir antes de synchronous
+_ORDEM_PRAGMAS = [
+    'journal_mode', 'synchronous', 'cache_size', 'mmap_size', 'temp_store',
+    'busy_timeout', 'wal_autocheckpoint', 'journal_size_limit',
+]
+
+
+def obter_perfil(perfil):
+    """Resolve um perfil pelo nome (ou aceita um dicionário de PRAGMAs já pronto)"""
+    if isinstance(perfil, dict):
+        return perfil
+    if perfil not in PERFIS_DESEMPENHO:
+        raise ValueError(f"Perfil de desempenho desconhecido: {perfil}")
+    return PERFIS_DESEMPENHO[perfil]
+
+
+# PRAGMAs que alteram o arquivo do banco; não se aplicam a conexões somente leitura
+_PRAGMAS_DE_ESCRITA = {'journal_mode', 'wal_autocheckpoint', 'journal_size_limit'}
+
+
+def aplicar_perfil(conn, perfil, somente_leitura=False):
+    """Aplica os PRAGMAs do perfil em uma conexão recém-aberta"""
+    pragmas = obter_perfil(perfil)
+    if somente_leitura:
+        # Recusa qualquer escrita, mesmo que o arquivo permita
+        conn.execute("PRAGMA query_only = ON")
+    for nome in _ORDEM_PRAGMAS:
+        if nome not in pragmas or (somente_leitura and nome in _PRAGMAS_DE_ESCRITA):
+            continue
+        try:
+            conn.execute(f"PRAGMA {nome} = {pragmas[nome]}").fetchall()
+        except sqlite3.OperationalError as e:
+            # Ex.: trocar journal_mode com outra conexão aberta; não impede o uso
+            print(f"Aviso: não foi possível aplicar PRAGMA {nome}: {e}")
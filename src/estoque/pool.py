@@ -0,0 +1,356 @@
+"""
+Pool de conexões SQLite reutilizáveis
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from urllib.request import pathname2url
+
+from .perfis import PERFIL_PADRAO, aplicar_perfil, obter_perfil
+
+
+class ConnectionPool:
+    """
+    Mantém conexões SQLite abertas durante toda a vida do processo.
+
+    - Uma única conexão de escrita, protegida por lock (o SQLite só aceita
+      um escritor por vez, então serializar aqui evita SQLITE_BUSY).
+    - Uma conexão de leitura por thread (afinidade), até max_leitores.
+      Conexões de threads que já terminaram são recicladas; com o limite
+      atingido, a leitura usa uma conexão avulsa fechada ao fim do bloco.
+    - Uma conexão analítica somente leitura (mode=ro, query_only) por
+      thread, usada por leitura_consistente() em relatórios e no dashboard.
+    - versao_dados() lê PRAGMA data_version na conexão de escrita, para
+      caches em memória saberem se outra conexão gravou no banco.
+    - Cada conexão mantém seu próprio cache de statements preparados,
+      que passa a ser reaproveitado entre chamadas.
+    - Toda conexão nova recebe os PRAGMAs do perfil de desempenho escolhido.
+    """
+
+    def __init__(self, db_path, max_leitores=4, cached_statements=128, timeout=5.0,
+                 intervalo_verificacao=30.0, perfil=PERFIL_PADRAO):
+        self.db_path = db_path
+        self.perfil = perfil
+        self.max_leitores = max_leitores
+        self.cached_statements = cached_statements
+        self.timeout = timeout
+        self.intervalo_verificacao = intervalo_verificacao
+
+        self._lock_escrita = threading.RLock()
+        self._escritor = None
+        self._escritor_verificado_em = 0.0
+        self._profundidade_escrita = 0
+        # Muda quando a conexão de escrita é recriada (data_version recomeça)
+        self._geracao_escritor = 0
+        self._versao_dados = None
+
+        self._lock_leitores = threading.Lock()
+        self._leitores = {}  # ident da thread -> [conexão, verificada_em]
+        self._analiticos = {}  # idem, conexões somente leitura
+        self._local = threading.local()  # conexão da leitura consistente em andamento na thread
+        self._fechado = False
+
+        self._checkpoint_thread = None
+        self._checkpoint_parar = threading.Event()
+
+    def _conectar(self, somente_leitura=False):
+        """Abre uma nova conexão configurada para uso no pool"""
+        if somente_leitura:
+            # mode=ro: o SQLite nem abre o arquivo para escrita
+            alvo, uri = f"file:{pathname2url(os.path.abspath(self.db_path))}?mode=ro", True
+        else:
+            alvo, uri = self.db_path, False
+        conn = sqlite3.connect(
+            alvo,
+            timeout=self.timeout,
+            cached_statements=self.cached_statements,
+            check_same_thread=False,  # a afinidade por thread é garantida pelo próprio pool
+            uri=uri
+        )
+        aplicar_perfil(conn, self.perfil, somente_leitura=somente_leitura)
+        return conn
+
+    def _saudavel(self, conn):
+        """Verifica se a conexão ainda responde"""
+        try:
+            conn.execute("SELECT 1").fetchone()
+            return True
+        except sqlite3.Error:
+            return False
+
+    def _fechar_silenciosamente(self, conn):
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+
+    # === ESCRITA ===
+
+    def _obter_escritor(self):
+        """Retorna a conexão de escrita, recriando-a se estiver quebrada (chamar com o lock)"""
+        if self._fechado:
+            raise sqlite3.ProgrammingError("Pool de conexões já foi fechado")
+
+        agora = time.monotonic()
+        if self._escritor is None:
+            self._escritor = self._conectar()
+            self._escritor_verificado_em = agora
+            self._geracao_escritor += 1
+        elif agora - self._escritor_verificado_em > self.intervalo_verificacao:
+            if not self._saudavel(self._escritor):
+                self._fechar_silenciosamente(self._escritor)
+                self._escritor = self._conectar()
+                self._geracao_escritor += 1
+            self._escritor_verificado_em = agora
+        return self._escritor
+
+    @contextmanager
+    def escrita(self, imediata=False):
+        """
+        Empresta a conexão de escrita dentro de uma transação.
+
+        Faz commit ao sair normalmente e rollback em caso de erro. Blocos
+        aninhados na mesma thread participam da transação mais externa.
+        Com imediata=True a transação abre com BEGIN IMMEDIATE, reservando
+        a escrita também contra outros processos antes da primeira leitura.
+        """
+        with self._lock_escrita:
+            conn = self._obter_escritor()
+            self._profundidade_escrita += 1
+            try:
+                if imediata and not conn.in_transaction:
+                    conn.execute("BEGIN IMMEDIATE")
+                yield conn
+                if self._profundidade_escrita == 1:
+                    conn.commit()
+            except BaseException:
+                if self._profundidade_escrita == 1:
+                    conn.rollback()
+                raise
+            finally:
+                self._profundidade_escrita -= 1
+
+    # === LEITURA ===
+
+    def _reciclar_leitores_orfaos(self, leitores):
+        """Fecha conexões de leitura de threads que já terminaram (chamar com o lock)"""
+        vivas = {thread.ident for thread in threading.enumerate()}
+        for ident in [ident for ident in leitores if ident not in vivas]:
+            conn, _ = leitores.pop(ident)
+            self._fechar_silenciosamente(conn)
+
+    def _obter_leitor(self, analitico=False):
+        """
+        Retorna a conexão de leitura (ou analítica) da thread atual, criando-a
+        se necessário, ou None se todas as vagas estão com threads vivas.
+        """
+        if self._fechado:
+            raise sqlite3.ProgrammingError("Pool de conexões já foi fechado")
+
+        leitores = self._analiticos if analitico else self._leitores
+        ident = threading.get_ident()
+        agora = time.monotonic()
+
+        with self._lock_leitores:
+            entrada = leitores.get(ident)
+            if entrada is None:
+                if len(leitores) >= self.max_leitores:
+                    self._reciclar_leitores_orfaos(leitores)
+                if len(leitores) >= self.max_leitores:
+                    return None
+                entrada = [self._conectar(somente_leitura=analitico), agora]
+                leitores[ident] = entrada
+
+        conn, verificada_em = entrada
+        if agora - verificada_em > self.intervalo_verificacao:
+            if not self._saudavel(conn):
+                self._fechar_silenciosamente(conn)
+                conn = self._conectar(somente_leitura=analitico)
+                entrada[0] = conn
+            entrada[1] = agora
+        return conn
+
+    @contextmanager
+    def _emprestar_leitor(self, analitico=False):
+        """Conexão de leitura da thread ou, sem vaga no pool, uma avulsa fechada ao sair"""
+        conn = self._obter_leitor(analitico)
+        if conn is not None:
+            yield conn
+            return
+        # Mais threads lendo que max_leitores: a consulta não falha, só não reaproveita a conexão
+        conn = self._conectar(somente_leitura=analitico)
+        try:
+            yield conn
+        finally:
+            self._fechar_silenciosamente(conn)
+
+    @contextmanager
+    def leitura(self):
+        """Empresta a conexão de leitura da thread atual"""
+        # Dentro de leitura_consistente() as consultas usam o mesmo snapshot
+        consistente = getattr(self._local, 'consistente', None)
+        if consistente is not None:
+            yield consistente
+            return
+        with self._emprestar_leitor() as conn:
+            yield conn
+
+    @contextmanager
+    def leitura_consistente(self):
+        """
+        Abre uma transação de leitura na conexão analítica da thread.
+
+        Todas as consultas feitas na thread até o fim do bloco (inclusive as
+        que passam por leitura()) enxergam o mesmo snapshot do WAL, sem ver
+        vendas confirmadas no meio do caminho. Em WAL o leitor não trava o
+        escritor. Em journal de rollback uma transação de leitura longa
+        bloquearia o commit das vendas, então lá cada consulta continua
+        isolada (sem snapshot único).
+        """
+        if getattr(self._local, 'consistente', None) is not None:
+            # Bloco aninhado participa do snapshot já aberto
+            yield self._local.consistente
+            return
+
+        with self._emprestar_leitor(analitico=True) as conn:
+            if str(obter_perfil(self.perfil).get('journal_mode', '')).upper() != 'WAL':
+                self._local.consistente = conn
+                try:
+                    yield conn
+                finally:
+                    self._local.consistente = None
+                return
+
+            conn.execute("BEGIN")
+            try:
+                # O snapshot é fixado na primeira leitura, não no BEGIN
+                conn.execute("SELECT 1 FROM sqlite_master LIMIT 1").fetchall()
+                self._local.consistente = conn
+                yield conn
+            finally:
+                self._local.consistente = None
+                # Nada a confirmar; encerrar libera o snapshot para o checkpoint avançar
+                conn.rollback()
+
+    def versao_dados(self):
+        """
+        Valor que muda quando outra conexão (conexão avulsa, main_funcional.py,
+        outro processo) confirma uma gravação no banco. Os commits feitos
+        pelo próprio pool não contam: quem grava por ele invalida os caches
+        explicitamente. Vem do PRAGMA data_version da conexão de escrita,
+        que não lê o arquivo do banco.
+
+        Enquanto outra thread grava, devolve o valor lido da última vez em
+        vez de esperar; a gravação externa é percebida na chamada seguinte.
+        """
+        if not self._lock_escrita.acquire(blocking=self._versao_dados is None):
+            return self._versao_dados
+        try:
+            conn = self._obter_escritor()
+            versao = conn.execute("PRAGMA data_version").fetchone()[0]
+            self._versao_dados = (self._geracao_escritor, versao)
+            return self._versao_dados
+        finally:
+            self._lock_escrita.release()
+
+    # === CHECKPOINT DO WAL ===
+
+    def tamanho_wal(self):
+        """Tamanho atual do arquivo -wal em bytes (0 se não existir)"""
+        try:
+            return os.path.getsize(self.db_path + "-wal")
+        except OSError:
+            return 0
+
+    def checkpoint(self, modo="PASSIVE", esperar=True):
+        """
+        Executa um checkpoint do WAL.
+
+        PASSIVE não espera leitores; TRUNCATE também zera o arquivo -wal,
+        mas só conclui quando nenhum leitor está usando páginas antigas.
+        Com esperar=False o checkpoint desiste na hora (ocupado=1) em vez de
+        esperar leitores segurando o lock de escrita, o que atrasaria vendas.
+        Retorna (ocupado, paginas_no_wal, paginas_copiadas).
+        """
+        if modo not in ("PASSIVE", "FULL", "RESTART", "TRUNCATE"):
+            raise ValueError(f"Modo de checkpoint inválido: {modo}")
+        with self._lock_escrita:
+            conn = self._obter_escritor()
+            if esperar:
+                return tuple(conn.execute(f"PRAGMA wal_checkpoint({modo})").fetchone())
+            espera_original = conn.execute("PRAGMA busy_timeout").fetchone()[0]
+            conn.execute("PRAGMA busy_timeout = 0")
+            try:
+                return tuple(conn.execute(f"PRAGMA wal_checkpoint({modo})").fetchone())
+            finally:
+                conn.execute(f"PRAGMA busy_timeout = {espera_original}")
+
+    def iniciar_checkpoint_automatico(self, intervalo=60.0, limite_wal_bytes=16 * 1024 * 1024):
+        """
+        Inicia uma thread em segundo plano que faz checkpoint periódico.
+
+        O auto-checkpoint do SQLite nunca encolhe o arquivo e desiste quando
+        há leitores ativos; aqui um PASSIVE roda a cada intervalo e, se o -wal
+        passar de limite_wal_bytes, tenta um TRUNCATE para devolver o espaço.
+        """
+        if self._checkpoint_thread is not None:
+            return
+
+        def executar():
+            while not self._checkpoint_parar.wait(intervalo):
+                try:
+                    modo = "TRUNCATE" if self.tamanho_wal() > limite_wal_bytes else "PASSIVE"
+                    # Relatório longo aberto: tenta de novo no próximo ciclo
+                    self.checkpoint(modo, esperar=False)
+                except sqlite3.Error as e:
+                    print(f"Aviso: checkpoint do WAL falhou: {e}")
+
+        self._checkpoint_parar.clear()
+        self._checkpoint_thread = threading.Thread(
+            target=executar, name="checkpoint-wal", daemon=True
+        )
+        self._checkpoint_thread.start()
+
+    def parar_checkpoint_automatico(self):
+        """Interrompe a thread de checkpoint, se estiver rodando"""
+        if self._checkpoint_thread is None:
+            return
+        self._checkpoint_parar.set()
+        self._checkpoint_thread.join()
+        self._checkpoint_thread = None
+
+    # === ADMINISTRAÇÃO ===
+
+    def estatisticas(self):
+        """Retorna um resumo do estado do pool"""
+        with self._lock_leitores:
+            leitores = len(self._leitores)
+            analiticos = len(self._analiticos)
+        return {
+            'escritor_aberto': self._escritor is not None,
+            'leitores_abertos': leitores,
+            'analiticos_abertos': analiticos,
+            'max_leitores': self.max_leitores,
+            'cached_statements': self.cached_statements,
+            'perfil': self.perfil,
+            'tamanho_wal': self.tamanho_wal(),
+        }
+
+    def fechar(self):
+        """Fecha todas as conexões do pool"""
+        self.parar_checkpoint_automatico()
+        with self._lock_escrita:
+            self._fechado = True
+            # Leitores antes do escritor: a última conexão a fechar faz o checkpoint
+            # e remove o -wal, o que uma conexão somente leitura não consegue
+            with self._lock_leitores:
+                for leitores in (self._leitores, self._analiticos):
+                    for conn, _ in leitores.values():
+                        self._fechar_silenciosamente(conn)
+                    leitores.clear()
+            if self._escritor is not None:
+                self._fechar_silenciosamente(self._escritor)
+                self._escritor = None
@@ -0,0 +1,76 @@
+"""
+Referência por id (produto_id -> estoque.id) nas tabelas de vendas
+"""
+
+
+# Tabelas que guardam vendas de produtos. A coluna produto (nome) continua
+# existindo como retrato do nome na hora da venda e como fallback para vendas
+# de produtos sem cadastro; consultas agrupam e juntam por produto_id.
+TABELAS_COM_PRODUTO = ('historico_vendas', 'contas_abertas')
+
+
+def _colunas(cursor, tabela):
+    """Retorna o conjunto de colunas de uma tabela (vazio se não existir)"""
+    cursor.execute(f"PRAGMA table_info({tabela})")
+    return {coluna[1] for coluna in cursor.fetchall()}
+
+
+def adicionar_colunas_produto_id(cursor):
+    """Adiciona produto_id às tabelas de vendas existentes; retorna as que ganharam a coluna"""
+    alteradas = []
+    for tabela in TABELAS_COM_PRODUTO:
+        colunas = _colunas(cursor, tabela)
+        if colunas and 'produto_id' not in colunas:
+            cursor.execute(
+                f"ALTER TABLE {tabela} ADD COLUMN produto_id INTEGER "
+                f"REFERENCES estoque(id) ON DELETE SET NULL"
+            )
+            alteradas.append(tabela)
+    return alteradas
+
+
+def vincular_produtos(cursor, tabelas_para_preencher=()):
+    """
+    Cria os triggers que mantêm produto_id e preenche as tabelas indicadas.
+
+    - Venda inserida sem produto_id é ligada ao produto de mesmo nome, se houver.
+    - Produto cadastrado depois é ligado às vendas antigas sem vínculo com o mesmo nome.
+    - Produto excluído deixa as vendas sem vínculo (mesmo em conexões sem
+      PRAGMA foreign_keys); o nome gravado na venda continua sendo exibido.
+    """
+    for tabela in TABELAS_COM_PRODUTO:
+        if 'produto_id' not in _colunas(cursor, tabela):
+            continue
+
+        if tabela in tabelas_para_preencher:
+            cursor.execute(f'''
+                UPDATE {tabela}
+                SET produto_id = (SELECT id FROM estoque WHERE estoque.produto = {tabela}.produto)
+                WHERE produto_id IS NULL
+            ''')
+
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS trg_{tabela}_produto_id_insert
+            AFTER INSERT ON {tabela}
+            WHEN NEW.produto_id IS NULL
+             AND EXISTS (SELECT 1 FROM estoque WHERE produto = NEW.produto)
+            BEGIN
+                UPDATE {tabela} SET produto_id = (SELECT id FROM estoque WHERE produto = NEW.produto)
+                WHERE id = NEW.id;
+            END
+        ''')
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS trg_estoque_insert_vincula_{tabela}
+            AFTER INSERT ON estoque
+            BEGIN
+                UPDATE {tabela} SET produto_id = NEW.id
+                WHERE produto_id IS NULL AND produto = NEW.produto;
+            END
+        ''')
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS trg_estoque_delete_desvincula_{tabela}
+            AFTER DELETE ON estoque
+            BEGIN
+                UPDATE {tabela} SET produto_id = NULL WHERE produto_id = OLD.id;
+            END
+        ''')
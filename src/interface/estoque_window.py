@@ -4,7 +4,7 @@ Janela de consulta e gerenciamento de estoque
 
 import tkinter as tk
 from tkinter import ttk, messagebox
-from src.utils.helpers import centralizar_janela
+from src.utils.helpers import aguardar_no_tk, centralizar_janela
 
 
 class EstoqueWindow:
@@ -141,14 +141,18 @@ class EstoqueWindow:
         
     def carregar_estoque(self):
         """Carrega dados do estoque na tabela"""
+        # Consulta em thread de trabalho; a tabela é preenchida quando o resultado chegar
+        futuro = self.estoque_controller.db.assincrono.executar(self.estoque_controller.listar_estoque_completo)
+        aguardar_no_tk(self.window, futuro, self._exibir_estoque,
+                       lambda e: messagebox.showerror("Erro", f"Erro ao carregar estoque: {str(e)}"))
+        
+    def _exibir_estoque(self, estoque):
+        """Preenche a tabela com o estoque já carregado"""
         # Limpar tabela
         for item in self.tree.get_children():
             self.tree.delete(item)
             
         try:
-            # Buscar dados do estoque completo
-            estoque = self.estoque_controller.listar_estoque_completo()
-            
             if not estoque:
                 # Inserir linha indicando estoque vazio
                 self.tree.insert("", tk.END, values=("Nenhum produto cadastrado", "-", "-", "-", "-"))
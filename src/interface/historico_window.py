@@ -4,13 +4,22 @@ Janela de visualização do histórico de vendas
 
 import tkinter as tk
 from tkinter import ttk, messagebox
-from src.utils.helpers import centralizar_janela
+from src.utils.helpers import aguardar_no_tk, centralizar_janela
 
 
 class HistoricoWindow:
+    # Vendas por página; as seguintes vêm com "Carregar mais" (paginação por id)
+    TAMANHO_PAGINA = 200
+    # Espera após a última tecla antes de buscar (uma consulta por pausa na digitação)
+    ATRASO_BUSCA_MS = 250
+    
     def __init__(self, parent, historico_controller):
         self.parent = parent
         self.historico_controller = historico_controller
+        self._filtro = None
+        self._ultimo_id = None
+        self._geracao = 0
+        self._busca_agendada = None
         
         # Criar janela
         self.window = tk.Toplevel(parent)
@@ -109,6 +118,14 @@ class HistoricoWindow:
             command=self.carregar_historico
         ).pack(side=tk.LEFT, padx=(0, 10))
         
+        self.mais_button = ttk.Button(
+            button_frame,
+            text="Carregar mais",
+            command=self.carregar_mais,
+            state=tk.DISABLED
+        )
+        self.mais_button.pack(side=tk.LEFT, padx=(0, 10))
+        
         ttk.Button(
             button_frame,
             text="Exportar Histórico",
@@ -122,28 +139,72 @@ class HistoricoWindow:
         ).pack(side=tk.RIGHT)
         
     def carregar_historico(self):
-        """Carrega dados do histórico na tabela"""
+        """Carrega a primeira página do histórico (com o filtro atual) e os totais"""
+        texto = self.filtro_var.get().strip()
+        self._filtro = {'produto': texto} if texto else None
+        self._ultimo_id = None
+        # Respostas de buscas anteriores (digitação rápida no filtro) são descartadas
+        self._geracao += 1
+        geracao = self._geracao
+        
+        self.stats_label.config(text="Carregando histórico...")
+        db = self.historico_controller.db
+        filtro = self._filtro
+        # Página e totais em thread de trabalho; a tabela é preenchida quando o resultado chegar
+        futuro = db.assincrono.executar(
+            lambda: (db.pagina_historico(None, self.TAMANHO_PAGINA, filtro), db.resumo_historico(filtro))
+        )
+        aguardar_no_tk(self.window, futuro,
+                       self._se_atual(geracao, lambda resultado: self._exibir_historico(*resultado)),
+                       lambda e: messagebox.showerror("Erro", f"Erro ao carregar histórico: {str(e)}"))
+        
+    def carregar_mais(self):
+        """Acrescenta à tabela a próxima página (vendas mais antigas)"""
+        if self._ultimo_id is None:
+            return
+        geracao = self._geracao
+        futuro = self.historico_controller.db.assincrono.pagina_historico(
+            self._ultimo_id, self.TAMANHO_PAGINA, self._filtro
+        )
+        aguardar_no_tk(self.window, futuro,
+                       self._se_atual(geracao, self._acrescentar_pagina),
+                       lambda e: messagebox.showerror("Erro", f"Erro ao carregar histórico: {str(e)}"))
+        
+    def _se_atual(self, geracao, funcao):
+        """Callback que ignora respostas de buscas já substituídas por outra"""
+        def chamar(resultado):
+            if geracao == self._geracao:
+                funcao(resultado)
+        return chamar
+        
+    def _exibir_historico(self, pagina, resumo):
+        """Preenche a tabela com a primeira página e mostra os totais do filtro"""
         # Limpar tabela
         for item in self.tree.get_children():
             self.tree.delete(item)
             
-        try:
-            # Buscar dados do histórico completo
-            historico = self.historico_controller.db.listar_historico_completo()
+        total_vendas, total_itens, receita_total = resumo
+        if not total_vendas:
+            mensagem = "Nenhuma venda encontrada" if self._filtro else "Nenhuma venda registrada"
+            self.tree.insert("", tk.END, values=("-", mensagem, "-", "-", "-", "-"))
+            self.stats_label.config(text=mensagem)
+            self.mais_button.config(state=tk.DISABLED)
+            return
             
-            if not historico:
-                # Inserir linha indicando histórico vazio
-                self.tree.insert("", tk.END, values=("-", "Nenhuma venda registrada", "-", "-", "-", "-"))
-                self.stats_label.config(text="Nenhuma venda registrada")
-                return
-                
-            # Inserir dados na tabela
-            total_vendas = 0
-            total_itens = 0
-            receita_total = 0.0
-            
-            for venda in historico:
-                venda_id, produto, quantidade, preco_unit, valor_total, data_hora = venda[0], venda[1], venda[2], venda[3], venda[4], venda[5]
+        self._acrescentar_pagina(pagina)
+        
+        # Atualizar estatísticas (calculadas no banco, não só da página exibida)
+        receita_fmt = f"R$ {receita_total:.2f}".replace('.', ',')
+        prefixo = "Vendas filtradas" if self._filtro else "Total de vendas"
+        self.stats_label.config(
+            text=f"{prefixo}: {total_vendas} | Itens vendidos: {total_itens} | Receita total: {receita_fmt}"
+        )
+        
+    def _acrescentar_pagina(self, pagina):
+        """Insere uma página de vendas no fim da tabela"""
+        try:
+            for venda in pagina:
+                venda_id, produto, quantidade, preco_unit, valor_total, data_hora = venda[:6]
                 
                 # Formatar valores monetários
                 preco_fmt = f"R$ {preco_unit:.2f}".replace('.', ',')
@@ -151,63 +212,35 @@ class HistoricoWindow:
                 
                 self.tree.insert("", tk.END, values=(venda_id, produto, quantidade, preco_fmt, total_fmt, data_hora))
                 
-                total_vendas += 1
-                total_itens += quantidade
-                receita_total += valor_total
-                
-            # Atualizar estatísticas
-            receita_fmt = f"R$ {receita_total:.2f}".replace('.', ',')
-            self.stats_label.config(
-                text=f"Total de vendas: {total_vendas} | Itens vendidos: {total_itens} | Receita total: {receita_fmt}"
-            )
+            if pagina:
+                self._ultimo_id = pagina[-1][0]
+            # Página incompleta: não há vendas mais antigas
+            if len(pagina) < self.TAMANHO_PAGINA:
+                self._ultimo_id = None
+            self.mais_button.config(state=tk.NORMAL if self._ultimo_id is not None else tk.DISABLED)
                 
         except Exception as e:
             messagebox.showerror("Erro", f"Erro ao carregar histórico: {str(e)}")
             
     def filtrar_historico(self, event=None):
-        """Filtra o histórico por produto"""
-        filtro = self.filtro_var.get().strip().lower()
+        """Filtra o histórico por produto (busca no índice do banco quando a digitação pausa)"""
+        self._cancelar_busca_agendada()
+        self._busca_agendada = self.window.after(self.ATRASO_BUSCA_MS, self._buscar_agendada)
+        
+    def _buscar_agendada(self):
+        """Executa a busca agendada por filtrar_historico"""
+        self._busca_agendada = None
+        self.carregar_historico()
+        
+    def _cancelar_busca_agendada(self):
+        """Descarta a busca ainda não executada"""
+        if self._busca_agendada is not None:
+            self.window.after_cancel(self._busca_agendada)
+            self._busca_agendada = None
         
-        # Limpar tabela
-        for item in self.tree.get_children():
-            self.tree.delete(item)
-            
-        try:
-            # Buscar dados do histórico
-            historico = self.historico_controller.listar_historico()
-            
-            if not historico:
-                self.tree.insert("", tk.END, values=("-", "Nenhuma venda registrada", "-", "-"))
-                return
-                
-            # Filtrar e inserir dados
-            vendas_filtradas = 0
-            total_itens_filtrados = 0
-            
-            for venda in historico:
-                venda_id, produto, quantidade, data_hora = venda
-                
-                # Aplicar filtro se especificado
-                if not filtro or filtro in produto.lower():
-                    self.tree.insert("", tk.END, values=(venda_id, produto, quantidade, data_hora))
-                    vendas_filtradas += 1
-                    total_itens_filtrados += quantidade
-                    
-            # Atualizar estatísticas
-            if filtro:
-                self.stats_label.config(
-                    text=f"Vendas filtradas: {vendas_filtradas} | Itens filtrados: {total_itens_filtrados}"
-                )
-            else:
-                self.stats_label.config(
-                    text=f"Total de vendas: {vendas_filtradas} | Total de itens vendidos: {total_itens_filtrados}"
-                )
-                
-        except Exception as e:
-            messagebox.showerror("Erro", f"Erro ao filtrar histórico: {str(e)}")
-            
     def limpar_filtro(self):
         """Limpa o filtro e recarrega todo o histórico"""
+        self._cancelar_busca_agendada()
         self.filtro_var.set("")
         self.carregar_historico()
         
@@ -215,7 +248,7 @@ class HistoricoWindow:
         """Exporta o histórico para Excel"""
         try:
             from src.pedidos.export import ExportController
-            export_controller = ExportController()
+            export_controller = ExportController(self.historico_controller.db)
             
             arquivo = export_controller.exportar_historico()
             if arquivo:
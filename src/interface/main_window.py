@@ -5,6 +5,8 @@ Janela principal do sistema de lanchonete
 import tkinter as tk
 from tkinter import ttk, messagebox
 from src.estoque.controller import EstoqueController
+from src.estoque.arquivamento import CONFIG_ARQUIVAMENTO_AUTOMATICO
+from src.estoque.database import EstoqueInsuficienteError, ProdutoNaoEncontradoError, obter_banco
 from src.pedidos.historico import HistoricoController
 from src.pedidos.export import ExportController
 from src.pedidos.graficos import GraficoController
@@ -22,13 +24,19 @@ class MainWindow:
         self.root.geometry("500x400")
         self.root.resizable(False, False)
         
-        # Inicializar controladores
-        self.estoque_controller = EstoqueController()
-        self.historico_controller = HistoricoController()
-        self.export_controller = ExportController()
-        self.grafico_controller = GraficoController()
-        self.version_manager = VersionManager()
-        self.update_checker = UpdateChecker()
+        # Inicializar controladores (todos sobre o mesmo banco, verificado uma única vez)
+        self.db = obter_banco()
+        self.estoque_controller = EstoqueController(self.db)
+        self.historico_controller = HistoricoController(self.db)
+        self.export_controller = ExportController(self.db)
+        self.grafico_controller = GraficoController(self.db)
+        self.version_manager = VersionManager(self.db)
+        self.update_checker = UpdateChecker(self.version_manager)
+        
+        # Com o arquivamento ligado nas configurações, os meses fechados vão
+        # para data/arquivo/ em segundo plano, sem atrasar a abertura
+        if self.db.obter_configuracao(CONFIG_ARQUIVAMENTO_AUTOMATICO) == '1':
+            self.db.assincrono.arquivar_historico()
         
         # Configurar interface
         self.setup_ui()
@@ -168,9 +176,9 @@ class MainWindow:
         try:
             produto = self.produto_var.get().strip()
             if produto:
-                produto_info = self.estoque_controller.consultar_produto_completo(produto)
-                if produto_info:
-                    preco = produto_info[2]  # preço
+                # Catálogo em memória: nenhuma consulta ao banco por seleção
+                preco = self.estoque_controller.consultar_preco(produto)
+                if preco is not None:
                     self.preco_venda_var.set(f"{preco:.2f}".replace('.', ','))
                 else:
                     self.preco_venda_var.set("0,00")
@@ -236,52 +244,49 @@ class MainWindow:
                 messagebox.showerror("Erro", "Preço deve ser um número válido e maior que zero!")
                 return
             
-            # Verificar se há estoque suficiente
-            produto_info = self.estoque_controller.consultar_produto_completo(produto)
-            if produto_info is None:
-                # Produto não existe, perguntar se quer criar
-                resposta = messagebox.askyesno(
-                    "Produto não encontrado", 
-                    f"O produto '{produto}' não existe no estoque.\nDeseja criar este produto?"
-                )
-                if resposta:
-                    self.estoque_controller.adicionar_produto(produto, 0, preco_unitario)
-                    estoque_atual = 0
-                else:
-                    return
-            else:
-                estoque_atual = produto_info[1]  # quantidade
-                
-            if estoque_atual < quantidade:
-                resposta = messagebox.askyesno(
-                    "Estoque insuficiente",
-                    f"Estoque insuficiente!\nDisponível: {estoque_atual}\nSolicitado: {quantidade}\n\nDeseja continuar mesmo assim?"
-                )
-                if not resposta:
-                    return
+            # Baixa de estoque + registro da venda em uma única transação
+            while True:
+                try:
+                    self.historico_controller.vender(produto, quantidade, preco_unitario)
+                    break
+                except ProdutoNaoEncontradoError:
+                    # Produto não existe, perguntar se quer criar
+                    resposta = messagebox.askyesno(
+                        "Produto não encontrado", 
+                        f"O produto '{produto}' não existe no estoque.\nDeseja criar este produto?"
+                    )
+                    if not resposta:
+                        return
+                    if not self.estoque_controller.adicionar_produto(produto, 0, preco_unitario):
+                        messagebox.showerror("Erro", "Erro ao criar produto!")
+                        return
+                except EstoqueInsuficienteError as e:
+                    resposta = messagebox.askyesno(
+                        "Estoque insuficiente",
+                        f"Estoque insuficiente!\nDisponível: {e.disponivel}\nSolicitado: {quantidade}\n\nDeseja continuar mesmo assim?"
+                    )
+                    if not resposta:
+                        return
+                    # Como antes: a venda entra no histórico, mas o estoque não é baixado
+                    if not self.historico_controller.registrar_venda(produto, quantidade, preco_unitario):
+                        messagebox.showerror("Erro", "Erro ao registrar venda!")
+                        return
+                    break
+                    
+            # Limpar campos
+            self.limpar_campos_venda()
             
-            # Registrar venda
-            sucesso = self.historico_controller.registrar_venda(produto, quantidade, preco_unitario)
-            if sucesso:
-                # Atualizar estoque apenas se havia estoque suficiente
-                if estoque_atual >= quantidade:
-                    novo_estoque = estoque_atual - quantidade
-                    self.estoque_controller.atualizar_produto(produto, novo_estoque)
-                
-                # Limpar campos
-                self.limpar_campos_venda()
-                
-                # Atualizar status
-                valor_total = quantidade * preco_unitario
-                self.status_label.config(text=f"Venda registrada: {produto} (Qtd: {quantidade}, Total: R$ {valor_total:.2f})")
-                
-                # Atualizar informações rápidas
-                self.atualizar_informacoes_rapidas()
-                
-                messagebox.showinfo("Sucesso", f"Venda registrada com sucesso!\n\nProduto: {produto}\nQuantidade: {quantidade}\nPreço unitário: R$ {preco_unitario:.2f}\nTotal: R$ {valor_total:.2f}")
-            else:
-                messagebox.showerror("Erro", "Erro ao registrar venda!")
+            # Atualizar status
+            valor_total = quantidade * preco_unitario
+            self.status_label.config(text=f"Venda registrada: {produto} (Qtd: {quantidade}, Total: R$ {valor_total:.2f})")
+            
+            # Atualizar informações rápidas
+            self.atualizar_informacoes_rapidas()
+            
+            messagebox.showinfo("Sucesso", f"Venda registrada com sucesso!\n\nProduto: {produto}\nQuantidade: {quantidade}\nPreço unitário: R$ {preco_unitario:.2f}\nTotal: R$ {valor_total:.2f}")
                 
+        except ValueError as e:
+            messagebox.showerror("Erro", str(e))
         except Exception as e:
             messagebox.showerror("Erro", f"Erro inesperado: {str(e)}")
             
@@ -332,7 +337,7 @@ class MainWindow:
             print("📊 Abrindo Dashboard Executivo...")
             
             # Criar e mostrar dashboard
-            dashboard = DashboardWindow(self.root)
+            dashboard = DashboardWindow(self.root, self.db)
             
             # Atualizar status
             self.status_label.config(text="Dashboard Executivo aberto - Análise financeira em andamento")
@@ -4,13 +4,25 @@ Controlador para exportação de dados
 
 import pandas as pd
 from datetime import datetime
+from itertools import chain
 import os
-from src.estoque.database import DatabaseManager
+from openpyxl import Workbook
+from src.estoque.database import obter_banco
+
+
+def _escrever_aba(workbook, nome, cabecalho, linhas, larguras):
+    """Escreve uma aba linha a linha (workbook write_only: memória constante)"""
+    worksheet = workbook.create_sheet(nome)
+    for coluna, largura in larguras.items():
+        worksheet.column_dimensions[coluna].width = largura
+    worksheet.append(cabecalho)
+    for linha in linhas:
+        worksheet.append(linha)
 
 
 class ExportController:
-    def __init__(self):
-        self.db = DatabaseManager()
+    def __init__(self, db=None):
+        self.db = db or obter_banco()
         
     def exportar_estoque(self, arquivo=None):
         """Exporta dados do estoque para Excel"""
@@ -58,32 +70,21 @@ class ExportController:
             print(f"Erro ao exportar estoque: {str(e)}")
             return None
             
-    def exportar_historico(self, arquivo=None):
-        """Exporta histórico de vendas para Excel"""
+    def exportar_historico(self, arquivo=None, incluir_arquivados=False):
+        """Exporta histórico de vendas para Excel (incluir_arquivados: também os meses arquivados)"""
         try:
-            # Buscar dados do histórico completo
-            historico = self.db.listar_historico_completo()
+            # Histórico lido em lotes e gravado direto na planilha, sem montar a lista inteira
+            historico = self.db.iter_historico(incluir_arquivados=incluir_arquivados)
+            primeira = next(historico, None)
             
-            if not historico:
+            if primeira is None:
                 raise ValueError("Nenhuma venda encontrada no histórico")
                 
-            # Criar DataFrame com dados formatados
-            dados_formatados = []
-            for venda in historico:
-                venda_id, produto, quantidade, preco_unit, valor_total, data_hora = venda[0], venda[1], venda[2], venda[3], venda[4], venda[5]
-                dados_formatados.append([
-                    venda_id, 
-                    produto, 
-                    quantidade, 
-                    f"R$ {preco_unit:.2f}", 
-                    f"R$ {valor_total:.2f}", 
-                    data_hora
-                ])
-                
-            df = pd.DataFrame(dados_formatados, columns=[
-                'ID', 'Produto', 'Quantidade', 'Preço Unitário', 'Valor Total', 'Data/Hora'
-            ])
-            
+            def formatar(vendas):
+                for venda in vendas:
+                    venda_id, produto, quantidade, preco_unit, valor_total, data_hora = venda[:6]
+                    yield [venda_id, produto, quantidade, f"R$ {preco_unit:.2f}", f"R$ {valor_total:.2f}", data_hora]
+                    
             # Gerar nome do arquivo se não fornecido
             if not arquivo:
                 timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
@@ -93,15 +94,13 @@ class ExportController:
             os.makedirs(os.path.dirname(arquivo), exist_ok=True)
             
             # Exportar para Excel
-            with pd.ExcelWriter(arquivo, engine='openpyxl') as writer:
-                df.to_excel(writer, sheet_name='Histórico', index=False)
-                
-                # Formatação básica
-                worksheet = writer.sheets['Histórico']
-                worksheet.column_dimensions['A'].width = 10
-                worksheet.column_dimensions['B'].width = 25
-                worksheet.column_dimensions['C'].width = 12
-                worksheet.column_dimensions['D'].width = 20
+            workbook = Workbook(write_only=True)
+            _escrever_aba(
+                workbook, 'Histórico',
+                ['ID', 'Produto', 'Quantidade', 'Preço Unitário', 'Valor Total', 'Data/Hora'],
+                formatar(chain([primeira], historico)), {'A': 10, 'B': 25, 'C': 12, 'D': 20}
+            )
+            workbook.save(arquivo)
                 
             return arquivo
             
@@ -148,9 +147,10 @@ class ExportController:
     def exportar_relatorio_completo(self, arquivo=None):
         """Exporta um relatório completo com todas as informações"""
         try:
-            # Buscar todos os dados
+            # Buscar todos os dados (o histórico é lido em lotes durante a escrita)
             estoque = self.db.listar_estoque()
-            historico = self.db.listar_historico()
+            historico = self.db.iter_historico()
+            primeira_venda = next(historico, None)
             estatisticas = self.db.obter_estatisticas_vendas()
             
             # Gerar nome do arquivo se não fornecido
@@ -162,37 +162,29 @@ class ExportController:
             os.makedirs(os.path.dirname(arquivo), exist_ok=True)
             
             # Criar arquivo Excel com múltiplas abas
-            with pd.ExcelWriter(arquivo, engine='openpyxl') as writer:
-                
-                # Aba Estoque
-                if estoque:
-                    df_estoque = pd.DataFrame(estoque, columns=['Produto', 'Quantidade'])
-                    df_estoque.to_excel(writer, sheet_name='Estoque', index=False)
-                    
-                    worksheet = writer.sheets['Estoque']
-                    worksheet.column_dimensions['A'].width = 30
-                    worksheet.column_dimensions['B'].width = 15
-                
-                # Aba Histórico
-                if historico:
-                    df_historico = pd.DataFrame(historico, columns=['ID', 'Produto', 'Quantidade', 'Data/Hora'])
-                    df_historico.to_excel(writer, sheet_name='Histórico', index=False)
-                    
-                    worksheet = writer.sheets['Histórico']
-                    worksheet.column_dimensions['A'].width = 10
-                    worksheet.column_dimensions['B'].width = 25
-                    worksheet.column_dimensions['C'].width = 12
-                    worksheet.column_dimensions['D'].width = 20
-                
-                # Aba Estatísticas
-                if estatisticas:
-                    df_stats = pd.DataFrame(estatisticas, columns=['Produto', 'Total Vendido', 'Número de Vendas'])
-                    df_stats.to_excel(writer, sheet_name='Estatísticas', index=False)
-                    
-                    worksheet = writer.sheets['Estatísticas']
-                    worksheet.column_dimensions['A'].width = 25
-                    worksheet.column_dimensions['B'].width = 15
-                    worksheet.column_dimensions['C'].width = 18
+            workbook = Workbook(write_only=True)
+            
+            # Aba Estoque
+            if estoque:
+                _escrever_aba(workbook, 'Estoque', ['Produto', 'Quantidade'], estoque, {'A': 30, 'B': 15})
+                
+            # Aba Histórico
+            if primeira_venda is not None:
+                _escrever_aba(
+                    workbook, 'Histórico', ['ID', 'Produto', 'Quantidade', 'Data/Hora'],
+                    ((venda[0], venda[1], venda[2], venda[5]) for venda in chain([primeira_venda], historico)),
+                    {'A': 10, 'B': 25, 'C': 12, 'D': 20}
+                )
+                
+            # Aba Estatísticas
+            if estatisticas:
+                _escrever_aba(workbook, 'Estatísticas', ['Produto', 'Total Vendido', 'Número de Vendas'],
+                              estatisticas, {'A': 25, 'B': 15, 'C': 18})
+                
+            # Planilha sem nenhuma aba não é um arquivo Excel válido
+            if not workbook.worksheets:
+                workbook.create_sheet('Relatório')
+            workbook.save(arquivo)
                 
             return arquivo
             
@@ -6,12 +6,12 @@ import matplotlib.pyplot as plt
 import matplotlib.dates as mdates
 from datetime import datetime
 import os
-from src.estoque.database import DatabaseManager
+from src.estoque.database import obter_banco
 
 
 class GraficoController:
-    def __init__(self):
-        self.db = DatabaseManager()
+    def __init__(self, db=None):
+        self.db = db or obter_banco()
         
     def gerar_grafico_vendas(self):
         """Gera gráfico de vendas por produto"""
@@ -169,17 +169,13 @@ class GraficoController:
             plt.rcParams['font.size'] = 10
             plt.rcParams['figure.figsize'] = (12, 6)
             
-            # Buscar histórico de vendas
-            historico = self.db.listar_historico()
-            
-            if not historico:
-                raise ValueError("Nenhuma venda encontrada no histórico")
-                
-            # Processar dados por data
+            # Processar dados por data (histórico lido em lotes, só o total por dia fica em memória)
             vendas_por_data = {}
+            encontrou_vendas = False
             
-            for venda in historico:
-                venda_id, produto, quantidade, data_hora_str = venda
+            for venda in self.db.iter_historico():
+                encontrou_vendas = True
+                quantidade, data_hora_str = venda[2], venda[5]
                 
                 try:
                     # Converter para datetime e extrair apenas a data
@@ -194,6 +190,9 @@ class GraficoController:
                     # Ignorar registros com formato de data inválido
                     continue
                     
+            if not encontrou_vendas:
+                raise ValueError("Nenhuma venda encontrada no histórico")
+                
             if not vendas_por_data:
                 raise ValueError("Nenhuma venda com data válida encontrada")
                 
@@ -2,16 +2,16 @@
 Controlador para gerenciamento de histórico de vendas
 """
 
-from src.estoque.database import DatabaseManager
+from src.estoque.database import obter_banco
 from datetime import datetime, timedelta
 
 
 class HistoricoController:
-    def __init__(self):
-        self.db = DatabaseManager()
+    def __init__(self, db=None):
+        self.db = db or obter_banco()
         
-    def registrar_venda(self, produto, quantidade, preco_unitario=0.0, vendedor='', observacoes=''):
-        """Registra uma nova venda"""
+    def _validar_venda(self, produto, quantidade, preco_unitario):
+        """Valida os dados de uma venda e retorna o nome normalizado do produto"""
         if not produto or not produto.strip():
             raise ValueError("Nome do produto não pode estar vazio")
             
@@ -21,13 +21,56 @@ class HistoricoController:
         if preco_unitario < 0:
             raise ValueError("Preço unitário não pode ser negativo")
             
-        produto = produto.strip().title()
+        return produto.strip().title()
+        
+    def _validar_carrinho(self, itens):
+        """Valida o carrinho todo antes de gravar qualquer item"""
+        if not itens:
+            raise ValueError("Carrinho vazio")
+            
+        validados = []
+        for item in itens:
+            preco_unitario = item.get('preco_unitario', 0.0)
+            produto = self._validar_venda(item.get('produto'), item.get('quantidade', 0), preco_unitario)
+            validados.append(dict(item, produto=produto, preco_unitario=preco_unitario))
+        return validados
+        
+    def registrar_venda(self, produto, quantidade, preco_unitario=0.0, vendedor='', observacoes=''):
+        """Registra uma nova venda"""
+        produto = self._validar_venda(produto, quantidade, preco_unitario)
         return self.db.registrar_venda(produto, quantidade, preco_unitario, vendedor, observacoes)
         
+    def registrar_vendas_lote(self, itens, vendedor='', observacoes=''):
+        """Registra um carrinho inteiro (lista de dicionários) com um único commit"""
+        return self.db.registrar_vendas_lote(self._validar_carrinho(itens), vendedor, observacoes)
+        
+    def vender(self, produto, quantidade, preco_unitario=0.0, vendedor='', observacoes='',
+               permitir_estoque_negativo=None):
+        """
+        Registra a venda e baixa o estoque atomicamente.
+        
+        Levanta ProdutoNaoEncontradoError/EstoqueInsuficienteError (subclasses
+        de ValueError) quando a venda não pode ser feita.
+        """
+        produto = self._validar_venda(produto, quantidade, preco_unitario)
+        return self.db.vender(produto, quantidade, preco_unitario, vendedor, observacoes,
+                              permitir_estoque_negativo)
+        
+    def vender_lote(self, itens, vendedor='', observacoes='', permitir_estoque_negativo=None):
+        """Vende um carrinho inteiro com baixa de estoque em uma única transação"""
+        return self.db.vender_lote(self._validar_carrinho(itens), vendedor, observacoes,
+                                   permitir_estoque_negativo)
+        
     def listar_historico(self, limite=None):
         """Lista o histórico de vendas"""
         return self.db.listar_historico(limite)
         
+    def pagina_historico(self, apos_id=None, tamanho=100, produto=None, vendedor=None,
+                         data_inicio=None, data_fim=None):
+        """Uma página do histórico (mais recentes primeiro); a seguinte começa após o id da última venda"""
+        filtro = {'produto': produto, 'vendedor': vendedor, 'data_inicio': data_inicio, 'data_fim': data_fim}
+        return self.db.pagina_historico(apos_id, tamanho, filtro)
+        
     def buscar_vendas_produto(self, produto):
         """Busca vendas de um produto específico"""
         if not produto or not produto.strip():
@@ -50,39 +93,11 @@ class HistoricoController:
         
     def vendas_por_periodo(self, data_inicio=None, data_fim=None):
         """Obtém vendas por período específico"""
-        historico = self.listar_historico()
-        
         if not data_inicio and not data_fim:
-            return historico
-            
-        vendas_periodo = []
-        
-        for venda in historico:
-            venda_id, produto, quantidade, data_hora_str = venda
+            return self.listar_historico()
             
-            try:
-                # Converter string de data para datetime
-                data_venda = datetime.strptime(data_hora_str, "%d/%m/%Y %H:%M:%S")
-                
-                # Verificar se está no período
-                dentro_periodo = True
-                
-                if data_inicio:
-                    if data_venda.date() < data_inicio:
-                        dentro_periodo = False
-                        
-                if data_fim:
-                    if data_venda.date() > data_fim:
-                        dentro_periodo = False
-                        
-                if dentro_periodo:
-                    vendas_periodo.append(venda)
-                    
-            except ValueError:
-                # Se não conseguir converter a data, incluir na lista
-                vendas_periodo.append(venda)
-                
-        return vendas_periodo
+        # Filtro feito no banco pelo índice de data_iso
+        return self.db.listar_vendas_periodo(data_inicio, data_fim)
         
     def vendas_hoje(self):
         """Obtém vendas do dia atual"""
@@ -103,12 +118,13 @@ class HistoricoController:
         
     def produto_mais_vendido(self):
         """Retorna o produto mais vendido"""
-        estatisticas = self.obter_estatisticas()
+        return self._mais_vendido(self.obter_estatisticas())
         
+    def _mais_vendido(self, estatisticas):
+        """Primeiro produto das estatísticas (já ordenadas por total vendido, DESC) ou None"""
         if not estatisticas:
             return None
             
-        # As estatísticas já vêm ordenadas por total vendido (DESC)
         produto, total_vendido, num_vendas = estatisticas[0]
         return {
             'produto': produto,
@@ -118,20 +134,18 @@ class HistoricoController:
         
     def relatorio_vendas(self):
         """Gera um relatório completo de vendas"""
-        historico = self.listar_historico()
+        # Totais por produto: base das estatísticas, dos totais gerais e do mais vendido
         estatisticas = self.obter_estatisticas()
+        total_vendas = sum(num_vendas for _, _, num_vendas in estatisticas)
+        total_itens = sum(total_vendido for _, total_vendido, _ in estatisticas)
         
-        # Calcular totais
-        total_vendas = len(historico)
-        total_itens = sum(venda[2] for venda in historico)  # venda[2] é a quantidade
-        
-        # Vendas por período
-        vendas_hoje = len(self.vendas_hoje())
-        vendas_semana = len(self.vendas_semana())
-        vendas_mes = len(self.vendas_mes())
-        
-        # Produto mais vendido
-        mais_vendido = self.produto_mais_vendido()
+        # Vendas por período (hoje, semana e mês numa única consulta)
+        hoje = datetime.now().date()
+        vendas_hoje, vendas_semana, vendas_mes = self.db.contar_vendas_periodos([
+            (hoje, hoje),
+            (hoje - timedelta(days=hoje.weekday()), hoje),
+            (hoje.replace(day=1), hoje),
+        ])
         
         relatorio = {
             'total_vendas': total_vendas,
@@ -139,7 +153,7 @@ class HistoricoController:
             'vendas_hoje': vendas_hoje,
             'vendas_semana': vendas_semana,
             'vendas_mes': vendas_mes,
-            'produto_mais_vendido': mais_vendido,
+            'produto_mais_vendido': self._mais_vendido(estatisticas),
             'estatisticas_produtos': estatisticas
         }
         
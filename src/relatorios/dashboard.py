@@ -24,14 +24,29 @@ PARA O USUÁRIO DA LANCHONETE:
 
 import tkinter as tk
 from tkinter import ttk, messagebox
-import matplotlib.pyplot as plt
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-from matplotlib.figure import Figure
 import matplotlib.dates as mdates
 from datetime import datetime, timedelta
 import sqlite3
-from src.estoque.database import DatabaseManager
-from src.utils.helpers import centralizar_janela
+from src.estoque.database import obter_banco
+from src.relatorios.graficos import GraficoHorarios, GraficoMensal, GraficoProdutos, GraficoVendasDiarias
+from src.utils.helpers import AgendadorAtualizacao, aguardar_no_tk, centralizar_janela
+
+
+# Produtos com menos unidades que isto entram no cartão e no alerta de estoque baixo
+LIMITE_ESTOQUE_BAIXO = 5
+
+# Atualização automática: opções do seletor (segundos; 0 = desligada) e
+# chave em configuracoes onde a escolha fica salva
+INTERVALOS_ATUALIZACAO = {
+    "Desligada": 0,
+    "30 segundos": 30,
+    "1 minuto": 60,
+    "5 minutos": 300,
+    "15 minutos": 900,
+}
+INTERVALO_ATUALIZACAO_PADRAO = 60
+CONFIG_INTERVALO_ATUALIZACAO = 'intervalo_atualizacao_dashboard'
 
 
 class DashboardWindow:
@@ -56,19 +71,35 @@ class DashboardWindow:
     - Acompanhar crescimento do negócio
     """
     
-    def __init__(self, parent):
+    def __init__(self, parent, db=None, intervalo_atualizacao=None):
         """
         INICIALIZAÇÃO DO DASHBOARD
         
         O que acontece aqui:
-        1. Conecta com o banco de dados (self.db)
+        1. Usa o banco de dados compartilhado da aplicação (self.db)
         2. Cria a janela principal (self.window)  
         3. Configura o tamanho e posição
         4. Chama setup_ui() para criar a interface
-        5. Chama atualizar_dashboard() para carregar dados
+        5. Prepara o agendador de atualizações em segundo plano
+        6. Chama atualizar_dashboard() para carregar dados
+        
+        intervalo_atualizacao: segundos entre atualizações automáticas
+        (0 desliga; None usa o valor salvo nas configurações)
         """
         self.parent = parent
-        self.db = DatabaseManager()  # Conexão com banco de dados
+        self.db = db or obter_banco()  # Mesma instância usada pelos controladores
+        
+        # Dados desenhados em cada gráfico: o mesmo objeto vindo do cache
+        # de métricas significa que nada mudou e o gráfico não é refeito
+        self._dados_exibidos = {}
+        # Gráficos de abas escondidas desde a última atualização: os dados
+        # deles só são buscados quando a aba for mostrada
+        self._graficos_pendentes = set()
+        # Gráficos e avisos de cada aba, criados uma vez e reaproveitados
+        # a cada atualização (chave -> GraficoDashboard / widgets do aviso)
+        self.graficos = {}
+        self._mensagens = {}
+        self.intervalo_atualizacao = self._intervalo_configurado(intervalo_atualizacao)
         
         # Criar janela principal
         self.window = tk.Toplevel(parent)
@@ -93,9 +124,30 @@ class DashboardWindow:
         self.setup_ui()
         centralizar_janela(self.window)
         
+        # Consultas numa thread de trabalho; widgets atualizados via after()
+        self.agendador = AgendadorAtualizacao(
+            self.window, self.db.assincrono.executar, self.coletar_dados, self.aplicar_dados,
+            ao_falhar=self._falha_na_atualizacao,
+            intervalo_ms=self.intervalo_atualizacao * 1000 or None
+        )
+        self.window.protocol("WM_DELETE_WINDOW", self.fechar)
+        
         # Carregar dados iniciais
         self.atualizar_dashboard()
         
+    def _intervalo_configurado(self, intervalo):
+        """Intervalo da atualização automática em segundos (argumento, configuração ou padrão)"""
+        if intervalo is not None:
+            return intervalo
+        valor = self.db.obter_configuracao(CONFIG_INTERVALO_ATUALIZACAO)
+        if valor is None:
+            return INTERVALO_ATUALIZACAO_PADRAO
+        try:
+            return max(int(valor), 0)
+        except ValueError:
+            print(f"Aviso: intervalo de atualização inválido nas configurações: {valor!r}")
+            return INTERVALO_ATUALIZACAO_PADRAO
+        
     def setup_ui(self):
         """
         🎨 CONFIGURAÇÃO DA INTERFACE VISUAL
@@ -211,11 +263,27 @@ class DashboardWindow:
         )
         btn_ajuda.pack(side=tk.LEFT, padx=(0, 10))
         
+        # Seletor da atualização automática
+        ttk.Label(controls_frame, text="🔁 Atualizar a cada:").pack(side=tk.LEFT, padx=(10, 5))
+        rotulos = {segundos: rotulo for rotulo, segundos in INTERVALOS_ATUALIZACAO.items()}
+        self.intervalo_var = tk.StringVar(
+            value=rotulos.get(self.intervalo_atualizacao, f"{self.intervalo_atualizacao} segundos")
+        )
+        intervalo_combo = ttk.Combobox(
+            controls_frame, textvariable=self.intervalo_var,
+            values=list(INTERVALOS_ATUALIZACAO), state="readonly", width=12
+        )
+        intervalo_combo.pack(side=tk.LEFT)
+        intervalo_combo.bind(
+            "<<ComboboxSelected>>",
+            lambda e: self.configurar_atualizacao_automatica(INTERVALOS_ATUALIZACAO[self.intervalo_var.get()])
+        )
+        
         # Botão fechar
         btn_fechar = ttk.Button(
             controls_frame,
             text="❌ Fechar",
-            command=self.window.destroy
+            command=self.fechar
         )
         btn_fechar.pack(side=tk.RIGHT)
         
@@ -348,6 +416,8 @@ class DashboardWindow:
         - ttk.Notebook = container de abas
         - ttk.Frame = cada aba é um frame
         - notebook.add() = adiciona aba ao container
+        - Só a aba visível tem o gráfico desenhado; as outras são
+          desenhadas quando mostradas (<<NotebookTabChanged>>)
         """
         
         # Aba 1: Análise de Vendas Diárias
@@ -358,14 +428,130 @@ class DashboardWindow:
         self.tab_produtos = ttk.Frame(self.notebook)
         self.notebook.add(self.tab_produtos, text="🏆 Top Produtos")
         
-        # Aba 3: Análise por Horário
+        # Aba 3: Análise por Horário (com filtros de período e produto)
         self.tab_horarios = ttk.Frame(self.notebook)
         self.notebook.add(self.tab_horarios, text="🕐 Horários de Pico")
+        self.setup_filtros_horarios()
         
         # Aba 4: Comparação Mensal
         self.tab_comparacao = ttk.Frame(self.notebook)
         self.notebook.add(self.tab_comparacao, text="📅 Evolução Mensal")
         
+        # Aba -> (chave dos dados, função que desenha o gráfico)
+        self.graficos_por_aba = {
+            str(self.tab_vendas): ('vendas_diarias', self.criar_grafico_vendas_diarias),
+            str(self.tab_produtos): ('produtos', self.criar_grafico_produtos_performance),
+            str(self.tab_horarios): ('horarios', self.criar_grafico_analise_horarios),
+            str(self.tab_comparacao): ('mensal', self.criar_grafico_comparacao_mensal),
+        }
+        self.notebook.bind("<<NotebookTabChanged>>", self._aba_trocada)
+        # Cópia da aba visível que a coleta em segundo plano pode ler
+        self._chave_visivel = self._chave_do_grafico_visivel()
+        
+    def _grafico_visivel(self):
+        """(chave, função de desenho) do gráfico da aba selecionada, ou None"""
+        return self.graficos_por_aba.get(self.notebook.select())
+        
+    def _chave_do_grafico_visivel(self):
+        """Chave dos dados do gráfico da aba selecionada, ou None"""
+        grafico = self._grafico_visivel()
+        return grafico[0] if grafico else None
+        
+    def _aba_trocada(self, event=None):
+        """Busca e desenha o gráfico da aba mostrada se ele ficou pendente enquanto escondido"""
+        self._chave_visivel = self._chave_do_grafico_visivel()
+        grafico = self._grafico_visivel()
+        if grafico is None:
+            return
+        chave, criar = grafico
+        if chave in self._graficos_pendentes:
+            self._graficos_pendentes.discard(chave)
+            self._carregar_grafico(chave, criar)
+        
+    def _carregar_grafico(self, chave, criar):
+        """Busca os dados de um gráfico numa thread de trabalho e o redesenha se mudaram"""
+        filtro_horarios = self._filtro_horarios
+        
+        def coletar():
+            with self.db.metricas.rodada(), self.db.leitura_consistente():
+                return self._dados_grafico(chave, filtro_horarios)
+        
+        def desenhar(novos):
+            self._desenhar_se_mudou(chave, criar, novos, filtro_horarios)
+        
+        aguardar_no_tk(self.window, self.db.assincrono.executar(coletar), desenhar)
+        
+    def _desenhar_se_mudou(self, chave, criar, novos, filtro_horarios):
+        """Desenha o gráfico com os dados coletados, a menos que sejam os já exibidos"""
+        # Filtro de horários trocado durante a coleta: o gráfico já foi refeito
+        if chave == 'horarios' and filtro_horarios != self._filtro_horarios:
+            return
+        # O mesmo objeto vindo do cache de métricas: nada mudou
+        if chave in self._dados_exibidos and self._dados_exibidos[chave] is novos:
+            return
+        criar(novos)
+        
+    def setup_filtros_horarios(self):
+        """
+        🔎 FILTROS DA ANÁLISE DE HORÁRIOS
+        
+        Barra no topo da aba de horários para escolher o período e o
+        produto. O gráfico fica em um frame separado (horarios_conteudo),
+        então os filtros não são recriados a cada atualização.
+        
+        COMO USAR:
+        - Período: todo o histórico ativo (sem os meses arquivados) ou os
+          últimos 7/30/90 dias
+        - Produto: todos ou um produto específico do estoque
+        - Ao trocar qualquer filtro, o gráfico é refeito na hora
+        """
+        self.periodos_horarios = {
+            "Todo o período (sem arquivados)": None,
+            "Últimos 7 dias": 7,
+            "Últimos 30 dias": 30,
+            "Últimos 90 dias": 90,
+        }
+        
+        filtros = ttk.Frame(self.tab_horarios)
+        filtros.pack(fill=tk.X, padx=10, pady=(10, 0))
+        
+        ttk.Label(filtros, text="Período:").pack(side=tk.LEFT)
+        self.horarios_periodo_var = tk.StringVar(value="Todo o período (sem arquivados)")
+        periodo_combo = ttk.Combobox(
+            filtros, textvariable=self.horarios_periodo_var,
+            values=list(self.periodos_horarios), state="readonly", width=28
+        )
+        periodo_combo.pack(side=tk.LEFT, padx=(5, 15))
+        
+        ttk.Label(filtros, text="Produto:").pack(side=tk.LEFT)
+        self.horarios_produto_var = tk.StringVar(value="Todos")
+        produtos = ["Todos"] + [produto for produto, _ in self.db.listar_estoque()]
+        produto_combo = ttk.Combobox(
+            filtros, textvariable=self.horarios_produto_var,
+            values=produtos, state="readonly", width=25
+        )
+        produto_combo.pack(side=tk.LEFT, padx=5)
+        
+        for combo in (periodo_combo, produto_combo):
+            combo.bind("<<ComboboxSelected>>", lambda e: self.filtrar_horarios())
+        # Cópia dos filtros que a coleta em segundo plano pode ler (as
+        # variáveis do Tk só podem ser lidas na thread da interface)
+        self._filtro_horarios = self._ler_filtro_horarios()
+        
+        self.horarios_conteudo = ttk.Frame(self.tab_horarios)
+        self.horarios_conteudo.pack(fill=tk.BOTH, expand=True)
+        
+    def _ler_filtro_horarios(self):
+        """Filtros escolhidos na aba de horários: (dias ou None, produto ou None)"""
+        dias = self.periodos_horarios.get(self.horarios_periodo_var.get())
+        produto = self.horarios_produto_var.get()
+        return dias, None if produto == "Todos" else produto
+        
+    def filtrar_horarios(self):
+        """Refaz o gráfico de horários com os filtros escolhidos"""
+        self._filtro_horarios = self._ler_filtro_horarios()
+        self.criar_grafico_analise_horarios()
+        
     def atualizar_dashboard(self):
         """
         🔄 ATUALIZAÇÃO COMPLETA DO DASHBOARD
@@ -374,39 +560,112 @@ class DashboardWindow:
         e atualiza a interface visual com as informações atuais.
         
         SEQUÊNCIA DE ATUALIZAÇÃO:
-        1. Atualizar métricas numéricas
-        2. Atualizar alertas de gestão
-        3. Atualizar todos os gráficos
-        4. Marcar horário da atualização
+        1. Buscar os números e os dados do gráfico visível (coletar_dados),
+           numa thread de trabalho, sem travar a janela
+        2. Atualizar métricas, alertas e gráficos (aplicar_dados)
+        3. Marcar horário da atualização
         
         É chamada automaticamente quando:
         - Dashboard é aberto
         - Usuário clica em "Atualizar"
-        - Periodicamente (se configurado)
+        - Periodicamente (intervalo escolhido em "Atualizar a cada")
+        
+        Cliques repetidos enquanto uma atualização está em andamento
+        viram uma única atualização seguinte.
         """
-        try:
-            print("🔄 Iniciando atualização do dashboard...")
-            
-            # 1. Atualizar métricas principais
-            self.atualizar_metricas()
-            
-            # 2. Atualizar alertas
-            self.atualizar_alertas()
-            
-            # 3. Atualizar gráficos
-            self.atualizar_graficos()
-            
-            # 4. Marcar horário da atualização
-            agora = datetime.now().strftime("%d/%m/%Y %H:%M:%S")
-            self.update_time_label.config(text=f"Última atualização: {agora}")
-            
-            print("✅ Dashboard atualizado com sucesso!")
-            
-        except Exception as e:
-            print(f"❌ Erro na atualização: {e}")
-            messagebox.showerror("Erro", f"Erro ao atualizar dashboard: {str(e)}")
+        print("🔄 Iniciando atualização do dashboard...")
+        self.update_time_label.config(text="Atualizando...")
+        self.agendador.solicitar()
+        
+    def coletar_dados(self):
+        """
+        📥 COLETA DOS DADOS DE UMA ATUALIZAÇÃO
         
-    def atualizar_metricas(self):
+        Roda na thread de trabalho: só consulta o banco, não toca em
+        nenhum widget. Uma única transação de leitura (conexão somente
+        leitura) faz métricas, alertas e o gráfico verem o mesmo instante
+        do banco, e as vendas do caixa continuam sendo gravadas sem
+        esperar. A rodada do cache abre antes: com o banco sem mudanças
+        desde a última atualização, nada volta a ser calculado.
+        
+        Só os dados do gráfico da aba visível são buscados; os das outras
+        abas ficam para quando forem mostradas (_aba_trocada).
+        """
+        filtro_horarios = self._filtro_horarios
+        chave = self._chave_visivel
+        with self.db.metricas.rodada(), self.db.leitura_consistente():
+            dados = {'snapshot': self.obter_snapshot(), 'filtro_horarios': filtro_horarios}
+            if chave is not None:
+                dados[chave] = self._dados_grafico(chave, filtro_horarios)
+            return dados
+            
+    def _dados_grafico(self, chave, filtro_horarios):
+        """Dados do gráfico com a chave indicada (a mesma de graficos_por_aba)"""
+        if chave == 'vendas_diarias':
+            return self.dados_vendas_diarias()
+        if chave == 'produtos':
+            return self.dados_produtos_performance()
+        if chave == 'horarios':
+            return self.dados_analise_horarios(filtro_horarios)
+        if chave == 'mensal':
+            return self.dados_comparacao_mensal()
+        raise KeyError(chave)
+            
+    def aplicar_dados(self, dados):
+        """
+        🖼️ APLICAÇÃO DOS DADOS NA INTERFACE
+        
+        Roda na thread do Tk com o resultado de coletar_dados().
+        """
+        # 1. Atualizar métricas principais
+        self.atualizar_metricas(dados['snapshot'])
+        
+        # 2. Atualizar alertas
+        self.atualizar_alertas(dados['snapshot'])
+        
+        # 3. Atualizar gráficos (só os que mudaram)
+        self.atualizar_graficos(dados)
+        
+        # 4. Marcar horário da atualização
+        agora = datetime.now().strftime("%d/%m/%Y %H:%M:%S")
+        self.update_time_label.config(text=f"Última atualização: {agora}")
+        
+        print("✅ Dashboard atualizado com sucesso!")
+        
+    def _falha_na_atualizacao(self, erro):
+        """Mostra a falha sem interromper as próximas atualizações automáticas"""
+        print(f"❌ Erro na atualização: {erro}")
+        self.update_time_label.config(text=f"⚠️ Falha na atualização: {erro}")
+        
+    def configurar_atualizacao_automatica(self, segundos, salvar=True):
+        """Muda o intervalo da atualização automática (0 desliga) e o salva nas configurações"""
+        self.intervalo_atualizacao = segundos
+        self.agendador.configurar_intervalo(segundos * 1000 or None)
+        if salvar:
+            self.db.atualizar_configuracao(CONFIG_INTERVALO_ATUALIZACAO, str(segundos))
+            
+    def fechar(self):
+        """Encerra as atualizações automáticas e fecha a janela"""
+        self.agendador.parar()
+        self.window.destroy()
+        
+    def _metrica(self, nome, periodo, funcao, *args):
+        """Valor de uma métrica pelo cache do banco (recalculado só quando os dados mudam)"""
+        return self.db.metricas.obter(nome, periodo, funcao, *args)
+        
+    def obter_snapshot(self):
+        """Números dos cartões e alertas (DashboardSnapshot): uma consulta por versão dos dados"""
+        hoje = datetime.now().date()
+        return self._metrica('snapshot', (hoje, LIMITE_ESTOQUE_BAIXO), self._ler_snapshot, hoje)
+        
+    def _ler_snapshot(self, hoje):
+        """Lê o snapshot do banco; falha sem guardar nada no cache"""
+        snapshot = self.db.obter_snapshot_dashboard(LIMITE_ESTOQUE_BAIXO, hoje)
+        if snapshot is None:
+            raise RuntimeError("Não foi possível ler os números do dashboard")
+        return snapshot
+        
+    def atualizar_metricas(self, snapshot=None):
         """
         💰 ATUALIZAÇÃO DAS MÉTRICAS FINANCEIRAS
         
@@ -424,7 +683,7 @@ class DashboardWindow:
         8. Crescimento comparado
         
         COMO FUNCIONA:
-        - Busca dados do banco com self.db.método()
+        - Busca todos os números numa única consulta (obter_snapshot)
         - Calcula valores quando necessário
         - Atualiza os labels visuais com .config(text=...)
         - Trata erros para não quebrar o sistema
@@ -432,62 +691,50 @@ class DashboardWindow:
         try:
             print("📊 Atualizando métricas...")
             
-            # Data de hoje no formato brasileiro
-            hoje = datetime.now().strftime("%d/%m/%Y")
+            # Todos os números numa única consulta (ou já coletados)
+            if snapshot is None:
+                snapshot = self.obter_snapshot()
             
             # === RECEITA HOJE ===
-            receita_hoje = self.db.obter_receita_periodo(hoje, hoje)
             self.metrics_labels["receita_hoje"].config(
-                text=f"R$ {receita_hoje:.2f}".replace('.', ',')
+                text=f"R$ {snapshot.receita_hoje:.2f}".replace('.', ',')
             )
             
             # === VENDAS HOJE ===
-            vendas_hoje = self.db.contar_vendas_periodo(hoje, hoje)
-            self.metrics_labels["vendas_hoje"].config(text=str(vendas_hoje))
+            self.metrics_labels["vendas_hoje"].config(text=str(snapshot.vendas_hoje))
             
             # === PRODUTO TOP ===
-            produto_top = self.db.obter_produto_mais_vendido()
+            produto_top = snapshot.produto_top
             # Limitar tamanho do nome para caber no cartão
             if len(produto_top) > 15:
                 produto_top = produto_top[:12] + "..."
             self.metrics_labels["produto_top"].config(text=produto_top or "Nenhum")
             
             # === TICKET MÉDIO ===
-            # Calcular: receita total ÷ número de vendas
-            if vendas_hoje > 0:
-                ticket_medio = receita_hoje / vendas_hoje
-                self.metrics_labels["ticket_medio"].config(
-                    text=f"R$ {ticket_medio:.2f}".replace('.', ',')
-                )
-            else:
-                self.metrics_labels["ticket_medio"].config(text="R$ 0,00")
+            # Receita total ÷ número de vendas (R$ 0,00 sem vendas)
+            self.metrics_labels["ticket_medio"].config(
+                text=f"R$ {snapshot.ticket_medio:.2f}".replace('.', ',')
+            )
             
             # === VALOR TOTAL DO ESTOQUE ===
-            estoque_total = self.db.obter_valor_total_estoque()
             self.metrics_labels["estoque_total"].config(
-                text=f"R$ {estoque_total:.2f}".replace('.', ',')
+                text=f"R$ {snapshot.valor_estoque:.2f}".replace('.', ',')
             )
             
             # === PRODUTOS COM ESTOQUE BAIXO ===
-            # Considerar baixo: menos de 5 unidades
-            produtos_baixo = self.db.contar_produtos_estoque_baixo(5)
-            self.metrics_labels["produtos_baixo"].config(text=str(produtos_baixo))
+            # Considerar baixo: menos de LIMITE_ESTOQUE_BAIXO unidades
+            self.metrics_labels["produtos_baixo"].config(text=str(snapshot.produtos_estoque_baixo))
             
             # === RECEITA DO MÊS ===
             # Do dia 1 até hoje
-            inicio_mes = datetime.now().replace(day=1).strftime("%d/%m/%Y")
-            receita_mes = self.db.obter_receita_periodo(inicio_mes, hoje)
             self.metrics_labels["receita_mes"].config(
-                text=f"R$ {receita_mes:.2f}".replace('.', ',')
+                text=f"R$ {snapshot.receita_mes:.2f}".replace('.', ',')
             )
             
             # === CRESCIMENTO ===
             # Comparar hoje com mesmo dia da semana passada
-            semana_passada = (datetime.now() - timedelta(days=7)).strftime("%d/%m/%Y")
-            receita_semana_passada = self.db.obter_receita_periodo(semana_passada, semana_passada)
-            
-            if receita_semana_passada > 0:
-                crescimento = ((receita_hoje - receita_semana_passada) / receita_semana_passada) * 100
+            crescimento = snapshot.crescimento
+            if crescimento is not None:
                 sinal = "+" if crescimento >= 0 else ""
                 self.metrics_labels["crescimento"].config(text=f"{sinal}{crescimento:.1f}%")
             else:
@@ -501,7 +748,7 @@ class DashboardWindow:
             for key in self.metrics_labels:
                 self.metrics_labels[key].config(text="Erro")
     
-    def atualizar_alertas(self):
+    def atualizar_alertas(self, snapshot=None):
         """
         🚨 ATUALIZAÇÃO DOS ALERTAS DE GESTÃO
         
@@ -522,27 +769,29 @@ class DashboardWindow:
         """
         try:
             alertas = []
-            hoje = datetime.now().strftime("%d/%m/%Y")
+            if snapshot is None:
+                snapshot = self.obter_snapshot()
             
             # Verificar estoque baixo
-            produtos_baixo = self.db.contar_produtos_estoque_baixo(5)
+            produtos_baixo = snapshot.produtos_estoque_baixo
             if produtos_baixo > 0:
-                alertas.append(f"⚠️ {produtos_baixo} produto(s) com estoque baixo (menos de 5 unidades)")
+                alertas.append(f"⚠️ {produtos_baixo} produto(s) com estoque baixo "
+                               f"(menos de {LIMITE_ESTOQUE_BAIXO} unidades)")
             
             # Verificar se há vendas hoje
-            vendas_hoje = self.db.contar_vendas_periodo(hoje, hoje)
+            vendas_hoje = snapshot.vendas_hoje
             if vendas_hoje == 0:
                 alertas.append("📢 Nenhuma venda registrada hoje. Verifique se o sistema está sendo usado.")
             elif vendas_hoje >= 10:
                 alertas.append(f"🎉 Ótimo! Já foram {vendas_hoje} vendas hoje!")
             
             # Verificar receita do dia
-            receita_hoje = self.db.obter_receita_periodo(hoje, hoje)
+            receita_hoje = snapshot.receita_hoje
             if receita_hoje >= 500:
                 alertas.append(f"💰 Excelente! Receita de hoje já passou de R$ {receita_hoje:.2f}!")
             
             # Verificar produto em alta
-            produto_top = self.db.obter_produto_mais_vendido()
+            produto_top = snapshot.produto_top
             if produto_top and produto_top != "Nenhum":
                 alertas.append(f"🔥 {produto_top} está em alta hoje!")
             
@@ -559,39 +808,108 @@ class DashboardWindow:
             self.alerts_text.delete(1.0, tk.END)
             self.alerts_text.insert(tk.END, "❌ Erro ao carregar alertas")
             
-    def atualizar_graficos(self):
+    def atualizar_graficos(self, dados=None):
         """
         📈 ATUALIZAÇÃO DE TODOS OS GRÁFICOS
         
         Esta função atualiza todas as análises visuais do dashboard.
         Cada gráfico mostra uma perspectiva diferente dos dados.
+        Só o gráfico da aba visível é redesenhado na hora; os das abas
+        escondidas ficam marcados como pendentes e têm os dados buscados
+        e desenhados quando a aba for mostrada (_aba_trocada).
         
         GRÁFICOS ATUALIZADOS:
         1. Vendas diárias - tendência de receita
         2. Performance produtos - ranking de vendas
         3. Análise horários - picos de movimento
         4. Comparação mensal - evolução do negócio
+        
+        Com os dados de coletar_dados(), o gráfico visível só é refeito se
+        os dados mudaram; sem eles (ou se a aba foi trocada durante a
+        coleta), o gráfico visível busca os próprios dados.
         """
         try:
             print("📈 Atualizando gráficos...")
             
-            # Configurar matplotlib para melhor aparência
-            plt.style.use('default')
-            plt.rcParams['font.size'] = 10
-            plt.rcParams['figure.facecolor'] = 'white'
-            
             # Atualizar cada gráfico
-            self.criar_grafico_vendas_diarias()
-            self.criar_grafico_produtos_performance()
-            self.criar_grafico_analise_horarios()
-            self.criar_grafico_comparacao_mensal()
+            visivel = self._grafico_visivel()
+            for chave, criar in self.graficos_por_aba.values():
+                if visivel is None or chave != visivel[0]:
+                    # Aba escondida: buscar e desenhar só quando for mostrada
+                    self._graficos_pendentes.add(chave)
+                    continue
+                self._graficos_pendentes.discard(chave)
+                if dados is None or chave not in dados:
+                    self._carregar_grafico(chave, criar)
+                else:
+                    self._desenhar_se_mudou(chave, criar, dados[chave], dados['filtro_horarios'])
             
             print("✅ Gráficos atualizados")
             
         except Exception as e:
             print(f"❌ Erro ao atualizar gráficos: {e}")
         
-    def criar_grafico_vendas_diarias(self):
+    def dados_vendas_diarias(self):
+        """Receita e quantidade dos últimos 7 dias: [(data, receita, quantidade)]"""
+        hoje = datetime.now().strftime("%d/%m/%Y")
+        return self._metrica('vendas_ultimos_dias', (hoje, 7), self.db.obter_vendas_ultimos_dias, 7)
+        
+    def dados_produtos_performance(self):
+        """Top 10 produtos por receita: [(produto, receita, quantidade)]"""
+        return self._metrica('top_produtos_receita', 10, self.db.agregados_vendas.top_produtos, 10)
+        
+    def dados_analise_horarios(self, filtro):
+        """Cubo 7x24 (dia da semana x hora) para o filtro (dias, produto)"""
+        dias, produto = filtro
+        if not dias and not produto:
+            # Período todo: grade mantida em memória, só as vendas novas são lidas
+            return self._metrica('cubo_horarios', (None, None), self.db.agregados_vendas.cubo_horarios)
+        if dias:
+            data_inicio = datetime.now() - timedelta(days=dias - 1)
+            inicio = data_inicio.strftime("%d/%m/%Y")
+        else:
+            # Mesmo período da grade em memória: só os meses ativos
+            data_inicio = inicio = self.db.inicio_historico_ativo()
+        return self._metrica('cubo_horarios', (inicio, produto), self.db.obter_cubo_horarios,
+                             data_inicio, None, produto)
+        
+    def dados_comparacao_mensal(self):
+        """Resumo dos últimos 6 meses, em ordem cronológica"""
+        return self._metrica('resumo_mensal', (datetime.now().strftime("%m/%Y"), 6),
+                             self.db.obter_resumo_mensal, 6)
+        
+    def _mostrar_grafico(self, chave, frame, classe, dados):
+        """Mostra os dados no gráfico da aba; figura e canvas são criados só na primeira vez"""
+        grafico = self.graficos.get(chave)
+        if grafico is None:
+            grafico = classe(self.cores)
+            grafico.conectar(FigureCanvasTkAgg(grafico.figura, frame))
+            self.graficos[chave] = grafico
+        if chave in self._mensagens:
+            self._mensagens[chave][0].pack_forget()
+        widget = grafico.canvas.get_tk_widget()
+        if not widget.winfo_manager():
+            widget.pack(fill=tk.BOTH, expand=True)
+        grafico.atualizar(dados)
+        
+    def _mostrar_mensagem(self, chave, frame, titulo, texto):
+        """Troca o gráfico da aba por um aviso (sem dados ou erro), reaproveitando os widgets"""
+        if chave in self.graficos:
+            self.graficos[chave].canvas.get_tk_widget().pack_forget()
+        if chave not in self._mensagens:
+            quadro = ttk.Frame(frame)
+            titulo_label = ttk.Label(quadro, font=("Arial", 14, "bold"))
+            titulo_label.pack(pady=50)
+            texto_label = ttk.Label(quadro, font=("Arial", 11), justify=tk.CENTER)
+            texto_label.pack()
+            self._mensagens[chave] = (quadro, titulo_label, texto_label)
+        quadro, titulo_label, texto_label = self._mensagens[chave]
+        titulo_label.config(text=titulo)
+        texto_label.config(text=texto)
+        if not quadro.winfo_manager():
+            quadro.pack(expand=True, fill=tk.BOTH)
+        
+    def criar_grafico_vendas_diarias(self, dados=None):
         """
         📊 GRÁFICO DE VENDAS DIÁRIAS
         
@@ -607,140 +925,39 @@ class DashboardWindow:
         
         COMO FUNCIONA:
         1. Busca dados dos últimos 7 dias no banco
-        2. Cria dois gráficos: receita (linha) e quantidade (barras)
-        3. Usa matplotlib para criar gráficos bonitos
-        4. Integra com tkinter usando FigureCanvasTkAgg
+        2. Na primeira vez monta a figura (GraficoVendasDiarias) com
+           receita (linha) e quantidade (barras) num FigureCanvasTkAgg
+        3. Nas seguintes só troca os dados da mesma figura: nada de
+           destruir e recriar widgets, sem piscar a tela
         """
         try:
             print("📊 Criando gráfico de vendas diárias...")
             
-            # Limpar aba antes de criar novo gráfico
-            for widget in self.tab_vendas.winfo_children():
-                widget.destroy()
-                
-            # Buscar dados dos últimos 7 dias
-            dados_vendas = self.db.obter_vendas_ultimos_dias(7)
+            # Dados dos últimos 7 dias (já coletados ou buscados agora)
+            dados_vendas = self.dados_vendas_diarias() if dados is None else dados
+            self._dados_exibidos['vendas_diarias'] = dados_vendas
             
             if not dados_vendas:
                 # Se não há dados, mostrar mensagem explicativa
-                no_data_frame = ttk.Frame(self.tab_vendas)
-                no_data_frame.pack(expand=True, fill=tk.BOTH)
-                
-                ttk.Label(
-                    no_data_frame, 
-                    text="📈 Nenhuma venda registrada ainda",
-                    font=("Arial", 14, "bold")
-                ).pack(pady=50)
-                
-                ttk.Label(
-                    no_data_frame,
-                    text="Este gráfico aparecerá quando houver vendas registradas.\nComece registrando algumas vendas no sistema!",
-                    font=("Arial", 11),
-                    justify=tk.CENTER
-                ).pack()
+                self._mostrar_mensagem(
+                    'vendas_diarias', self.tab_vendas,
+                    "📈 Nenhuma venda registrada ainda",
+                    "Este gráfico aparecerá quando houver vendas registradas.\nComece registrando algumas vendas no sistema!"
+                )
                 return
                 
-            # Preparar dados para o gráfico
-            datas = [item[0] for item in dados_vendas]  # DD/MM/YYYY
-            receitas = [float(item[1]) for item in dados_vendas]  # Valores em R$
-            quantidades = [int(item[2]) for item in dados_vendas]  # Número de itens
-            
-            # Criar figura com dois subgráficos (tamanho otimizado)
-            fig = Figure(figsize=(13, 7), facecolor='white')
-            
-            # === GRÁFICO 1: RECEITA DIÁRIA (LINHA) ===
-            ax1 = fig.add_subplot(2, 1, 1)
-            linha_receita = ax1.plot(
-                datas, receitas, 
-                marker='o', 
-                linewidth=3, 
-                markersize=8,
-                color=self.cores['receita'],
-                markerfacecolor='white',
-                markeredgewidth=2
-            )
-            
-            ax1.set_title('💰 Receita Diária (Últimos 7 Dias)', fontsize=14, fontweight='bold', pad=20)
-            ax1.set_ylabel('Receita (R$)', fontsize=12)
-            ax1.grid(True, alpha=0.3, linestyle='--')
-            ax1.set_facecolor('#f8f9fa')
-            
-            # Adicionar valores nos pontos
-            for i, (data, receita) in enumerate(zip(datas, receitas)):
-                ax1.annotate(
-                    f'R$ {receita:.0f}', 
-                    (i, receita),
-                    textcoords="offset points",
-                    xytext=(0,10),
-                    ha='center',
-                    fontsize=9,
-                    fontweight='bold'
-                )
-            
-            # === GRÁFICO 2: QUANTIDADE VENDIDA (BARRAS) ===
-            ax2 = fig.add_subplot(2, 1, 2)
-            barras = ax2.bar(
-                datas, quantidades, 
-                color=self.cores['vendas'], 
-                alpha=0.8,
-                edgecolor='white',
-                linewidth=2
-            )
-            
-            ax2.set_title('🛒 Quantidade Vendida por Dia', fontsize=14, fontweight='bold', pad=20)
-            ax2.set_ylabel('Unidades Vendidas', fontsize=12)
-            ax2.set_xlabel('Data', fontsize=12)
-            ax2.grid(True, alpha=0.3, linestyle='--')
-            ax2.set_facecolor('#f8f9fa')
-            
-            # Adicionar valores nas barras
-            for i, (barra, quantidade) in enumerate(zip(barras, quantidades)):
-                altura = barra.get_height()
-                ax2.text(
-                    barra.get_x() + barra.get_width()/2., 
-                    altura + 0.5,
-                    f'{int(quantidade)}',
-                    ha='center', 
-                    va='bottom',
-                    fontsize=10,
-                    fontweight='bold'
-                )
-            
-            # Melhorar formatação dos eixos
-            for ax in [ax1, ax2]:
-                ax.tick_params(axis='x', rotation=45)
-                for spine in ax.spines.values():
-                    spine.set_linewidth(0.5)
-            
-            # Ajustar layout
-            fig.tight_layout(pad=3.0)
-            
-            # Adicionar ao tkinter
-            canvas = FigureCanvasTkAgg(fig, self.tab_vendas)
-            canvas.draw()
-            canvas.get_tk_widget().pack(fill=tk.BOTH, expand=True)
+            # Receita (linha) e quantidade (barras), na mesma figura de sempre
+            self._mostrar_grafico('vendas_diarias', self.tab_vendas, GraficoVendasDiarias, dados_vendas)
             
             print("✅ Gráfico de vendas diárias criado")
             
         except Exception as e:
             print(f"❌ Erro ao criar gráfico de vendas: {e}")
             # Mostrar erro na interface
-            error_frame = ttk.Frame(self.tab_vendas)
-            error_frame.pack(expand=True, fill=tk.BOTH)
-            
-            ttk.Label(
-                error_frame, 
-                text="❌ Erro ao carregar gráfico de vendas",
-                font=("Arial", 12, "bold")
-            ).pack(pady=20)
-            
-            ttk.Label(
-                error_frame,
-                text=f"Detalhes: {str(e)}",
-                font=("Arial", 10)
-            ).pack()
+            self._mostrar_mensagem('vendas_diarias', self.tab_vendas,
+                                   "❌ Erro ao carregar gráfico de vendas", f"Detalhes: {str(e)}")
             
-    def criar_grafico_produtos_performance(self):
+    def criar_grafico_produtos_performance(self, dados=None):
         """
         🏆 GRÁFICO DE PERFORMANCE DOS PRODUTOS
         
@@ -757,141 +974,38 @@ class DashboardWindow:
         
         EXPLICAÇÃO TÉCNICA:
         1. Busca top 10 produtos por receita total
-        2. Cria gráficos de barras horizontais
+        2. Atualiza as barras horizontais da figura já montada (GraficoProdutos)
         3. Mostra valores nas barras para fácil leitura
         4. Usa cores diferentes para receita vs quantidade
         """
         try:
             print("🏆 Criando gráfico de performance dos produtos...")
             
-            # Limpar aba
-            for widget in self.tab_produtos.winfo_children():
-                widget.destroy()
-                
-            # Buscar top 10 produtos por receita
-            produtos_performance = self.db.obter_top_produtos_receita(10)
+            # Top 10 produtos por receita (já coletados ou buscados agora)
+            produtos_performance = self.dados_produtos_performance() if dados is None else dados
+            self._dados_exibidos['produtos'] = produtos_performance
             
             if not produtos_performance:
                 # Se não há dados, mostrar mensagem
-                no_data_frame = ttk.Frame(self.tab_produtos)
-                no_data_frame.pack(expand=True, fill=tk.BOTH)
-                
-                ttk.Label(
-                    no_data_frame, 
-                    text="🏆 Nenhum produto vendido ainda",
-                    font=("Arial", 14, "bold")
-                ).pack(pady=50)
-                
-                ttk.Label(
-                    no_data_frame,
-                    text="Registre algumas vendas para ver\nquais produtos são os campeões!",
-                    font=("Arial", 11),
-                    justify=tk.CENTER
-                ).pack()
+                self._mostrar_mensagem(
+                    'produtos', self.tab_produtos,
+                    "🏆 Nenhum produto vendido ainda",
+                    "Registre algumas vendas para ver\nquais produtos são os campeões!"
+                )
                 return
                 
-            # Preparar dados
-            produtos = [item[0] for item in produtos_performance]
-            receitas = [float(item[1]) for item in produtos_performance]
-            quantidades = [int(item[2]) for item in produtos_performance]
-            
-            # Limitar nome dos produtos para caber no gráfico
-            produtos_formatados = []
-            for produto in produtos:
-                if len(produto) > 20:
-                    produtos_formatados.append(produto[:17] + "...")
-                else:
-                    produtos_formatados.append(produto)
-            
-            # Criar figura (produtos performance)
-            fig = Figure(figsize=(13, 7), facecolor='white')
-            
-            # === GRÁFICO 1: RECEITA POR PRODUTO ===
-            ax1 = fig.add_subplot(1, 2, 1)
-            bars1 = ax1.barh(
-                produtos_formatados, receitas, 
-                color=self.cores['receita'],
-                alpha=0.8,
-                edgecolor='white',
-                linewidth=1
-            )
-            
-            ax1.set_title('💰 Top 10 Produtos por Receita', fontsize=14, fontweight='bold', pad=20)
-            ax1.set_xlabel('Receita Total (R$)', fontsize=12)
-            ax1.grid(True, alpha=0.3, linestyle='--', axis='x')
-            ax1.set_facecolor('#f8f9fa')
-            
-            # Adicionar valores nas barras
-            for bar, valor in zip(bars1, receitas):
-                largura = bar.get_width()
-                ax1.text(
-                    largura + max(receitas) * 0.01,  # Pequeno offset
-                    bar.get_y() + bar.get_height()/2, 
-                    f'R$ {valor:.0f}', 
-                    ha='left', 
-                    va='center',
-                    fontsize=10,
-                    fontweight='bold'
-                )
-            
-            # === GRÁFICO 2: QUANTIDADE POR PRODUTO ===
-            ax2 = fig.add_subplot(1, 2, 2)
-            bars2 = ax2.barh(
-                produtos_formatados, quantidades, 
-                color=self.cores['vendas'],
-                alpha=0.8,
-                edgecolor='white',
-                linewidth=1
-            )
-            
-            ax2.set_title('🛒 Top 10 Produtos por Quantidade', fontsize=14, fontweight='bold', pad=20)
-            ax2.set_xlabel('Unidades Vendidas', fontsize=12)
-            ax2.grid(True, alpha=0.3, linestyle='--', axis='x')
-            ax2.set_facecolor('#f8f9fa')
-            
-            # Adicionar valores nas barras
-            for bar, valor in zip(bars2, quantidades):
-                largura = bar.get_width()
-                ax2.text(
-                    largura + max(quantidades) * 0.01,  # Pequeno offset
-                    bar.get_y() + bar.get_height()/2, 
-                    f'{valor:.0f}', 
-                    ha='left', 
-                    va='center',
-                    fontsize=10,
-                    fontweight='bold'
-                )
-            
-            # Melhorar formatação
-            for ax in [ax1, ax2]:
-                ax.tick_params(axis='y', labelsize=9)
-                ax.tick_params(axis='x', labelsize=10)
-                for spine in ax.spines.values():
-                    spine.set_linewidth(0.5)
-            
-            # Ajustar layout
-            fig.tight_layout(pad=3.0)
-            
-            # Adicionar ao tkinter
-            canvas = FigureCanvasTkAgg(fig, self.tab_produtos)
-            canvas.draw()
-            canvas.get_tk_widget().pack(fill=tk.BOTH, expand=True)
+            # Receita e quantidade por produto (barras horizontais)
+            self._mostrar_grafico('produtos', self.tab_produtos, GraficoProdutos, produtos_performance)
             
             print("✅ Gráfico de performance de produtos criado")
             
         except Exception as e:
             print(f"❌ Erro ao criar gráfico de produtos: {e}")
             # Mostrar erro na interface
-            error_frame = ttk.Frame(self.tab_produtos)
-            error_frame.pack(expand=True, fill=tk.BOTH)
-            
-            ttk.Label(
-                error_frame, 
-                text="❌ Erro ao carregar gráfico de produtos",
-                font=("Arial", 12, "bold")
-            ).pack(pady=20)
+            self._mostrar_mensagem('produtos', self.tab_produtos,
+                                   "❌ Erro ao carregar gráfico de produtos", f"Detalhes: {str(e)}")
             
-    def criar_grafico_analise_horarios(self):
+    def criar_grafico_analise_horarios(self, dados=None):
         """
         🕐 GRÁFICO DE ANÁLISE POR HORÁRIOS
         
@@ -906,6 +1020,14 @@ class DashboardWindow:
         - Receita por hora do dia (0h às 23h)
         - Área preenchida para destacar volumes
         - Pontos marcados para horários de pico
+        - Mapa de calor dia da semana x hora (para montar escalas)
+        
+        DE ONDE VÊM OS DADOS:
+        - Cubo 7x24 pré-calculado no banco (obter_cubo_horarios)
+        - Atualizado pelos triggers a cada venda, então o custo do
+          gráfico não cresce com o tamanho do histórico
+        - Sem filtro, a grade fica em memória (db.agregados_vendas) e
+          cada atualização soma só as vendas novas
         
         INTERPRETAÇÃO PRÁTICA:
         - Picos = horários para ter mais funcionários
@@ -915,133 +1037,32 @@ class DashboardWindow:
         try:
             print("🕐 Criando gráfico de análise por horários...")
             
-            # Limpar aba
-            for widget in self.tab_horarios.winfo_children():
-                widget.destroy()
-                
-            # Buscar vendas por horário
-            vendas_horario = self.db.obter_vendas_por_horario()
-            
-            if not vendas_horario:
-                # Se não há dados, mostrar mensagem
-                no_data_frame = ttk.Frame(self.tab_horarios)
-                no_data_frame.pack(expand=True, fill=tk.BOTH)
-                
-                ttk.Label(
-                    no_data_frame, 
-                    text="🕐 Nenhuma venda com horário registrada",
-                    font=("Arial", 14, "bold")
-                ).pack(pady=50)
-                
-                ttk.Label(
-                    no_data_frame,
-                    text="Este gráfico mostrará os horários de pico\nquando houver mais vendas registradas.",
-                    font=("Arial", 11),
-                    justify=tk.CENTER
-                ).pack()
+            # Cubo dia da semana x hora (7 linhas x 24 colunas) com os
+            # filtros de período e produto (já coletado ou buscado agora)
+            cubo = self.dados_analise_horarios(self._filtro_horarios) if dados is None else dados
+            self._dados_exibidos['horarios'] = cubo
+            
+            if not any(any(linha) for linha in cubo):
+                # Se não há dados, mostrar mensagem (os filtros ficam)
+                self._mostrar_mensagem(
+                    'horarios', self.horarios_conteudo,
+                    "🕐 Nenhuma venda com horário registrada",
+                    "Este gráfico mostrará os horários de pico\nquando houver mais vendas registradas."
+                )
                 return
                 
-            # Preparar dados - criar array completo de 24 horas
-            receita_por_hora = [0.0] * 24  # 0h às 23h
-            
-            # Preencher com dados reais
-            for hora, receita in vendas_horario:
-                if 0 <= hora <= 23:
-                    receita_por_hora[hora] = float(receita)
-            
-            horarios = list(range(24))  # 0 a 23
-            
-            # Criar figura (análise horários)
-            fig = Figure(figsize=(13, 6), facecolor='white')
-            ax = fig.add_subplot(1, 1, 1)
-            
-            # === GRÁFICO DE ÁREA ===
-            linha = ax.plot(
-                horarios, receita_por_hora, 
-                marker='o', 
-                linewidth=4, 
-                markersize=6,
-                color=self.cores['crescimento'],
-                markerfacecolor='white',
-                markeredgewidth=2,
-                label='Receita por Hora'
-            )
-            
-            # Área preenchida
-            ax.fill_between(
-                horarios, receita_por_hora, 
-                alpha=0.3, 
-                color=self.cores['crescimento']
-            )
-            
-            # Destacar horários de pico (se receita > média)
-            receita_media = sum(receita_por_hora) / len(receita_por_hora) if receita_por_hora else 0
-            for i, receita in enumerate(receita_por_hora):
-                if receita > receita_media and receita > 0:
-                    ax.plot(i, receita, 'o', markersize=12, color='red', alpha=0.7)
-                    ax.annotate(
-                        f'PICO\nR$ {receita:.0f}', 
-                        (i, receita),
-                        textcoords="offset points",
-                        xytext=(0,20),
-                        ha='center',
-                        fontsize=8,
-                        fontweight='bold',
-                        bbox=dict(boxstyle="round,pad=0.3", facecolor='yellow', alpha=0.7)
-                    )
-            
-            # Configurações do gráfico
-            ax.set_title('🕐 Análise de Vendas por Horário do Dia', fontsize=16, fontweight='bold', pad=20)
-            ax.set_xlabel('Horário do Dia', fontsize=12)
-            ax.set_ylabel('Receita (R$)', fontsize=12)
-            ax.grid(True, alpha=0.3, linestyle='--')
-            ax.set_facecolor('#f8f9fa')
-            
-            # Configurar eixo X (horários)
-            ax.set_xticks(range(0, 24, 2))  # De 2 em 2 horas
-            ax.set_xticklabels([f"{h:02d}h" for h in range(0, 24, 2)])
-            
-            # Adicionar linha da média
-            if receita_media > 0:
-                ax.axhline(
-                    y=receita_media, 
-                    color='orange', 
-                    linestyle='--', 
-                    alpha=0.8,
-                    label=f'Média: R$ {receita_media:.2f}'
-                )
-            
-            # Legenda
-            ax.legend(loc='upper right', fontsize=10)
-            
-            # Melhorar formatação
-            ax.tick_params(axis='both', labelsize=10)
-            for spine in ax.spines.values():
-                spine.set_linewidth(0.5)
-            
-            # Ajustar layout
-            fig.tight_layout(pad=3.0)
-            
-            # Adicionar ao tkinter
-            canvas = FigureCanvasTkAgg(fig, self.tab_horarios)
-            canvas.draw()
-            canvas.get_tk_widget().pack(fill=tk.BOTH, expand=True)
+            # Linha por hora (picos e média) + mapa de calor dia da semana x hora
+            self._mostrar_grafico('horarios', self.horarios_conteudo, GraficoHorarios, cubo)
             
             print("✅ Gráfico de análise por horários criado")
             
         except Exception as e:
             print(f"❌ Erro ao criar gráfico de horários: {e}")
             # Mostrar erro na interface
-            error_frame = ttk.Frame(self.tab_horarios)
-            error_frame.pack(expand=True, fill=tk.BOTH)
-            
-            ttk.Label(
-                error_frame, 
-                text="❌ Erro ao carregar gráfico de horários",
-                font=("Arial", 12, "bold")
-            ).pack(pady=20)
+            self._mostrar_mensagem('horarios', self.horarios_conteudo,
+                                   "❌ Erro ao carregar gráfico de horários", f"Detalhes: {str(e)}")
     
-    def criar_grafico_comparacao_mensal(self):
+    def criar_grafico_comparacao_mensal(self, dados=None):
         """
         📅 GRÁFICO DE EVOLUÇÃO MENSAL
         
@@ -1066,192 +1087,29 @@ class DashboardWindow:
         try:
             print("📅 Criando gráfico de evolução mensal...")
             
-            # Limpar aba
-            for widget in self.tab_comparacao.winfo_children():
-                widget.destroy()
-                
-            # Calcular dados dos últimos 6 meses
-            dados_mensais = []
-            hoje = datetime.now()
-            
-            for i in range(6):
-                # Calcular mês
-                mes_atual = hoje.replace(day=1) - timedelta(days=30*i)
-                inicio_mes = mes_atual.strftime("%d/%m/%Y")
-                
-                # Último dia do mês
-                if mes_atual.month == 12:
-                    fim_mes = mes_atual.replace(year=mes_atual.year + 1, month=1, day=1) - timedelta(days=1)
-                else:
-                    fim_mes = mes_atual.replace(month=mes_atual.month + 1, day=1) - timedelta(days=1)
-                fim_mes_str = fim_mes.strftime("%d/%m/%Y")
-                
-                # Buscar receita do mês
-                receita_mes = self.db.obter_receita_periodo(inicio_mes, fim_mes_str)
-                vendas_mes = self.db.contar_vendas_periodo(inicio_mes, fim_mes_str)
-                
-                dados_mensais.append({
-                    'mes': mes_atual.strftime("%m/%Y"),
-                    'receita': receita_mes,
-                    'vendas': vendas_mes
-                })
-            
-            # Inverter para ordem cronológica
-            dados_mensais = dados_mensais[::-1]
+            # Dados dos últimos 6 meses (lidos do agregado diário, já em ordem cronológica)
+            dados_mensais = self.dados_comparacao_mensal() if dados is None else dados
+            self._dados_exibidos['mensal'] = dados_mensais
             
             if not any(d['receita'] > 0 for d in dados_mensais):
                 # Se não há dados, mostrar mensagem
-                no_data_frame = ttk.Frame(self.tab_comparacao)
-                no_data_frame.pack(expand=True, fill=tk.BOTH)
-                
-                ttk.Label(
-                    no_data_frame, 
-                    text="📅 Dados insuficientes para análise mensal",
-                    font=("Arial", 14, "bold")
-                ).pack(pady=50)
-                
-                ttk.Label(
-                    no_data_frame,
-                    text="Este gráfico mostrará a evolução do negócio\nquando houver dados de múltiplos meses.",
-                    font=("Arial", 11),
-                    justify=tk.CENTER
-                ).pack()
-                return
-                
-            # Preparar dados para gráfico
-            meses = [d['mes'] for d in dados_mensais]
-            receitas = [d['receita'] for d in dados_mensais]
-            vendas = [d['vendas'] for d in dados_mensais]
-            
-            # Criar figura (evolução mensal)
-            fig = Figure(figsize=(13, 7), facecolor='white')
-            
-            # === GRÁFICO 1: RECEITA MENSAL ===
-            ax1 = fig.add_subplot(2, 1, 1)
-            
-            # Gráfico de barras para receita
-            bars = ax1.bar(
-                meses, receitas, 
-                color=self.cores['receita'],
-                alpha=0.8,
-                edgecolor='white',
-                linewidth=2,
-                label='Receita Mensal'
-            )
-            
-            # Linha de tendência
-            if len(receitas) > 1:
-                ax1.plot(
-                    meses, receitas, 
-                    color='red', 
-                    linewidth=3, 
-                    marker='o', 
-                    markersize=8,
-                    label='Tendência'
-                )
-            
-            ax1.set_title('💰 Evolução da Receita Mensal', fontsize=14, fontweight='bold', pad=20)
-            ax1.set_ylabel('Receita (R$)', fontsize=12)
-            ax1.grid(True, alpha=0.3, linestyle='--')
-            ax1.set_facecolor('#f8f9fa')
-            ax1.legend()
-            
-            # Adicionar valores nas barras
-            for bar, valor in zip(bars, receitas):
-                altura = bar.get_height()
-                ax1.text(
-                    bar.get_x() + bar.get_width()/2., 
-                    altura + max(receitas) * 0.01,
-                    f'R$ {valor:.0f}',
-                    ha='center', 
-                    va='bottom',
-                    fontsize=10,
-                    fontweight='bold'
+                self._mostrar_mensagem(
+                    'mensal', self.tab_comparacao,
+                    "📅 Dados insuficientes para análise mensal",
+                    "Este gráfico mostrará a evolução do negócio\nquando houver dados de múltiplos meses."
                 )
-            
-            # === GRÁFICO 2: NÚMERO DE VENDAS MENSAIS ===
-            ax2 = fig.add_subplot(2, 1, 2)
-            
-            # Gráfico de linha para vendas
-            ax2.plot(
-                meses, vendas, 
-                marker='s', 
-                linewidth=4, 
-                markersize=8,
-                color=self.cores['vendas'],
-                markerfacecolor='white',
-                markeredgewidth=2,
-                label='Vendas Mensais'
-            )
-            
-            # Área preenchida
-            ax2.fill_between(
-                meses, vendas, 
-                alpha=0.3, 
-                color=self.cores['vendas']
-            )
-            
-            ax2.set_title('🛒 Evolução do Número de Vendas', fontsize=14, fontweight='bold', pad=20)
-            ax2.set_ylabel('Número de Vendas', fontsize=12)
-            ax2.set_xlabel('Mês/Ano', fontsize=12)
-            ax2.grid(True, alpha=0.3, linestyle='--')
-            ax2.set_facecolor('#f8f9fa')
-            ax2.legend()
-            
-            # Adicionar valores nos pontos
-            for i, (mes, venda) in enumerate(zip(meses, vendas)):
-                ax2.annotate(
-                    f'{int(venda)}', 
-                    (i, venda),
-                    textcoords="offset points",
-                    xytext=(0,15),
-                    ha='center',
-                    fontsize=10,
-                    fontweight='bold'
-                )
-            
-            # Calcular e mostrar crescimento
-            if len(receitas) >= 2:
-                crescimento = ((receitas[-1] - receitas[-2]) / receitas[-2]) * 100 if receitas[-2] > 0 else 0
-                cor_crescimento = 'green' if crescimento >= 0 else 'red'
-                sinal = '+' if crescimento >= 0 else ''
+                return
                 
-                # Adicionar texto de crescimento
-                fig.suptitle(
-                    f'Crescimento último mês: {sinal}{crescimento:.1f}%',
-                    fontsize=12,
-                    color=cor_crescimento,
-                    y=0.02
-                )
-            
-            # Melhorar formatação
-            for ax in [ax1, ax2]:
-                ax.tick_params(axis='x', rotation=45, labelsize=10)
-                ax.tick_params(axis='y', labelsize=10)
-                for spine in ax.spines.values():
-                    spine.set_linewidth(0.5)
-            
-            # Ajustar layout
-            fig.tight_layout(pad=3.0)
-            
-            # Adicionar ao tkinter
-            canvas = FigureCanvasTkAgg(fig, self.tab_comparacao)
-            canvas.draw()
-            canvas.get_tk_widget().pack(fill=tk.BOTH, expand=True)
+            # Receita (barras e tendência), vendas (linha) e crescimento do último mês
+            self._mostrar_grafico('mensal', self.tab_comparacao, GraficoMensal, dados_mensais)
             
             print("✅ Gráfico de evolução mensal criado")
             
         except Exception as e:
             print(f"❌ Erro ao criar gráfico mensal: {e}")
             # Mostrar erro na interface
-            error_frame = ttk.Frame(self.tab_comparacao)
-            error_frame.pack(expand=True, fill=tk.BOTH)
-            
-            ttk.Label(
-                error_frame, 
-                text="❌ Erro ao carregar gráfico mensal",
-                font=("Arial", 12, "bold")
-            ).pack(pady=20)
+            self._mostrar_mensagem('mensal', self.tab_comparacao,
+                                   "❌ Erro ao carregar gráfico mensal", f"Detalhes: {str(e)}")
     
     def mostrar_ajuda(self):
         """
@@ -1468,12 +1326,7 @@ Sucesso no seu negócio! 🚀
             with pd.ExcelWriter(filename, engine='openpyxl') as writer:
                 
                 # === ABA 1: RESUMO EXECUTIVO ===
-                hoje = datetime.now().strftime("%d/%m/%Y")
-                receita_hoje = self.db.obter_receita_periodo(hoje, hoje)
-                vendas_hoje = self.db.contar_vendas_periodo(hoje, hoje)
-                produto_top = self.db.obter_produto_mais_vendido()
-                estoque_total = self.db.obter_valor_total_estoque()
-                produtos_baixo = self.db.contar_produtos_estoque_baixo(5)
+                snapshot = self.obter_snapshot()
                 
                 resumo_data = {
                     'Métrica': [
@@ -1481,12 +1334,12 @@ Sucesso no seu negócio! 🚀
                         'Ticket Médio', 'Valor Estoque Total', 'Produtos Estoque Baixo'
                     ],
                     'Valor': [
-                        f'R$ {receita_hoje:.2f}',
-                        vendas_hoje,
-                        produto_top,
-                        f'R$ {(receita_hoje/vendas_hoje if vendas_hoje > 0 else 0):.2f}',
-                        f'R$ {estoque_total:.2f}',
-                        produtos_baixo
+                        f'R$ {snapshot.receita_hoje:.2f}',
+                        snapshot.vendas_hoje,
+                        snapshot.produto_top,
+                        f'R$ {snapshot.ticket_medio:.2f}',
+                        f'R$ {snapshot.valor_estoque:.2f}',
+                        snapshot.produtos_estoque_baixo
                     ]
                 }
                 
@@ -1494,13 +1347,13 @@ Sucesso no seu negócio! 🚀
                 df_resumo.to_excel(writer, sheet_name='Resumo Executivo', index=False)
                 
                 # === ABA 2: VENDAS DOS ÚLTIMOS 7 DIAS ===
-                dados_vendas = self.db.obter_vendas_ultimos_dias(7)
+                dados_vendas = self.dados_vendas_diarias()
                 if dados_vendas:
                     df_vendas = pd.DataFrame(dados_vendas, columns=['Data', 'Receita', 'Quantidade'])
                     df_vendas.to_excel(writer, sheet_name='Vendas 7 Dias', index=False)
                 
                 # === ABA 3: TOP PRODUTOS ===
-                produtos_performance = self.db.obter_top_produtos_receita(20)
+                produtos_performance = self.db.agregados_vendas.top_produtos(20)
                 if produtos_performance:
                     df_produtos = pd.DataFrame(produtos_performance, columns=['Produto', 'Receita Total', 'Quantidade Total'])
                     df_produtos.to_excel(writer, sheet_name='Top Produtos', index=False)
@@ -1545,21 +1398,3 @@ Sucesso no seu negócio! 🚀
                 f"Não foi possível gerar o relatório.\n\nErro: {str(e)}\n\n"
                 f"Verifique se você tem permissão para escrever na pasta 'data/relatorios/'."
             )
-            
-    def exportar_relatorio(self):
-        """Exporta relatório executivo"""
-        try:
-            from src.relatorios.relatorio_executivo import RelatorioExecutivo
-            relatorio = RelatorioExecutivo()
-            arquivo = relatorio.gerar_relatorio_completo()
-            
-            if arquivo:
-                messagebox.showinfo(
-                    "Sucesso", 
-                    f"Relatório executivo exportado:\n{arquivo}"
-                )
-            else:
-                messagebox.showerror("Erro", "Falha ao exportar relatório")
-                
-        except Exception as e:
-            messagebox.showerror("Erro", f"Erro ao exportar: {str(e)}")
\ No newline at end of file
@@ -0,0 +1,420 @@
+"""
+Gráficos do dashboard montados uma única vez e atualizados no lugar
+"""
+
+from matplotlib.figure import Figure
+from matplotlib.text import Annotation
+from matplotlib.ticker import MaxNLocator
+
+
+DIAS_SEMANA = ['Seg', 'Ter', 'Qua', 'Qui', 'Sex', 'Sáb', 'Dom']
+
+
+class GraficoDashboard:
+    """
+    Figura do dashboard com eixos e artistas criados uma única vez.
+
+    atualizar(dados) só troca os dados dos artistas (set_data, set_height,
+    set_text...) e recalcula os limites dos eixos, arredondados para cima
+    para mudarem pouco entre uma venda e outra. Se tamanho, limites e
+    rótulos dos eixos continuam os mesmos, só os artistas de dados são redesenhados
+    sobre o fundo guardado do último desenho completo (blit); senão a
+    figura toda é redesenhada com draw_idle(). Depois da montagem nenhuma
+    figura, eixo ou widget é criado.
+
+    Cada subclasse implementa:
+    - montar(): cria os eixos e os artistas, uma única vez (chamado no
+      construtor);
+    - aplicar(dados): passa os dados para os artistas e retorna os rótulos
+      que mudam o fundo (qualquer valor comparável: mudou, desenho completo).
+    """
+
+    TAMANHO = (13, 7)
+
+    def __init__(self, cores, dpi=100):
+        self.cores = cores
+        self.figura = Figure(figsize=self.TAMANHO, dpi=dpi, facecolor='white')
+        self.canvas = None
+        self._animados = []     # artistas de dados, desenhados por cima do fundo
+        self._fundo = None      # figura sem os artistas de dados (copy_from_bbox)
+        self._estrutura = None  # tamanho, limites e rótulos do último desenho completo
+        self._rotulos = {}      # (eixo, 'x' ou 'y') -> rótulos atuais dos ticks
+        # Diagnóstico: desenhos completos da figura e atualizações por blit
+        self.desenhos_completos = 0
+        self.blits = 0
+        self.montar()
+
+    def conectar(self, canvas):
+        """Liga a figura ao canvas (FigureCanvasTkAgg na janela, FigureCanvasAgg nos testes)"""
+        self.canvas = canvas
+        canvas.mpl_connect('draw_event', self._ao_desenhar)
+
+    def atualizar(self, dados):
+        """Mostra novos dados redesenhando o mínimo possível"""
+        estrutura = (self.aplicar(dados), self.figura.bbox.bounds,
+                     tuple((ax.get_xlim(), ax.get_ylim()) for ax in self.figura.axes))
+        if self.canvas is None:
+            return
+        if estrutura == self._estrutura and self._fundo is not None:
+            self.canvas.restore_region(self._fundo)
+            self._desenhar_animados()
+            self.canvas.blit(self.figura.bbox)
+            self.blits += 1
+            return
+        self._estrutura = estrutura
+        self._fundo = None
+        self.figura.tight_layout(pad=3.0)
+        self.canvas.draw_idle()
+
+    def _rotular(self, ax, eixo, rotulos):
+        """Posições 0..n-1 do eixo com os rótulos dados (os ticks só são refeitos se mudarem)"""
+        rotulos = list(rotulos)
+        if self._rotulos.get((ax, eixo)) == rotulos:
+            return
+        self._rotulos[(ax, eixo)] = rotulos
+        if eixo == 'x':
+            ax.set_xticks(range(len(rotulos)))
+            ax.set_xticklabels(rotulos)
+        else:
+            ax.set_yticks(range(len(rotulos)))
+            ax.set_yticklabels(rotulos)
+
+    def _animar(self, *artistas):
+        """Tira os artistas do desenho do fundo: eles são desenhados por cima, a cada atualização"""
+        for artista in artistas:
+            artista.set_animated(True)
+            self._animados.append(artista)
+
+    def _ao_desenhar(self, event):
+        """Depois de um desenho completo: guarda o fundo e desenha os dados por cima"""
+        self.desenhos_completos += 1
+        if self.canvas.supports_blit:
+            self._fundo = self.canvas.copy_from_bbox(self.figura.bbox)
+        self._desenhar_animados()
+
+    def _desenhar_animados(self):
+        """Desenha os artistas de dados visíveis"""
+        for artista in self._animados:
+            if artista.get_visible():
+                self.figura.draw_artist(artista)
+
+
+class GraficoVendasDiarias(GraficoDashboard):
+    """Receita (linha) e itens vendidos (barras) por dia dos últimos 7 dias"""
+
+    DIAS = 7
+
+    def montar(self):
+        """Linha de receita e barras de quantidade, com os valores escritos"""
+        self.ax_receita = self.figura.add_subplot(2, 1, 1)
+        self.linha_receita, = self.ax_receita.plot(
+            [], [], marker='o', linewidth=3, markersize=8, color=self.cores['receita'],
+            markerfacecolor='white', markeredgewidth=2
+        )
+        self.valores_receita = _anotacoes(self.ax_receita, self.DIAS, xytext=(0, 10), fontsize=9)
+        self.ax_receita.set_title('💰 Receita Diária (Últimos 7 Dias)', fontsize=14, fontweight='bold', pad=20)
+        self.ax_receita.set_ylabel('Receita (R$)', fontsize=12)
+
+        self.ax_quantidade = self.figura.add_subplot(2, 1, 2)
+        self.barras = self.ax_quantidade.bar(
+            range(self.DIAS), [0] * self.DIAS, color=self.cores['vendas'],
+            alpha=0.8, edgecolor='white', linewidth=2
+        )
+        self.valores_quantidade = _textos(self.ax_quantidade, self.DIAS, ha='center', va='bottom', fontsize=10)
+        self.ax_quantidade.set_title('🛒 Quantidade Vendida por Dia', fontsize=14, fontweight='bold', pad=20)
+        self.ax_quantidade.set_ylabel('Unidades Vendidas', fontsize=12)
+        self.ax_quantidade.set_xlabel('Data', fontsize=12)
+
+        for ax in (self.ax_receita, self.ax_quantidade):
+            _estilizar(ax)
+            ax.tick_params(axis='x', rotation=45)
+        self._animar(self.linha_receita, *self.valores_receita, *self.barras, *self.valores_quantidade)
+
+    def aplicar(self, dados):
+        """dados: [(data, receita, quantidade)]"""
+        dados = list(dados)[:self.DIAS]
+        datas = [item[0] for item in dados]
+        receitas = [float(item[1]) for item in dados]
+        quantidades = [int(item[2]) for item in dados]
+
+        self.linha_receita.set_data(range(len(dados)), receitas)
+        _atualizar_textos(self.valores_receita,
+                          [((i, receita), f'R$ {receita:.0f}') for i, receita in enumerate(receitas)])
+        _atualizar_barras(self.barras, quantidades)
+        _atualizar_textos(self.valores_quantidade,
+                          [((i, quantidade + 0.5), f'{quantidade}') for i, quantidade in enumerate(quantidades)])
+
+        _ajustar_limites(self.ax_receita, len(dados), max(receitas, default=0))
+        _ajustar_limites(self.ax_quantidade, len(dados), max(quantidades, default=0))
+        for ax in (self.ax_receita, self.ax_quantidade):
+            self._rotular(ax, 'x', datas)
+        return tuple(datas)
+
+
+class GraficoProdutos(GraficoDashboard):
+    """Top 10 produtos por receita e por quantidade (barras horizontais)"""
+
+    PRODUTOS = 10
+
+    def montar(self):
+        """Dois eixos de barras horizontais com os valores escritos"""
+        self.ax_receita = self.figura.add_subplot(1, 2, 1)
+        self.ax_quantidade = self.figura.add_subplot(1, 2, 2)
+        self.barras_receita = self.ax_receita.barh(
+            range(self.PRODUTOS), [0] * self.PRODUTOS, color=self.cores['receita'],
+            alpha=0.8, edgecolor='white', linewidth=1
+        )
+        self.barras_quantidade = self.ax_quantidade.barh(
+            range(self.PRODUTOS), [0] * self.PRODUTOS, color=self.cores['vendas'],
+            alpha=0.8, edgecolor='white', linewidth=1
+        )
+        self.valores_receita = _textos(self.ax_receita, self.PRODUTOS, ha='left', va='center', fontsize=10)
+        self.valores_quantidade = _textos(self.ax_quantidade, self.PRODUTOS, ha='left', va='center', fontsize=10)
+
+        self.ax_receita.set_title('💰 Top 10 Produtos por Receita', fontsize=14, fontweight='bold', pad=20)
+        self.ax_receita.set_xlabel('Receita Total (R$)', fontsize=12)
+        self.ax_quantidade.set_title('🛒 Top 10 Produtos por Quantidade', fontsize=14, fontweight='bold', pad=20)
+        self.ax_quantidade.set_xlabel('Unidades Vendidas', fontsize=12)
+        for ax in (self.ax_receita, self.ax_quantidade):
+            _estilizar(ax, eixo_grade='x')
+            ax.tick_params(axis='y', labelsize=9)
+            ax.tick_params(axis='x', labelsize=10)
+        self._animar(*self.barras_receita, *self.barras_quantidade,
+                     *self.valores_receita, *self.valores_quantidade)
+
+    def aplicar(self, dados):
+        """dados: [(produto, receita, quantidade)]"""
+        dados = list(dados)[:self.PRODUTOS]
+        # Limitar nome dos produtos para caber no gráfico
+        produtos = [item[0] if len(item[0]) <= 20 else item[0][:17] + "..." for item in dados]
+        receitas = [float(item[1]) for item in dados]
+        quantidades = [int(item[2]) for item in dados]
+
+        for ax, barras, textos, valores, formato in (
+            (self.ax_receita, self.barras_receita, self.valores_receita, receitas, 'R$ {:.0f}'),
+            (self.ax_quantidade, self.barras_quantidade, self.valores_quantidade, quantidades, '{:.0f}'),
+        ):
+            _atualizar_barras(barras, valores, horizontal=True)
+            deslocamento = max(valores, default=0) * 0.01  # Pequeno offset
+            _atualizar_textos(textos, [((valor + deslocamento, i), formato.format(valor))
+                                       for i, valor in enumerate(valores)])
+            _ajustar_limites(ax, len(dados), max(valores, default=0), eixo_valores='x')
+            self._rotular(ax, 'y', produtos)
+        return tuple(produtos)
+
+
+class GraficoHorarios(GraficoDashboard):
+    """Receita por hora do dia (com picos e média) e mapa de calor dia da semana x hora"""
+
+    TAMANHO = (13, 8)
+    HORAS = list(range(24))
+
+    def montar(self):
+        """Linha por hora com área, picos e média; mapa de calor com barra de cores"""
+        cor = self.cores['crescimento']
+        self.ax = self.figura.add_subplot(2, 1, 1)
+        self.linha, = self.ax.plot(
+            self.HORAS, [0] * 24, marker='o', linewidth=4, markersize=6, color=cor,
+            markerfacecolor='white', markeredgewidth=2, label='Receita por Hora'
+        )
+        self.area = self.ax.fill_between(self.HORAS, [0] * 24, alpha=0.3, color=cor)
+        # Horários de pico (receita acima da média)
+        self.picos, = self.ax.plot([], [], 'o', markersize=12, color='red', alpha=0.7)
+        self.valores_picos = _anotacoes(
+            self.ax, 24, xytext=(0, 20), fontsize=8,
+            bbox=dict(boxstyle="round,pad=0.3", facecolor='yellow', alpha=0.7)
+        )
+        self.media = self.ax.axhline(y=0, color='orange', linestyle='--', alpha=0.8, label='Média')
+        self.legenda = self.ax.legend(loc='upper right', fontsize=10)
+
+        self.ax.set_title('🕐 Análise de Vendas por Horário do Dia', fontsize=16, fontweight='bold', pad=20)
+        self.ax.set_xlabel('Horário do Dia', fontsize=12)
+        self.ax.set_ylabel('Receita (R$)', fontsize=12)
+        _estilizar(self.ax)
+        self.ax.tick_params(axis='both', labelsize=10)
+
+        self.ax_calor = self.figura.add_subplot(2, 1, 2)
+        self.imagem = self.ax_calor.imshow([[0.0] * 24 for _ in DIAS_SEMANA], aspect='auto',
+                                           cmap='YlOrRd', interpolation='nearest')
+        self.ax_calor.set_title('🔥 Movimento por Dia da Semana e Hora', fontsize=14, fontweight='bold')
+        self.ax_calor.set_yticks(range(7))
+        self.ax_calor.set_yticklabels(DIAS_SEMANA)
+        self.figura.colorbar(self.imagem, ax=self.ax_calor, label='Receita (R$)')
+
+        # Eixo X de horários, de 2 em 2 horas
+        for ax in (self.ax, self.ax_calor):
+            ax.set_xticks(range(0, 24, 2))
+            ax.set_xticklabels([f"{h:02d}h" for h in range(0, 24, 2)])
+        self._animar(self.area, self.linha, self.media, self.picos, *self.valores_picos,
+                     self.legenda, self.imagem)
+
+    def aplicar(self, cubo):
+        """cubo: 7 linhas (dias da semana) x 24 colunas (horas) de receita"""
+        receita_por_hora = [sum(linha[hora] for linha in cubo) for hora in self.HORAS]
+        receita_media = sum(receita_por_hora) / 24
+
+        self.linha.set_ydata(receita_por_hora)
+        self.area.set_verts([[(0, 0), *zip(self.HORAS, receita_por_hora), (23, 0)]])
+        picos = [(hora, receita) for hora, receita in enumerate(receita_por_hora)
+                 if receita > receita_media and receita > 0]
+        self.picos.set_data([hora for hora, _ in picos], [receita for _, receita in picos])
+        _atualizar_textos(self.valores_picos, [(pico, f'PICO\nR$ {pico[1]:.0f}') for pico in picos])
+        self.media.set_ydata([receita_media, receita_media])
+        self.media.set_visible(receita_media > 0)
+        self.legenda.get_texts()[1].set_text(f'Média: R$ {receita_media:.2f}')
+        _ajustar_limites(self.ax, 24, max(receita_por_hora))
+
+        # Escala de cores arredondada: muda só quando o máximo passa do teto
+        self.imagem.set_data(cubo)
+        limite_cores = _teto(max(max(linha) for linha in cubo), self.imagem.get_clim()[1])
+        self.imagem.set_clim(0, limite_cores)
+        return limite_cores
+
+
+class GraficoMensal(GraficoDashboard):
+    """Receita (barras e tendência) e número de vendas (linha) dos últimos 6 meses"""
+
+    MESES = 6
+
+    def montar(self):
+        """Barras de receita com tendência, linha de vendas e o crescimento do último mês"""
+        self.ax_receita = self.figura.add_subplot(2, 1, 1)
+        self.barras = self.ax_receita.bar(
+            range(self.MESES), [0] * self.MESES, color=self.cores['receita'],
+            alpha=0.8, edgecolor='white', linewidth=2, label='Receita Mensal'
+        )
+        self.tendencia, = self.ax_receita.plot([], [], color='red', linewidth=3, marker='o',
+                                               markersize=8, label='Tendência')
+        self.valores_receita = _textos(self.ax_receita, self.MESES, ha='center', va='bottom', fontsize=10)
+        self.legenda_receita = self.ax_receita.legend()
+        self.ax_receita.set_title('💰 Evolução da Receita Mensal', fontsize=14, fontweight='bold', pad=20)
+        self.ax_receita.set_ylabel('Receita (R$)', fontsize=12)
+
+        self.ax_vendas = self.figura.add_subplot(2, 1, 2)
+        self.linha_vendas, = self.ax_vendas.plot(
+            [], [], marker='s', linewidth=4, markersize=8, color=self.cores['vendas'],
+            markerfacecolor='white', markeredgewidth=2, label='Vendas Mensais'
+        )
+        self.area_vendas = self.ax_vendas.fill_between([0], [0], alpha=0.3, color=self.cores['vendas'])
+        self.valores_vendas = _anotacoes(self.ax_vendas, self.MESES, xytext=(0, 15), fontsize=10)
+        self.legenda_vendas = self.ax_vendas.legend()
+        self.ax_vendas.set_title('🛒 Evolução do Número de Vendas', fontsize=14, fontweight='bold', pad=20)
+        self.ax_vendas.set_ylabel('Número de Vendas', fontsize=12)
+        self.ax_vendas.set_xlabel('Mês/Ano', fontsize=12)
+
+        # Crescimento do último mês, no rodapé da figura
+        self.crescimento = self.figura.suptitle('', fontsize=12, y=0.02)
+
+        for ax in (self.ax_receita, self.ax_vendas):
+            _estilizar(ax)
+            ax.tick_params(axis='x', rotation=45, labelsize=10)
+            ax.tick_params(axis='y', labelsize=10)
+        self._animar(*self.barras, self.tendencia, *self.valores_receita, self.legenda_receita,
+                     self.area_vendas, self.linha_vendas, *self.valores_vendas, self.legenda_vendas,
+                     self.crescimento)
+
+    def aplicar(self, dados):
+        """dados: [{'mes', 'receita', 'vendas'}] em ordem cronológica"""
+        dados = list(dados)[-self.MESES:]
+        meses = [d['mes'] for d in dados]
+        receitas = [d['receita'] for d in dados]
+        vendas = [d['vendas'] for d in dados]
+        posicoes = list(range(len(dados)))
+
+        _atualizar_barras(self.barras, receitas)
+        self.tendencia.set_data(posicoes, receitas)
+        self.tendencia.set_visible(len(receitas) > 1)
+        deslocamento = max(receitas, default=0) * 0.01
+        _atualizar_textos(self.valores_receita, [((i, receita + deslocamento), f'R$ {receita:.0f}')
+                                                 for i, receita in enumerate(receitas)])
+
+        self.linha_vendas.set_data(posicoes, vendas)
+        self.area_vendas.set_verts([[(0, 0), *zip(posicoes, vendas), (posicoes[-1], 0)]] if posicoes else [])
+        _atualizar_textos(self.valores_vendas, [((i, venda), f'{int(venda)}') for i, venda in enumerate(vendas)])
+
+        if len(receitas) >= 2:
+            crescimento = ((receitas[-1] - receitas[-2]) / receitas[-2]) * 100 if receitas[-2] > 0 else 0
+            sinal = '+' if crescimento >= 0 else ''
+            self.crescimento.set_text(f'Crescimento último mês: {sinal}{crescimento:.1f}%')
+            self.crescimento.set_color('green' if crescimento >= 0 else 'red')
+        self.crescimento.set_visible(len(receitas) >= 2)
+
+        _ajustar_limites(self.ax_receita, len(dados), max(receitas, default=0))
+        _ajustar_limites(self.ax_vendas, len(dados), max(vendas, default=0))
+        for ax in (self.ax_receita, self.ax_vendas):
+            self._rotular(ax, 'x', meses)
+        return tuple(meses)
+
+
+def _teto(valor, atual=None):
+    """
+    Limite 'redondo' acima do valor, com folga para os rótulos dos valores.
+
+    O limite atual é mantido enquanto ainda cabe o valor e não sobra mais
+    que o dobro do necessário, para um valor perto de uma divisão não
+    ficar trocando a escala (e forçando o desenho completo) a cada venda.
+    """
+    necessario = max(valor, 1) * 1.15
+    if atual is not None and necessario <= atual <= necessario * 2:
+        return atual
+    return float(MaxNLocator(nbins=5).tick_values(0, necessario)[-1])
+
+
+def _ajustar_limites(ax, itens, maximo, eixo_valores='y'):
+    """
+    Limites calculados dos próprios dados: posições 0..itens-1 no eixo das
+    categorias e 0..teto no eixo dos valores.
+
+    Mais barato que Axes.relim(), que percorre cada barra a cada chamada.
+    """
+    x, y = (ax.get_xlim, ax.set_xlim), (ax.get_ylim, ax.set_ylim)
+    categorias, valores = (x, y) if eixo_valores == 'y' else (y, x)
+    novos = {categorias: (-0.6, max(itens, 1) - 0.4),
+             valores: (0, _teto(maximo, valores[0]()[1]))}
+    # Redefinir os mesmos limites dispara callbacks e invalida o eixo à toa
+    for (obter, definir), limites in novos.items():
+        if tuple(obter()) != limites:
+            definir(limites)
+
+
+def _estilizar(ax, eixo_grade='both'):
+    """Grade tracejada, fundo cinza claro e bordas finas"""
+    ax.grid(True, alpha=0.3, linestyle='--', axis=eixo_grade)
+    ax.set_facecolor('#f8f9fa')
+    for spine in ax.spines.values():
+        spine.set_linewidth(0.5)
+
+
+def _textos(ax, quantidade, **estilo):
+    """Textos de valores reservados para até `quantidade` itens (começam escondidos)"""
+    return [ax.text(0, 0, '', fontweight='bold', visible=False, **estilo) for _ in range(quantidade)]
+
+
+def _anotacoes(ax, quantidade, xytext, **estilo):
+    """Anotações acima dos pontos reservadas para até `quantidade` itens (começam escondidas)"""
+    return [ax.annotate('', (0, 0), textcoords="offset points", xytext=xytext, ha='center',
+                        fontweight='bold', visible=False, **estilo) for _ in range(quantidade)]
+
+
+def _atualizar_textos(textos, itens):
+    """Mostra [((x, y), texto)] nos primeiros textos e esconde o resto"""
+    for i, texto in enumerate(textos):
+        if i < len(itens):
+            posicao, conteudo = itens[i]
+            if isinstance(texto, Annotation):
+                texto.xy = posicao
+            else:
+                texto.set_position(posicao)
+            texto.set_text(conteudo)
+        texto.set_visible(i < len(itens))
+
+
+def _atualizar_barras(barras, valores, horizontal=False):
+    """Altura (ou largura) das primeiras barras; as que sobram ficam escondidas"""
+    for i, barra in enumerate(barras):
+        valor = valores[i] if i < len(valores) else 0
+        if horizontal:
+            barra.set_width(valor)
+        else:
+            barra.set_height(valor)
+        barra.set_visible(i < len(valores))
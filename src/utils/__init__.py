@@ -3,6 +3,8 @@ Módulo de utilitários
 Contém funções auxiliares para o sistema
 """
 
-from .helpers import centralizar_janela, formatar_data, validar_numero
+from .helpers import (AgendadorAtualizacao, LeitorCodigoBarras, aguardar_no_tk, centralizar_janela, formatar_data,
+                      validar_numero)
 
-__all__ = ['centralizar_janela', 'formatar_data', 'validar_numero']
+__all__ = ['AgendadorAtualizacao', 'LeitorCodigoBarras', 'aguardar_no_tk', 'centralizar_janela', 'formatar_data',
+           'validar_numero']
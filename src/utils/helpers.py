@@ -245,3 +245,281 @@ def verificar_permissoes_arquivo(caminho):
         
     except Exception as e:
         return False, False, str(e)
+
+
+def aguardar_no_tk(widget, futuro, ao_concluir, ao_falhar=None, intervalo_ms=50):
+    """
+    Entrega o resultado de um Future à thread do Tk sem bloquear a interface
+    
+    Args:
+        widget: Widget tkinter cujo after() é usado para consultar o Future
+        futuro: concurrent.futures.Future (ex.: retornado por db.assincrono)
+        ao_concluir: Chamada com o resultado, na thread do Tk
+        ao_falhar: Chamada com a exceção, na thread do Tk (opcional; padrão imprime o erro)
+        intervalo_ms: Intervalo entre as consultas ao Future
+    """
+    def verificar():
+        # Janela fechada antes da consulta terminar: descarta o resultado
+        try:
+            if not widget.winfo_exists():
+                return
+        except tk.TclError:
+            return
+        
+        if not futuro.done():
+            widget.after(intervalo_ms, verificar)
+            return
+        
+        if futuro.cancelled():
+            return
+        erro = futuro.exception()
+        if erro is not None:
+            if ao_falhar:
+                ao_falhar(erro)
+            else:
+                print(f"Erro em consulta assíncrona: {erro}")
+            return
+        ao_concluir(futuro.result())
+    
+    verificar()
+
+
+class AgendadorAtualizacao:
+    """
+    Atualizações de uma janela com a coleta de dados fora da thread do Tk
+
+    coletar() roda numa thread de trabalho (executar(funcao) deve devolver um
+    Future, ex.: db.assincrono.executar) e aplicar(dados) recebe o resultado
+    na thread do Tk, via after(). Pedidos feitos durante uma coleta viram
+    uma única coleta seguinte. Com intervalo_ms, uma nova atualização é
+    agendada quando a anterior termina (as atualizações nunca se acumulam)
+    e é pulada enquanto a janela estiver minimizada ou escondida.
+    """
+
+    def __init__(self, widget, executar, coletar, aplicar, ao_falhar=None, intervalo_ms=None):
+        self.widget = widget
+        self.executar = executar
+        self.coletar = coletar
+        self.aplicar = aplicar
+        self.ao_falhar = ao_falhar
+        self.intervalo_ms = intervalo_ms
+        self._em_andamento = False
+        self._pendente = False
+        self._timer = None
+        self._parado = False
+
+    @property
+    def em_andamento(self):
+        """True enquanto uma coleta não foi aplicada"""
+        return self._em_andamento
+
+    def solicitar(self):
+        """Pede uma atualização agora (agrupada com a que estiver em andamento)"""
+        if self._parado:
+            return
+        if self._em_andamento:
+            self._pendente = True
+            return
+        self._cancelar_timer()
+        self._em_andamento = True
+        try:
+            futuro = self.executar(self.coletar)
+        except Exception as e:
+            self._falhar(e)
+            return
+        aguardar_no_tk(self.widget, futuro, self._concluir, self._falhar)
+
+    def configurar_intervalo(self, intervalo_ms):
+        """Muda o intervalo da atualização automática (None ou 0 desliga)"""
+        self.intervalo_ms = intervalo_ms
+        self._cancelar_timer()
+        if not self._em_andamento:
+            self._agendar_proxima()
+
+    def parar(self):
+        """Encerra as atualizações (ex.: ao fechar a janela)"""
+        self._parado = True
+        self._pendente = False
+        self._cancelar_timer()
+
+    def _concluir(self, dados):
+        """Aplica o resultado da coleta na thread do Tk"""
+        try:
+            if not self._parado:
+                self.aplicar(dados)
+        finally:
+            self._terminar()
+
+    def _falhar(self, erro):
+        """Repassa o erro da coleta e segue com as próximas atualizações"""
+        try:
+            if self.ao_falhar:
+                self.ao_falhar(erro)
+            else:
+                print(f"Erro ao atualizar: {erro}")
+        finally:
+            self._terminar()
+
+    def _terminar(self):
+        """Fim de uma atualização: executa a pendente ou agenda a próxima"""
+        self._em_andamento = False
+        if self._parado:
+            return
+        if self._pendente:
+            self._pendente = False
+            self.solicitar()
+        else:
+            self._agendar_proxima()
+
+    def _agendar_proxima(self):
+        """Agenda a próxima atualização automática, se houver intervalo"""
+        if self.intervalo_ms and not self._parado:
+            self._timer = self.widget.after(self.intervalo_ms, self._automatica)
+
+    def _automatica(self):
+        """Atualização do timer: pulada (e reagendada) com a janela fora da tela"""
+        self._timer = None
+        try:
+            visivel = self.widget.winfo_viewable()
+        except tk.TclError:
+            return
+        if visivel:
+            self.solicitar()
+        else:
+            self._agendar_proxima()
+
+    def _cancelar_timer(self):
+        """Descarta a atualização automática agendada"""
+        if self._timer is not None:
+            self.widget.after_cancel(self._timer)
+            self._timer = None
+
+
+class LeitorCodigoBarras:
+    """
+    Reconhece leituras de scanner de código de barras que emula teclado
+    
+    O scanner "digita" o código muito mais rápido que uma pessoa e termina
+    com Enter. Teclas que chegam em rajada (no máximo intervalo_ms entre
+    uma e outra) são retiradas dos campos da janela e, no Enter (ou quando
+    a rajada para), ao_ler recebe o código. Digitação normal não é afetada.
+    
+    Args:
+        janela: Toplevel cujos widgets recebem as leituras
+        ao_ler: Chamada com o código lido, na thread do Tk
+        intervalo_ms: Maior intervalo entre duas teclas da mesma rajada
+        minimo_caracteres: Tamanho mínimo de um código
+    """
+    
+    TECLAS_FIM = ('Return', 'KP_Enter')
+    
+    def __init__(self, janela, ao_ler, intervalo_ms=40, minimo_caracteres=4):
+        self.janela = janela
+        self.ao_ler = ao_ler
+        self.intervalo_ms = intervalo_ms
+        self.minimo_caracteres = minimo_caracteres
+        self._tag = f"LeitorCodigoBarras{id(self)}"
+        self._timer = None
+        self._limpar()
+        janela.bind_class(self._tag, '<KeyPress>', self.processar_tecla)
+        self.instalar(janela)
+        
+    def instalar(self, widget):
+        """Põe o leitor à frente dos bindings do widget e de seus filhos (repetir para widgets criados depois)"""
+        tags = tuple(widget.bindtags())
+        if self._tag not in tags:
+            widget.bindtags((self._tag,) + tags)
+        for filho in widget.winfo_children():
+            self.instalar(filho)
+            
+    def processar_tecla(self, event):
+        """Trata cada tecla; retorna "break" para as que fazem parte de uma leitura"""
+        if event.keysym in self.TECLAS_FIM:
+            if len(self._codigo) >= self.minimo_caracteres and self._em_rajada(event.time):
+                self._concluir()
+                return "break"
+            self._devolver()
+            return None
+            
+        caractere = event.char
+        if len(caractere) != 1 or not caractere.isprintable():
+            return None  # Shift e outras teclas sem texto não interrompem a rajada
+            
+        if not self._codigo or not self._em_rajada(event.time):
+            # Pode ser digitação normal: a tecla segue para o campo, mas o
+            # texto anterior fica guardado para desfazer se for uma leitura
+            self._devolver()
+            self._codigo = [caractere]
+            self._campo = self._estado_campo(event.widget)
+            self._ultima_tecla = event.time
+            return None
+            
+        self._codigo.append(caractere)
+        self._ultima_tecla = event.time
+        self._agendar_fim()
+        return "break"
+        
+    def _em_rajada(self, momento):
+        """A tecla chegou logo depois da anterior?"""
+        return self._ultima_tecla is not None and 0 <= momento - self._ultima_tecla <= self.intervalo_ms
+        
+    def _estado_campo(self, widget):
+        """(widget, texto atual) de um campo editável, ou None"""
+        try:
+            if str(widget.cget('state')) in ('readonly', 'disabled'):
+                return None
+            return widget, widget.get()
+        except (AttributeError, tk.TclError):
+            return None
+            
+    def _agendar_fim(self):
+        """Fecha a leitura se a rajada parar sem Enter"""
+        self._cancelar_timer()
+        self._timer = self.janela.after(self.intervalo_ms * 3, self._fim_sem_enter)
+        
+    def _cancelar_timer(self):
+        """Cancela o fim de rajada agendado"""
+        if self._timer is not None:
+            try:
+                self.janela.after_cancel(self._timer)
+            except tk.TclError:
+                pass
+            self._timer = None
+            
+    def _fim_sem_enter(self):
+        """A rajada parou: leitura sem Enter ou digitação rápida"""
+        self._timer = None
+        if len(self._codigo) >= self.minimo_caracteres:
+            self._concluir()
+        else:
+            self._devolver()
+            
+    def _concluir(self):
+        """Desfaz a primeira tecla no campo e entrega o código"""
+        codigo = "".join(self._codigo)
+        if self._campo is not None:
+            widget, texto = self._campo
+            try:
+                widget.delete(0, tk.END)
+                widget.insert(0, texto)
+            except tk.TclError:
+                pass
+        self._limpar()
+        self.ao_ler(codigo)
+        
+    def _devolver(self):
+        """Rajada curta demais para ser leitura: as teclas retidas voltam para o campo"""
+        retidas = "".join(self._codigo[1:])
+        if retidas and self._campo is not None:
+            try:
+                self._campo[0].insert(tk.INSERT, retidas)
+            except tk.TclError:
+                pass
+        self._limpar()
+        
+    def _limpar(self):
+        """Esquece a rajada atual"""
+        self._cancelar_timer()
+        self._codigo = []
+        self._campo = None
+        self._ultima_tecla = None
@@ -3,15 +3,27 @@ Testes unitários para o módulo de estoque
 """
 
 import unittest
+import ast
 import os
+import re
 import tempfile
+import shutil
+import sqlite3
+import threading
 import sys
+from concurrent.futures import Future
+from datetime import datetime
+from unittest import mock
 
 # Adicionar src ao path para imports
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
 
-from src.estoque.database import DatabaseManager
+from src.estoque.database import (DatabaseManager, EstoqueInsuficienteError, ProdutoNaoEncontradoError,
+                                  obter_banco)
 from src.estoque.controller import EstoqueController
+from src.estoque.pool import ConnectionPool
+from src.estoque import indices, migracoes
+from src.utils.helpers import AgendadorAtualizacao, LeitorCodigoBarras, aguardar_no_tk
 
 
 class TestDatabaseManager(unittest.TestCase):
@@ -23,6 +35,7 @@ class TestDatabaseManager(unittest.TestCase):
         
     def tearDown(self):
         """Limpeza após teste"""
+        self.db.fechar()
         if os.path.exists(self.db_path):
             os.remove(self.db_path)
         os.rmdir(self.temp_dir)
@@ -117,6 +130,1481 @@ class TestDatabaseManager(unittest.TestCase):
         ids = [venda[0] for venda in historico]
         self.assertEqual(ids, sorted(ids, reverse=True))
 
+    def test_pagina_historico_por_chave(self):
+        """Testa paginação por id com filtros aplicados no banco"""
+        for i in range(5):
+            self.db.registrar_venda(f"Produto {i % 2}", 1, 2.0, vendedor="Ana" if i < 3 else "Bia")
+            
+        primeira = self.db.pagina_historico(tamanho=2)
+        self.assertEqual([venda[0] for venda in primeira], [5, 4])
+        segunda = self.db.pagina_historico(primeira[-1][0], 2)
+        self.assertEqual([venda[0] for venda in segunda], [3, 2])
+        self.assertEqual([venda[0] for venda in self.db.pagina_historico(segunda[-1][0], 2)], [1])
+        
+        self.assertEqual([venda[0] for venda in self.db.pagina_historico(filtro={'vendedor': "Ana"})], [3, 2, 1])
+        self.assertEqual([venda[0] for venda in self.db.pagina_historico(filtro={'produto': "to 1"})], [4, 2])
+        hoje = datetime.now().strftime("%d/%m/%Y")
+        self.assertEqual(len(self.db.pagina_historico(filtro={'data_inicio': hoje, 'data_fim': hoje})), 5)
+        self.assertEqual(self.db.pagina_historico(filtro={'data_fim': "01/01/2000"}), [])
+        
+    def test_iter_historico_le_em_lotes(self):
+        """Testa que o iterador percorre tudo sem fetchall, na ordem da listagem"""
+        for i in range(7):
+            self.db.registrar_venda("Produto A", i + 1, 1.0)
+            
+        vendas = self.db.iter_historico(tamanho_lote=3)
+        self.assertEqual(next(vendas)[0], 7)
+        self.assertEqual([venda[0] for venda in vendas], [6, 5, 4, 3, 2, 1])
+        self.assertEqual(self.db.listar_historico_completo(2), list(self.db.iter_historico())[:2])
+        self.assertEqual(self.db.resumo_historico(), (7, 28, 28.0))
+        self.assertEqual(self.db.resumo_historico({'produto': "Inexistente"}), (0, 0, 0))
+        
+    def test_filtro_de_historico_desconhecido(self):
+        """Testa rejeição de chaves de filtro inválidas"""
+        with self.assertRaises(ValueError):
+            self.db.pagina_historico(filtro={'cliente': "x"})
+            
+    def test_registrar_vendas_lote(self):
+        """Testa registro de carrinho com um único commit"""
+        comandos = []
+        with self.db.pool.escrita() as conn:
+            conn.set_trace_callback(comandos.append)
+        
+        itens = [{'produto': f"Item {i}", 'quantidade': i + 1, 'preco_unitario': 2.5} for i in range(10)]
+        ids = self.db.registrar_vendas_lote(itens)
+        
+        self.assertEqual(len(ids), 10)
+        self.assertEqual([c.split()[0].upper() for c in comandos].count('COMMIT'), 1)
+        vendas = self.db.execute_query("SELECT id, produto, valor_total FROM historico_vendas ORDER BY id")
+        self.assertEqual([v[0] for v in vendas], ids)
+        self.assertEqual(vendas[3][1:], ("Item 3", 10.0))
+        
+    def test_registrar_vendas_lote_invalido_nao_grava_nada(self):
+        """Testa que um item inválido desfaz o lote inteiro"""
+        itens = [{'produto': "Suco", 'quantidade': 1}, {'produto': None, 'quantidade': 1}]
+        self.assertIsNone(self.db.registrar_vendas_lote(itens))
+        self.assertEqual(self.db.listar_historico(), [])
+
+    def test_vender_baixa_estoque_e_registra(self):
+        """Testa venda atômica com baixa de estoque"""
+        self.db.inserir_produto("Coxinha", 10, 6.0)
+        venda_id = self.db.vender("Coxinha", 3, 6.0)
+        
+        self.assertEqual(self.db.consultar_produto("Coxinha"), 7)
+        venda = self.db.execute_query("SELECT id, quantidade, valor_total FROM historico_vendas")
+        self.assertEqual(venda, [(venda_id, 3, 18.0)])
+        
+    def test_vender_estoque_insuficiente(self):
+        """Testa que venda acima do estoque é recusada sem gravar nada"""
+        self.db.inserir_produto("Coxinha", 2, 6.0)
+        with self.assertRaises(EstoqueInsuficienteError) as contexto:
+            self.db.vender("Coxinha", 3, 6.0)
+        self.assertEqual(contexto.exception.disponivel, 2)
+        self.assertEqual(self.db.consultar_produto("Coxinha"), 2)
+        self.assertEqual(self.db.listar_historico(), [])
+        
+    def test_vender_permitindo_estoque_negativo(self):
+        """Testa a política de estoque negativo"""
+        self.db.inserir_produto("Coxinha", 2, 6.0)
+        self.db.vender("Coxinha", 3, 6.0, permitir_estoque_negativo=True)
+        self.assertEqual(self.db.consultar_produto("Coxinha"), -1)
+        
+    def test_vender_produto_inexistente(self):
+        """Testa venda de produto fora do estoque"""
+        with self.assertRaises(ProdutoNaoEncontradoError):
+            self.db.vender("Fantasma", 1, 1.0)
+            
+    def test_vender_lote_e_atomico(self):
+        """Testa que um item sem estoque desfaz a venda do carrinho inteiro"""
+        self.db.inserir_produto("Suco", 5, 4.0)
+        self.db.inserir_produto("Pastel", 1, 7.0)
+        itens = [{'produto': "Suco", 'quantidade': 2, 'preco_unitario': 4.0},
+                 {'produto': "Pastel", 'quantidade': 2, 'preco_unitario': 7.0}]
+        with self.assertRaises(EstoqueInsuficienteError):
+            self.db.vender_lote(itens)
+        self.assertEqual(self.db.consultar_produto("Suco"), 5)
+        self.assertEqual(self.db.listar_historico(), [])
+        
+    def test_vender_concorrente_nao_vende_alem_do_estoque(self):
+        """Testa que vendas simultâneas não ultrapassam o estoque"""
+        self.db.inserir_produto("Esfiha", 20, 5.0)
+        vendidas = []
+        
+        def vender_varias():
+            for _ in range(10):
+                try:
+                    self.db.vender("Esfiha", 1, 5.0)
+                    vendidas.append(1)
+                except EstoqueInsuficienteError:
+                    pass
+                    
+        threads = [threading.Thread(target=vender_varias) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+            
+        self.assertEqual(len(vendidas), 20)
+        self.assertEqual(self.db.consultar_produto("Esfiha"), 0)
+
+    def test_data_iso_preenchida_em_insert_sem_coluna(self):
+        """Testa que vendas inseridas só com data_hora recebem data_iso"""
+        with self.db.pool.escrita() as conn:
+            conn.execute("""INSERT INTO historico_vendas (produto, quantidade, valor_total, data_hora)
+                            VALUES ('Suco', 1, 5.0, '03/02/2024 14:30:00')""")
+        resultado = self.db.execute_query("SELECT data_iso FROM historico_vendas")
+        self.assertEqual(resultado[0][0], "2024-02-03 14:30:00")
+
+    def test_receita_periodo_por_intervalo(self):
+        """Testa receita e contagem por período usando data_iso"""
+        with self.db.pool.escrita() as conn:
+            conn.executemany(
+                "INSERT INTO historico_vendas (produto, quantidade, valor_total, data_hora) VALUES (?, 1, ?, ?)",
+                [('A', 10.0, '31/01/2024 23:59:59'), ('B', 20.0, '01/02/2024 00:00:00'),
+                 ('C', 30.0, '29/02/2024 18:00:00'), ('D', 40.0, '01/03/2024 08:00:00')]
+            )
+        self.assertEqual(self.db.obter_receita_periodo("01/02/2024", "29/02/2024"), 50.0)
+        self.assertEqual(self.db.contar_vendas_periodo("01/02/2024", "29/02/2024"), 2)
+        self.assertEqual(len(self.db.listar_vendas_periodo("31/01/2024", "31/01/2024")), 1)
+
+    def test_consulta_periodo_usa_indice(self):
+        """Testa que a consulta de receita por período é atendida pelo índice"""
+        plano = self.db.execute_query(
+            "EXPLAIN QUERY PLAN SELECT COALESCE(SUM(valor_total), 0) FROM historico_vendas "
+            "WHERE data_iso >= ? AND data_iso < ?", ("2024-01-01", "2024-01-02")
+        )
+        detalhes = " ".join(linha[-1] for linha in plano)
+        self.assertIn("idx_historico_data_iso", detalhes)
+
+    def _vendas_diarias(self):
+        return self.db.execute_query(
+            "SELECT dia, produto_id, quantidade, receita, num_vendas FROM vendas_diarias ORDER BY dia, produto_id"
+        )
+        
+    def test_vendas_diarias_acompanha_insert_update_delete(self):
+        """Testa que os triggers mantêm o agregado igual a uma reconstrução completa"""
+        self.db.inserir_produto("Pastel", 50, 7.0)
+        with self.db.pool.escrita() as conn:
+            conn.executemany(
+                "INSERT INTO historico_vendas (produto, quantidade, valor_total, data_hora) VALUES (?, ?, ?, ?)",
+                [('Pastel', 2, 14.0, '10/05/2024 10:00:00'), ('Pastel', 1, 7.0, '10/05/2024 12:00:00'),
+                 ('Avulso', 3, 9.0, '10/05/2024 13:00:00'), ('Pastel', 4, 28.0, '11/05/2024 09:00:00')]
+            )
+            conn.execute("UPDATE historico_vendas SET quantidade = 5, valor_total = 35.0 WHERE id = 1")
+            conn.execute("UPDATE historico_vendas SET data_hora = '12/05/2024 09:00:00' WHERE id = 4")
+            conn.execute("DELETE FROM historico_vendas WHERE id = 2")
+        self.db.vender("Pastel", 1, 7.0)
+        
+        incremental = self._vendas_diarias()
+        self.assertTrue(self.db.reconstruir_agregados())
+        self.assertEqual(incremental, self._vendas_diarias())
+        self.assertIn(("2024-05-10", 0, 3, 9.0, 1), incremental)
+        self.assertEqual(self.db.obter_receita_periodo("10/05/2024", "12/05/2024"), 72.0)
+        self.assertEqual(self.db.contar_vendas_periodo("11/05/2024", "11/05/2024"), 0)
+        
+    def test_cubo_horarios(self):
+        """Testa o cubo dia da semana x hora com e sem filtros"""
+        self.db.inserir_produto("Pastel", 50, 7.0)
+        with self.db.pool.escrita() as conn:
+            conn.executemany(
+                "INSERT INTO historico_vendas (produto, quantidade, valor_total, data_hora) VALUES (?, ?, ?, ?)",
+                [('Pastel', 2, 14.0, '06/05/2024 12:10:00'),   # segunda
+                 ('Pastel', 1, 7.0, '13/05/2024 12:40:00'),    # segunda seguinte
+                 ('Suco', 1, 5.0, '12/05/2024 18:00:00')]      # domingo
+            )
+        
+        cubo = self.db.obter_cubo_horarios()
+        self.assertEqual(len(cubo), 7)
+        self.assertEqual(len(cubo[0]), 24)
+        self.assertEqual(cubo[0][12], 21.0)
+        self.assertEqual(cubo[6][18], 5.0)
+        
+        self.assertEqual(self.db.obter_cubo_horarios("01/05/2024", "12/05/2024")[0][12], 14.0)
+        self.assertEqual(self.db.obter_cubo_horarios(produto="Pastel")[6][18], 0.0)
+        self.assertEqual(self.db.obter_cubo_horarios(produto="Pastel", medida='num_vendas')[0][12], 2)
+        self.assertEqual(self.db.obter_vendas_por_horario(), [(12, 21.0), (18, 5.0)])
+        
+        incremental = self.db.obter_cubo_horarios("01/05/2024", "31/05/2024")
+        self.assertTrue(self.db.reconstruir_agregados())
+        self.assertEqual(self.db.obter_cubo_horarios("01/05/2024", "31/05/2024"), incremental)
+        
+    def test_resumo_mensal(self):
+        """Testa o resumo mensal lido do agregado diário"""
+        self.db.registrar_venda("Suco", 2, 5.0)
+        resumo = self.db.obter_resumo_mensal(3)
+        self.assertEqual(len(resumo), 3)
+        self.assertEqual(resumo[-1]['mes'], datetime.now().strftime("%m/%Y"))
+        self.assertEqual((resumo[-1]['receita'], resumo[-1]['vendas']), (10.0, 1))
+        self.assertEqual(resumo[0]['vendas'], 0)
+
+    def test_migracao_preenche_data_iso(self):
+        """Testa backfill de data_iso em banco sem a coluna"""
+        self.db.fechar()
+        os.remove(self.db_path)
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute("""CREATE TABLE historico_vendas (id INTEGER PRIMARY KEY AUTOINCREMENT,
+                            produto TEXT NOT NULL, quantidade INTEGER NOT NULL, data_hora TEXT NOT NULL)""")
+            conn.execute("INSERT INTO historico_vendas (produto, quantidade, data_hora) "
+                         "VALUES ('Pastel', 2, '15/06/2023 09:05:00')")
+        conn.close()
+
+        self.db = DatabaseManager(self.db_path)
+        resultado = self.db.execute_query("SELECT data_iso FROM historico_vendas")
+        self.assertEqual(resultado[0][0], "2023-06-15 09:05:00")
+        self.assertEqual(self.db.contar_vendas_periodo("15/06/2023", "15/06/2023"), 1)
+        self.assertEqual(self._vendas_diarias(), [("2023-06-15", 0, 2, 0.0, 1)])
+
+    def test_venda_guarda_produto_id(self):
+        """Testa que vendas registradas apontam para o id do produto"""
+        self.db.inserir_produto("Pastel", 10, 7.0)
+        produto_id = self.db.execute_query("SELECT id FROM estoque WHERE produto = 'Pastel'")[0][0]
+        self.db.vender("Pastel", 2, 7.0)
+        self.db.registrar_venda("Avulso", 1, 3.0)
+
+        vinculos = self.db.execute_query("SELECT produto, produto_id FROM historico_vendas ORDER BY id")
+        self.assertEqual(vinculos, [("Pastel", produto_id), ("Avulso", None)])
+
+    def test_renomear_produto_mantem_historico(self):
+        """Testa que o histórico acompanha o produto renomeado"""
+        self.db.inserir_produto("Pastel", 10, 7.0)
+        self.db.vender("Pastel", 2, 7.0)
+        self.db.execute_update("UPDATE estoque SET produto = 'Pastel de Carne' WHERE produto = 'Pastel'")
+        self.db.vender("Pastel de Carne", 1, 7.0)
+
+        self.assertEqual(self.db.obter_estatisticas_vendas(), [("Pastel de Carne", 3, 2)])
+        self.assertEqual(self.db.listar_historico()[1][1], "Pastel de Carne")
+        self.assertEqual(len(self.db.buscar_vendas_por_produto("Carne")), 2)
+
+    def test_buscar_produtos_sem_acento_e_por_prefixo(self):
+        """Testa a busca textual em nome, categoria e código de barras"""
+        self.db.inserir_produto("Hambúrguer Tradicional", 5, 18.0, "Lanches", "7891000")
+        self.db.inserir_produto("Suco de Maçã", 8, 6.0, "Bebidas", "7892000")
+        self.db.inserir_produto("Maçã do Amor", 3, 4.0, "Doces", "")
+
+        self.assertEqual([p[0] for p in self.db.buscar_produtos("hamburguer trad")], ["Hambúrguer Tradicional"])
+        self.assertEqual([p[0] for p in self.db.buscar_produtos("HAMB")], ["Hambúrguer Tradicional"])
+        self.assertEqual([p[0] for p in self.db.buscar_produtos("bebi")], ["Suco de Maçã"])
+        self.assertEqual([p[0] for p in self.db.buscar_produtos("7892")], ["Suco de Maçã"])
+        self.assertEqual(len(self.db.buscar_produtos("maca")), 2)
+        # Operadores do FTS5 digitados pelo usuário são só texto
+        self.assertEqual(self.db.buscar_produtos('"maca OR'), [])
+        self.assertEqual(self.db.buscar_produtos("  "), [])
+
+    def test_buscar_produtos_ordena_por_relevancia(self):
+        """Testa que acerto no nome vem antes de acerto só na categoria"""
+        self.db.inserir_produto("Água Mineral", 10, 3.0, "Pizza")
+        self.db.inserir_produto("Pizza Calabresa", 10, 40.0, "Salgados")
+        self.assertEqual([p[0] for p in self.db.buscar_produtos("pizza")], ["Pizza Calabresa", "Água Mineral"])
+        self.assertEqual(len(self.db.buscar_produtos("pizza", limite=1)), 1)
+
+    def test_indice_de_busca_acompanha_estoque(self):
+        """Testa que alterações e exclusões no estoque chegam ao índice"""
+        self.db.inserir_produto("Pastel", 10, 7.0, "Salgados", "111")
+        self.db.atualizar_produto_completo("Pastel", 10, 7.0, "Fritos", "222")
+        self.db.execute_update("UPDATE estoque SET produto = 'Coxinha' WHERE produto = 'Pastel'")
+
+        self.assertEqual(self.db.buscar_produtos("pastel"), [])
+        self.assertEqual(self.db.buscar_produtos("salgados"), [])
+        self.assertEqual(self.db.buscar_produtos("111"), [])
+        self.assertEqual([p[0] for p in self.db.buscar_produtos("fritos 222")], ["Coxinha"])
+        self.db.remover_produto("Coxinha")
+        self.assertEqual(self.db.buscar_produtos("coxinha"), [])
+        self.assertEqual(self.db.execute_update(
+            "INSERT INTO estoque_busca (estoque_busca) VALUES ('integrity-check')"), 1)
+
+    def test_filtro_de_produto_no_historico_usa_busca(self):
+        """Testa o filtro de produto do histórico com vendas ligadas e sem vínculo"""
+        self.db.inserir_produto("Refrigerante Lata", 10, 5.0, "Bebidas")
+        self.db.inserir_produto("Pão de Queijo", 10, 3.0, "Salgados")
+        self.db.vender("Refrigerante Lata", 2, 5.0)
+        self.db.vender("Pão de Queijo", 1, 3.0)
+        self.db.registrar_venda("Pao avulso", 1, 2.0)
+
+        self.assertEqual(self.db.resumo_historico({'produto': "bebidas"}), (1, 2, 10.0))
+        self.assertEqual([v[1] for v in self.db.pagina_historico(filtro={'produto': "pao"})],
+                         ["Pao avulso", "Pão de Queijo"])
+        self.assertEqual([v[1] for v in self.db.buscar_vendas_por_produto("refri")], ["Refrigerante Lata"])
+
+    def test_consultar_por_codigo_barras(self):
+        """Testa a consulta pelo código de barras e a unicidade do código"""
+        self.db.inserir_produto("Refrigerante Lata", 10, 5.0, "Bebidas", "7894900011517")
+        self.db.inserir_produto("Pastel", 10, 7.0)
+        self.db.inserir_produto("Coxinha", 10, 6.0)
+
+        self.assertEqual(self.db.consultar_por_codigo_barras("7894900011517"),
+                         ("Refrigerante Lata", 10, 5.0, "Bebidas", "7894900011517"))
+        self.assertIsNone(self.db.consultar_por_codigo_barras("000"))
+        # Vários produtos sem código são permitidos; código repetido não
+        self.assertIsNone(self.db.consultar_por_codigo_barras(""))
+        self.assertFalse(self.db.inserir_produto("Suco", 5, 6.0, "Bebidas", "7894900011517"))
+        self.assertFalse(self.db.atualizar_produto_completo("Pastel", 10, 7.0, "Geral", "7894900011517"))
+
+    def test_catalogo_acompanha_cadastro(self):
+        """Testa que o mapa de códigos em memória é invalidado pelas escritas no cadastro"""
+        self.db.inserir_produto("Pastel", 10, 7.0, "Salgados", "111")
+        self.assertEqual(self.db.catalogo.por_codigo_barras("111")[1:], ("Pastel", 7.0))
+
+        self.db.atualizar_preco("Pastel", 8.0)
+        self.assertEqual(self.db.catalogo.por_codigo_barras(" 111 ")[1:], ("Pastel", 8.0))
+        self.db.atualizar_produto_completo("Pastel", 10, 8.0, "Salgados", "222")
+        self.assertIsNone(self.db.catalogo.por_codigo_barras("111"))
+        self.assertEqual(self.db.catalogo.por_codigo_barras("222")[1], "Pastel")
+        self.db.remover_produto("Pastel")
+        self.assertIsNone(self.db.catalogo.por_codigo_barras("222"))
+
+    def test_catalogo_sem_escritas_nao_recarrega(self):
+        """Testa que consultas seguidas usam os mesmos mapas em memória"""
+        self.db.inserir_produto("Pastel", 10, 7.0, "Salgados", "111")
+        registros = self.db.catalogo.carregar()
+        self.assertEqual(self.db.catalogo.por_nome("Pastel"), registros[0])
+        self.assertEqual(self.db.catalogo.por_id(registros[0][0]), registros[0])
+        self.assertEqual(self.db.catalogo.preco("Pastel"), 7.0)
+        self.assertIsNone(self.db.catalogo.preco("Inexistente"))
+        self.assertIs(self.db.catalogo.carregar(), registros)
+
+        calculos = []
+        rotulos = lambda produtos: calculos.append(1) or [p for _, p, _ in produtos]
+        self.assertEqual(self.db.catalogo.derivado('rotulos', rotulos), ["Pastel"])
+        self.assertEqual(self.db.catalogo.derivado('rotulos', rotulos), ["Pastel"])
+        self.assertEqual(len(calculos), 1)
+
+    def test_catalogo_percebe_escrita_de_outra_conexao(self):
+        """Testa a detecção (PRAGMA data_version) de gravações feitas fora do DatabaseManager"""
+        self.db.inserir_produto("Pastel", 10, 7.0)
+        self.assertEqual(self.db.catalogo.preco("Pastel"), 7.0)
+
+        with sqlite3.connect(self.db_path) as externo:
+            externo.execute("UPDATE estoque SET preco = 9.5 WHERE produto = 'Pastel'")
+            externo.execute("INSERT INTO estoque (produto, quantidade, preco) VALUES ('Coxinha', 5, 6.0)")
+        externo.close()
+        self.assertEqual(self.db.catalogo.preco("Pastel"), 9.5)
+        self.assertEqual(self.db.catalogo.preco("Coxinha"), 6.0)
+
+        # Também escritas pelo próprio pool sem passar pelos métodos do cadastro
+        self.db.execute_update("UPDATE estoque SET produto = 'Pastel de Carne' WHERE produto = 'Pastel'")
+        self.assertIsNone(self.db.catalogo.por_nome("Pastel"))
+        self.assertEqual(self.db.catalogo.preco("Pastel de Carne"), 9.5)
+
+    def test_catalogo_nao_recarrega_a_cada_venda(self):
+        """Testa que vendas pelo pool não recarregam o catálogo, mas gravações externas sim"""
+        self.db.inserir_produto("Pastel", 100, 7.0, "Salgados", "111")
+        self.assertEqual(self.db.catalogo.preco("Pastel"), 7.0)
+        cargas = self.db.catalogo.cargas
+        for _ in range(10):
+            self.db.vender("Pastel", 1, 7.0)
+            self.assertEqual(self.db.catalogo.por_codigo_barras("111")[1], "Pastel")
+        self.db.registrar_venda("Pastel", 1, 7.0)
+        self.assertEqual(self.db.catalogo.preco("Pastel"), 7.0)
+        self.assertEqual(self.db.catalogo.cargas, cargas)
+
+        # Ajuste manual de estoque é escrita no cadastro
+        self.db.atualizar_quantidade("Pastel", 50)
+        self.assertEqual(self.db.catalogo.preco("Pastel"), 7.0)
+        cargas += 1
+        self.assertEqual(self.db.catalogo.cargas, cargas)
+
+        with sqlite3.connect(self.db_path) as externo:
+            externo.execute("UPDATE estoque SET preco = 8.0 WHERE produto = 'Pastel'")
+        externo.close()
+        self.assertEqual(self.db.catalogo.preco("Pastel"), 8.0)
+        self.assertEqual(self.db.catalogo.cargas, cargas + 1)
+
+    def test_metricas_calculadas_uma_vez_por_versao(self):
+        """Testa que o cache de métricas só recalcula quando o banco muda"""
+        self.db.inserir_produto("Pastel", 10, 7.0)
+        hoje = datetime.now().strftime("%d/%m/%Y")
+        calculos = []
+        def receita(inicio, fim):
+            calculos.append((inicio, fim))
+            return self.db.obter_receita_periodo(inicio, fim)
+
+        for _ in range(2):
+            with self.db.metricas.rodada(), self.db.leitura_consistente():
+                self.assertEqual(self.db.metricas.obter('receita', (hoje, hoje), receita, hoje, hoje), 0)
+                self.assertEqual(self.db.metricas.obter('receita', (hoje, hoje), receita, hoje, hoje), 0)
+        self.assertEqual(len(calculos), 1)
+
+        # Venda pelo próprio banco: invalidação explícita
+        self.db.vender("Pastel", 2, 7.0)
+        self.assertEqual(self.db.metricas.obter('receita', (hoje, hoje), receita, hoje, hoje), 14.0)
+        self.assertEqual(len(calculos), 2)
+
+        # Gravação de outra conexão: percebida por PRAGMA data_version
+        with sqlite3.connect(self.db_path) as externo:
+            externo.execute("UPDATE historico_vendas SET valor_total = 20.0")
+        externo.close()
+        self.assertEqual(self.db.metricas.obter('receita', (hoje, hoje), receita, hoje, hoje), 20.0)
+        self.assertEqual(len(calculos), 3)
+
+    def test_metricas_expiram_pelo_ttl(self):
+        """Testa o vencimento das métricas pelo TTL mesmo sem gravações"""
+        calculos = []
+        def contar():
+            calculos.append(1)
+            return len(calculos)
+
+        with mock.patch('src.estoque.metricas.time.monotonic', return_value=100.0):
+            self.assertEqual(self.db.metricas.obter('teste', None, contar), 1)
+        with mock.patch('src.estoque.metricas.time.monotonic', return_value=100.0 + self.db.metricas.ttl - 1):
+            self.assertEqual(self.db.metricas.obter('teste', None, contar), 1)
+        with mock.patch('src.estoque.metricas.time.monotonic', return_value=100.0 + self.db.metricas.ttl):
+            self.assertEqual(self.db.metricas.obter('teste', None, contar), 2)
+
+        self.db.metricas.invalidar('teste')
+        self.assertEqual(self.db.metricas.obter('teste', None, contar), 3)
+
+    def test_snapshot_dashboard(self):
+        """Testa os números do dashboard lidos num mesmo snapshot"""
+        from datetime import date
+        self.db.inserir_produto("Pastel", 10, 7.0)
+        self.db.inserir_produto("Suco", 3, 5.0)
+        self.db.inserir_produto("Coxinha", 2, 6.0)
+        vendas = [("Pastel", 1, '2024-03-15 10:00:00'), ("Suco", 2, '2024-03-15 11:00:00'),
+                  ("Pastel", 1, '2024-03-08 12:00:00'), ("Suco", 1, '2024-03-02 12:00:00'),
+                  ("Pastel", 5, '2024-02-28 12:00:00')]
+        for produto, quantidade, data_iso in vendas:
+            venda_id = self.db.vender(produto, quantidade, 7.0 if produto == "Pastel" else 5.0)
+            self.db.execute_update("UPDATE historico_vendas SET data_iso = ? WHERE id = ?", (data_iso, venda_id))
+
+        snapshot = self.db.obter_snapshot_dashboard(5, date(2024, 3, 15))
+
+        self.assertEqual(snapshot.data, date(2024, 3, 15))
+        self.assertEqual((snapshot.receita_hoje, snapshot.vendas_hoje), (17.0, 2))
+        self.assertEqual(snapshot.produto_top, "Suco")
+        self.assertEqual(snapshot.receita_mes, 29.0)
+        self.assertEqual(snapshot.receita_semana_passada, 7.0)
+        self.assertEqual(snapshot.ticket_medio, 8.5)
+        self.assertAlmostEqual(snapshot.crescimento, (17.0 - 7.0) / 7.0 * 100)
+        # Estoque após as vendas: Pastel 3, Suco 0, Coxinha 2
+        self.assertEqual(snapshot.valor_estoque, 3 * 7.0 + 2 * 6.0)
+        self.assertEqual(snapshot.produtos_estoque_baixo, 3)
+
+        # Dia sem vendas nem base de comparação
+        vazio = self.db.obter_snapshot_dashboard(5, date(2024, 5, 20))
+        self.assertEqual((vazio.receita_hoje, vazio.vendas_hoje, vazio.produto_top), (0, 0, "Nenhum"))
+        self.assertEqual(vazio.ticket_medio, 0.0)
+        self.assertIsNone(vazio.crescimento)
+
+    def test_agregados_vendas_incrementais(self):
+        """Testa os totais do dashboard somando só as vendas novas"""
+        self.db.inserir_produto("Pastel", 20, 7.0)
+        self.db.inserir_produto("Suco", 20, 5.0)
+        self.db.vender("Pastel", 3, 7.0)
+        self.db.vender("Suco", 1, 5.0)
+        agregados = self.db.agregados_vendas
+
+        self.assertEqual(agregados.resumo_dia(), (26.0, 2, "Pastel"))
+        self.assertEqual(agregados.recalculos, 1)
+
+        # Vendas novas entram pela marca d'água, sem recalcular
+        self.db.vender("Suco", 4, 5.0)
+        self.db.registrar_venda("Avulso", 1, 3.0)
+        self.assertEqual(agregados.resumo_dia(), (49.0, 4, "Suco"))
+        self.assertEqual((agregados.recalculos, agregados.vendas_incrementais), (1, 2))
+        self.assertEqual(agregados.top_produtos(10), self.db.obter_top_produtos_receita(10))
+        self.assertEqual(agregados.cubo_horarios(), self.db.obter_cubo_horarios())
+
+        # Correção ou remoção de venda obriga a recalcular tudo
+        self.db.execute_update("UPDATE historico_vendas SET quantidade = 1, valor_total = 5.0 WHERE produto = 'Suco' AND quantidade = 4")
+        self.assertEqual(agregados.resumo_dia(), (34.0, 4, "Pastel"))
+        self.assertEqual(agregados.recalculos, 2)
+        self.db.execute_update("DELETE FROM historico_vendas WHERE produto = 'Avulso'")
+        self.assertEqual(agregados.top_produtos(10), self.db.obter_top_produtos_receita(10))
+        self.assertEqual(agregados.recalculos, 3)
+
+        # Renomear no estoque muda o nome exibido
+        self.db.execute_update("UPDATE estoque SET produto = 'Pastel de Queijo' WHERE produto = 'Pastel'")
+        self.assertEqual(agregados.top_produtos(1), [("Pastel de Queijo", 21.0, 3)])
+
+        # data_iso e produto_id preenchidos pelos triggers não contam como alteração
+        agora = datetime.now().strftime("%d/%m/%Y %H:%M:%S")
+        self.db.execute_insert("""INSERT INTO historico_vendas (produto, quantidade, preco_unitario, valor_total, data_hora)
+                                  VALUES ('Coxinha', 2, 4.0, 8.0, ?)""", (agora,))
+        self.db.inserir_produto("Coxinha", 10, 4.0)
+        self.assertEqual(agregados.top_produtos(10), self.db.obter_top_produtos_receita(10))
+        self.assertEqual(agregados.cubo_horarios(), self.db.obter_cubo_horarios())
+        self.assertEqual(agregados.recalculos, 3)
+
+    def test_busca_sem_fts5_usa_like(self):
+        """Testa o caminho com LIKE usado quando o SQLite não tem FTS5"""
+        self.db.inserir_produto("Pastel de Carne", 10, 7.0, "Salgados")
+        self.db.vender("Pastel de Carne", 1, 7.0)
+        self.db.busca_fts = False
+        self.assertEqual([p[0] for p in self.db.buscar_produtos("carne")], ["Pastel de Carne"])
+        self.assertEqual(len(self.db.buscar_vendas_por_produto("de Car")), 1)
+        self.assertEqual(self.db.resumo_historico({'produto': "Carne"})[0], 1)
+
+    def test_remover_produto_mantem_nome_da_venda(self):
+        """Testa que vendas de produto excluído ficam sem vínculo e com o nome gravado"""
+        self.db.inserir_produto("Pastel", 10, 7.0)
+        self.db.vender("Pastel", 2, 7.0)
+        self.db.remover_produto("Pastel")
+
+        self.assertEqual(self.db.execute_query("SELECT produto_id FROM historico_vendas"), [(None,)])
+        self.assertEqual(self.db.listar_historico()[0][1], "Pastel")
+        self.assertEqual(self.db.obter_estatisticas_financeiras(), [("Pastel", 2, 14.0, 7.0, 1)])
+
+    def test_cadastrar_produto_vincula_vendas_antigas(self):
+        """Testa que vendas sem cadastro são ligadas ao produto cadastrado depois"""
+        self.db.registrar_venda("Suco", 2, 5.0)
+        self.db.inserir_produto("Suco", 10, 5.0)
+        produto_id = self.db.execute_query("SELECT id FROM estoque WHERE produto = 'Suco'")[0][0]
+
+        self.assertEqual(self.db.execute_query("SELECT produto_id FROM historico_vendas"), [(produto_id,)])
+        incremental = self._vendas_diarias()
+        self.assertEqual(incremental[0][1], produto_id)
+        self.assertTrue(self.db.reconstruir_agregados())
+        self.assertEqual(incremental, self._vendas_diarias())
+
+    def test_init_pula_esquema_ja_versionado(self):
+        """Testa que reabrir um banco na versão atual não refaz a verificação de estrutura"""
+        self.assertEqual(self.db.execute_query("PRAGMA user_version")[0][0], migracoes.VERSAO_ESQUEMA)
+        self.db.fechar()
+        
+        self.db = DatabaseManager(self.db_path)
+        comandos = []
+        with self.db.pool.escrita() as conn:
+            conn.set_trace_callback(comandos.append)
+        self.db.init_database()
+        self.assertEqual([c for c in comandos if not c.startswith("PRAGMA")], [])
+        
+    def test_obter_banco_compartilha_instancia(self):
+        """Testa que controladores recebem a mesma instância por arquivo de banco"""
+        banco = obter_banco(self.db_path)
+        try:
+            self.assertIs(obter_banco(self.db_path), banco)
+            self.assertIs(EstoqueController(banco).db, banco)
+        finally:
+            banco.fechar()
+        self.assertIsNot(obter_banco(self.db_path), banco)
+        obter_banco(self.db_path).fechar()
+        
+    def test_metricas_do_dashboard_no_mesmo_snapshot(self):
+        """Testa que receita e número de vendas não divergem com venda no meio da atualização"""
+        self.db.inserir_produto("Produto A", 10, 5.0)
+        hoje = datetime.now().strftime("%d/%m/%Y")
+        self.db.vender("Produto A", 1, 5.0)
+        
+        with self.db.leitura_consistente():
+            receita = self.db.obter_receita_periodo(hoje, hoje)
+            venda = threading.Thread(target=self.db.vender, args=("Produto A", 2, 5.0))
+            venda.start()
+            venda.join()
+            vendas = self.db.contar_vendas_periodo(hoje, hoje)
+        self.assertEqual((receita, vendas), (5.0, 1))
+        self.assertEqual(self.db.contar_vendas_periodo(hoje, hoje), 2)
+        
+    def test_migracao_preenche_produto_id(self):
+        """Testa backfill de produto_id pelo nome em banco antigo (estoque sem id)"""
+        self.db.fechar()
+        os.remove(self.db_path)
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute("CREATE TABLE estoque (produto TEXT PRIMARY KEY, quantidade INTEGER NOT NULL DEFAULT 0)")
+            conn.execute("""CREATE TABLE historico_vendas (id INTEGER PRIMARY KEY AUTOINCREMENT,
+                            produto TEXT NOT NULL, quantidade INTEGER NOT NULL, data_hora TEXT NOT NULL)""")
+            conn.executemany("INSERT INTO estoque VALUES (?, ?)", [("Pastel", 5), ("Suco", 3)])
+            conn.executemany("INSERT INTO historico_vendas (produto, quantidade, data_hora) VALUES (?, ?, ?)",
+                             [("Suco", 1, '15/06/2023 09:05:00'), ("Extinto", 1, '15/06/2023 10:00:00')])
+        conn.close()
+
+        self.db = DatabaseManager(self.db_path)
+        vinculos = self.db.execute_query("""SELECT h.produto, e.produto FROM historico_vendas h
+                                            LEFT JOIN estoque e ON e.id = h.produto_id ORDER BY h.id""")
+        self.assertEqual(vinculos, [("Suco", "Suco"), ("Extinto", None)])
+        self.assertEqual(self.db.consultar_produto("Pastel"), 5)
+        self.assertEqual([linha[1] for linha in self._vendas_diarias()], [0, 2])
+
+
+class TestMigracoes(unittest.TestCase):
+    def setUp(self):
+        """Configurar diretório temporário (cada teste monta seu banco inicial)"""
+        self.temp_dir = tempfile.mkdtemp()
+        self.db_path = os.path.join(self.temp_dir, "test_migracoes.db")
+        self.db = None
+        
+    def tearDown(self):
+        """Limpeza após teste"""
+        if self.db is not None:
+            self.db.fechar()
+        for arquivo in os.listdir(self.temp_dir):
+            os.remove(os.path.join(self.temp_dir, arquivo))
+        os.rmdir(self.temp_dir)
+        
+    def _criar_banco(self, script, versao=0):
+        """Cria o banco inicial com o SQL informado e a versão de esquema indicada"""
+        conn = sqlite3.connect(self.db_path)
+        conn.executescript(script)
+        conn.execute(f"PRAGMA user_version = {versao}")
+        conn.commit()
+        conn.close()
+        
+    def _esquema_main_funcional(self):
+        """Banco gravado por versões antigas de main_funcional.py (total, data_venda em UTC)"""
+        return """
+            CREATE TABLE estoque (id INTEGER PRIMARY KEY AUTOINCREMENT, produto TEXT NOT NULL,
+                                  quantidade INTEGER NOT NULL DEFAULT 0, preco REAL NOT NULL DEFAULT 0.0,
+                                  categoria TEXT DEFAULT 'Geral',
+                                  data_cadastro TIMESTAMP DEFAULT CURRENT_TIMESTAMP);
+            CREATE TABLE historico_vendas (id INTEGER PRIMARY KEY AUTOINCREMENT, produto TEXT NOT NULL,
+                                           quantidade INTEGER NOT NULL, preco_unitario REAL NOT NULL,
+                                           total REAL NOT NULL,
+                                           data_venda TIMESTAMP DEFAULT CURRENT_TIMESTAMP);
+            INSERT INTO estoque (produto, quantidade, preco) VALUES ('Pastel', 5, 7.0);
+            INSERT INTO historico_vendas (produto, quantidade, preco_unitario, total, data_venda)
+            VALUES ('Pastel', 2, 7.0, 14.0, '2024-05-10 15:00:00'), ('Avulso', 1, 3.0, 3.0, NULL);
+        """
+        
+    def _momento_local(self, utc):
+        """Converte 'YYYY-MM-DD HH:MM:SS' em UTC para o horário local, como o SQLite"""
+        with sqlite3.connect(":memory:") as conn:
+            return conn.execute("SELECT DATETIME(?, 'localtime')", (utc,)).fetchone()[0]
+        
+    def test_banco_novo_chega_na_versao_atual(self):
+        """Testa que um banco vazio recebe todos os passos uma única vez"""
+        self.db = DatabaseManager(self.db_path)
+        self.assertEqual(self.db.execute_query("PRAGMA user_version")[0][0], migracoes.VERSAO_ESQUEMA)
+        self.assertEqual(migracoes.aplicar_migracoes(self.db.pool), [])
+        tabelas = {linha[0] for linha in self.db.execute_query("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        self.assertTrue({'estoque', 'historico_vendas', 'configuracoes', 'contas_abertas', 'caixa',
+                         'movimentacoes_caixa', 'backups', 'vendas_diarias'} <= tabelas)
+        
+    def test_versoes_em_ordem_crescente(self):
+        """Testa que os passos estão numerados em sequência"""
+        versoes = [versao for versao, _, _ in migracoes.MIGRACOES]
+        self.assertEqual(versoes, list(range(1, len(versoes) + 1)))
+        
+    def test_migra_historico_de_main_funcional(self):
+        """Testa a conversão de total/data_venda para o esquema canônico"""
+        self._criar_banco(self._esquema_main_funcional())
+        self.db = DatabaseManager(self.db_path)
+        
+        colunas = {linha[1] for linha in self.db.execute_query("PRAGMA table_info(historico_vendas)")}
+        self.assertNotIn('total', colunas)
+        self.assertNotIn('data_venda', colunas)
+        venda = self.db.execute_query(
+            "SELECT produto, valor_total, data_iso, produto_id FROM historico_vendas WHERE id = 1")[0]
+        produto_id = self.db.execute_query("SELECT id FROM estoque WHERE produto = 'Pastel'")[0][0]
+        self.assertEqual(venda, ('Pastel', 14.0, self._momento_local('2024-05-10 15:00:00'), produto_id))
+        self.assertIsNotNone(self.db.execute_query("SELECT data_hora FROM historico_vendas WHERE id = 2")[0][0])
+        
+        dia = self._momento_local('2024-05-10 15:00:00')[:10]
+        self.assertEqual(self.db.obter_receita_periodo(dia, dia), 14.0)
+        # Triggers dos agregados recriados sobre a tabela nova ('Avulso' sem data ficou com a de hoje)
+        self.db.registrar_venda("Pastel", 1, 7.0)
+        self.assertEqual(self.db.contar_vendas_periodo(datetime.now(), datetime.now()), 2)
+        
+    def test_indice_de_busca_preenchido_na_migracao(self):
+        """Testa que produtos já cadastrados entram no índice de busca criado pela migração"""
+        self._criar_banco(self._esquema_main_funcional())
+        self.db = DatabaseManager(self.db_path)
+        self.assertTrue(self.db.busca_fts)
+        self.assertEqual([p[0] for p in self.db.buscar_produtos("past")], ["Pastel"])
+        
+    def test_versao_1_reescrita_por_main_funcional_antigo(self):
+        """Testa que o passo 2 converte histórico recriado por main_funcional.py após a versão 1"""
+        pool = ConnectionPool(self.db_path)
+        self.assertEqual(migracoes.aplicar_migracoes(pool, ate=1), [1])
+        with pool.escrita() as conn:
+            conn.execute("INSERT INTO estoque (produto, quantidade, preco) VALUES ('Pastel', 5, 7.0)")
+            # O que main_funcional.py antigo fazia ao não achar data_venda
+            conn.execute("DROP TABLE historico_vendas")
+            conn.execute("""CREATE TABLE historico_vendas (id INTEGER PRIMARY KEY AUTOINCREMENT,
+                            produto TEXT NOT NULL, quantidade INTEGER NOT NULL, preco_unitario REAL NOT NULL,
+                            total REAL NOT NULL, data_venda TIMESTAMP DEFAULT CURRENT_TIMESTAMP)""")
+            conn.execute("INSERT INTO historico_vendas (produto, quantidade, preco_unitario, total) "
+                         "VALUES ('Pastel', 2, 7.0, 14.0)")
+        pool.fechar()
+        
+        self.db = DatabaseManager(self.db_path)
+        self.assertEqual(self.db.execute_query("PRAGMA user_version")[0][0], migracoes.VERSAO_ESQUEMA)
+        self.assertEqual(self.db.obter_receita_periodo(datetime.now(), datetime.now()), 14.0)
+        self.db.vender("Pastel", 1, 7.0)
+        self.assertEqual(self.db.obter_estatisticas_vendas(), [("Pastel", 3, 2)])
+        
+    def test_passos_tem_indices_proprios(self):
+        """Testa que os passos não seguem INDICES_GERENCIADOS e que juntos criam o conjunto atual"""
+        extra = ('idx_teste_extra', 'estoque', ('categoria',), False)
+        pool = ConnectionPool(self.db_path)
+        with mock.patch.object(indices, 'INDICES_GERENCIADOS', indices.INDICES_GERENCIADOS + [extra]):
+            migracoes.aplicar_migracoes(pool)
+        with pool.leitura() as conn:
+            criados = {linha[0] for linha in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+        pool.fechar()
+        self.assertNotIn('idx_teste_extra', criados)
+        self.assertTrue({indice[0] for indice in indices.INDICES_GERENCIADOS} <= criados)
+        
+    def test_passo_com_erro_e_desfeito(self):
+        """Testa que um passo que falha não grava nada nem avança a versão"""
+        self.db = DatabaseManager(self.db_path)
+        
+        def passo_com_erro(cursor):
+            cursor.execute("CREATE TABLE tabela_parcial (id INTEGER)")
+            raise sqlite3.OperationalError("falha simulada")
+            
+        proxima = migracoes.VERSAO_ESQUEMA + 1
+        with mock.patch.object(migracoes, 'MIGRACOES', migracoes.MIGRACOES + [(proxima, "teste", passo_com_erro)]):
+            with self.assertRaises(sqlite3.OperationalError):
+                migracoes.aplicar_migracoes(self.db.pool, ate=proxima)
+        
+        self.assertEqual(self.db.execute_query("PRAGMA user_version")[0][0], migracoes.VERSAO_ESQUEMA)
+        self.assertEqual(self.db.execute_query(
+            "SELECT name FROM sqlite_master WHERE name = 'tabela_parcial'"), [])
+
+
+class TestConnectionPool(unittest.TestCase):
+    def setUp(self):
+        """Configurar pool com banco temporário"""
+        self.temp_dir = tempfile.mkdtemp()
+        self.db_path = os.path.join(self.temp_dir, "test_pool.db")
+        self.pool = ConnectionPool(self.db_path, max_leitores=2, intervalo_verificacao=0)
+        with self.pool.escrita() as conn:
+            conn.execute("CREATE TABLE itens (nome TEXT)")
+        
+    def tearDown(self):
+        """Limpeza após teste"""
+        self.pool.fechar()
+        if os.path.exists(self.db_path):
+            os.remove(self.db_path)
+        os.rmdir(self.temp_dir)
+        
+    def test_reutiliza_conexao_leitura_na_mesma_thread(self):
+        """Testa que consultas seguidas usam a mesma conexão"""
+        with self.pool.leitura() as primeira:
+            pass
+        with self.pool.leitura() as segunda:
+            pass
+        self.assertIs(primeira, segunda)
+        
+    def test_conexao_leitura_por_thread(self):
+        """Testa afinidade das conexões de leitura por thread"""
+        conexoes = []
+        
+        def ler():
+            with self.pool.leitura() as conn:
+                conexoes.append(conn)
+                
+        thread = threading.Thread(target=ler)
+        thread.start()
+        thread.join()
+        
+        with self.pool.leitura() as principal:
+            self.assertIsNot(principal, conexoes[0])
+            
+    def test_recicla_leitores_de_threads_encerradas(self):
+        """Testa que o limite de leitores não é consumido por threads mortas"""
+        for _ in range(5):
+            thread = threading.Thread(target=lambda: self.pool.leitura().__enter__())
+            thread.start()
+            thread.join()
+        self.assertLessEqual(self.pool.estatisticas()['leitores_abertos'], 2)
+        
+    def test_leitura_alem_do_limite_usa_conexao_avulsa(self):
+        """Testa que uma thread a mais que max_leitores lê com uma conexão avulsa em vez de falhar"""
+        ocupadas = threading.Barrier(3)
+        liberar = threading.Event()
+        def segurar():
+            with self.pool.leitura(), self.pool.leitura_consistente():
+                ocupadas.wait()
+                liberar.wait()
+        threads = [threading.Thread(target=segurar) for _ in range(2)]
+        for thread in threads:
+            thread.start()
+        ocupadas.wait()
+        try:
+            with self.pool.leitura() as conn:
+                self.assertEqual(conn.execute("SELECT COUNT(*) FROM itens").fetchone()[0], 0)
+            with self.pool.leitura_consistente() as conn:
+                self.assertEqual(conn.execute("SELECT COUNT(*) FROM itens").fetchone()[0], 0)
+            estatisticas = self.pool.estatisticas()
+            self.assertEqual((estatisticas['leitores_abertos'], estatisticas['analiticos_abertos']), (2, 2))
+        finally:
+            liberar.set()
+            for thread in threads:
+                thread.join()
+
+    def test_escrita_faz_rollback_em_erro(self):
+        """Testa rollback da transação de escrita"""
+        with self.assertRaises(RuntimeError):
+            with self.pool.escrita() as conn:
+                conn.execute("INSERT INTO itens VALUES ('x')")
+                raise RuntimeError("falha")
+                
+        with self.pool.leitura() as conn:
+            self.assertEqual(conn.execute("SELECT COUNT(*) FROM itens").fetchone()[0], 0)
+            
+    def test_verificacao_substitui_conexao_quebrada(self):
+        """Testa que a verificação de saúde reabre conexões fechadas"""
+        with self.pool.leitura() as conn:
+            conn.close()
+        with self.pool.leitura() as conn:
+            self.assertEqual(conn.execute("SELECT COUNT(*) FROM itens").fetchone()[0], 0)
+
+    def test_perfil_desempenho_ativa_wal(self):
+        """Testa que o perfil padrão configura WAL e synchronous=NORMAL"""
+        with self.pool.leitura() as conn:
+            self.assertEqual(conn.execute("PRAGMA journal_mode").fetchone()[0], 'wal')
+            self.assertEqual(conn.execute("PRAGMA synchronous").fetchone()[0], 1)
+
+    def test_checkpoint_truncate_zera_wal(self):
+        """Testa que o checkpoint TRUNCATE esvazia o arquivo -wal"""
+        with self.pool.escrita() as conn:
+            conn.executemany("INSERT INTO itens VALUES (?)", [(str(i),) for i in range(100)])
+        self.assertGreater(self.pool.tamanho_wal(), 0)
+
+        ocupado, _, _ = self.pool.checkpoint("TRUNCATE")
+        self.assertEqual(ocupado, 0)
+        self.assertEqual(self.pool.tamanho_wal(), 0)
+
+    def test_conexao_analitica_somente_leitura(self):
+        """Testa que a conexão de leitura consistente recusa escritas"""
+        with self.pool.leitura_consistente() as conn:
+            with self.assertRaises(sqlite3.OperationalError):
+                conn.execute("INSERT INTO itens VALUES ('x')")
+            self.assertEqual(conn.execute("PRAGMA query_only").fetchone()[0], 1)
+        self.assertEqual(self.pool.estatisticas()['analiticos_abertos'], 1)
+
+    def test_leitura_consistente_ve_um_unico_snapshot(self):
+        """Testa que vendas confirmadas no meio da leitura não aparecem até o fim do bloco"""
+        contar = "SELECT COUNT(*) FROM itens"
+        with self.pool.leitura_consistente() as conn:
+            self.assertEqual(conn.execute(contar).fetchone()[0], 0)
+
+            inicio = datetime.now()
+            with self.pool.escrita() as escritor:
+                escritor.execute("INSERT INTO itens VALUES ('venda')")
+            # O leitor não atrasa o commit
+            self.assertLess((datetime.now() - inicio).total_seconds(), 1)
+
+            with self.pool.leitura() as leitor:
+                self.assertIs(leitor, conn)
+                self.assertEqual(leitor.execute(contar).fetchone()[0], 0)
+
+        with self.pool.leitura() as conn:
+            self.assertEqual(conn.execute(contar).fetchone()[0], 1)
+        with self.pool.leitura_consistente() as conn:
+            self.assertEqual(conn.execute(contar).fetchone()[0], 1)
+
+    def test_checkpoint_sem_espera_nao_trava_com_leitor_aberto(self):
+        """Testa que o checkpoint automático desiste em vez de esperar o relatório"""
+        with self.pool.leitura_consistente() as conn:
+            conn.execute("SELECT COUNT(*) FROM itens").fetchone()
+            with self.pool.escrita() as escritor:
+                escritor.executemany("INSERT INTO itens VALUES (?)", [(str(i),) for i in range(100)])
+
+            inicio = datetime.now()
+            ocupado, _, _ = self.pool.checkpoint("TRUNCATE", esperar=False)
+            self.assertEqual(ocupado, 1)
+            self.assertLess((datetime.now() - inicio).total_seconds(), 1)
+
+        with self.pool.escrita() as escritor:
+            self.assertEqual(escritor.execute("PRAGMA busy_timeout").fetchone()[0], 5000)
+
+    def test_versao_dados_ignora_commits_do_pool(self):
+        """Testa que só gravações de outras conexões mudam versao_dados()"""
+        versao = self.pool.versao_dados()
+        with self.pool.escrita() as conn:
+            conn.execute("INSERT INTO itens VALUES ('a')")
+        self.assertEqual(self.pool.versao_dados(), versao)
+
+        with sqlite3.connect(self.db_path) as externo:
+            externo.execute("INSERT INTO itens VALUES ('b')")
+        externo.close()
+        self.assertNotEqual(self.pool.versao_dados(), versao)
+
+    def test_checkpoint_modo_invalido(self):
+        """Testa rejeição de modo de checkpoint desconhecido"""
+        with self.assertRaises(ValueError):
+            self.pool.checkpoint("QUALQUER")
+
+
+class TestBancoAssincrono(unittest.TestCase):
+    def setUp(self):
+        """Configurar banco temporário com a fachada assíncrona"""
+        self.temp_dir = tempfile.mkdtemp()
+        self.db_path = os.path.join(self.temp_dir, "test_assincrono.db")
+        self.db = DatabaseManager(self.db_path)
+        self.db.inserir_produto("Produto A", 10, 5.0)
+        
+    def tearDown(self):
+        """Limpeza após teste"""
+        self.db.fechar()
+        if os.path.exists(self.db_path):
+            os.remove(self.db_path)
+        os.rmdir(self.temp_dir)
+        
+    def test_metodo_retorna_future_com_resultado(self):
+        """Testa que métodos do banco chamados pela fachada retornam Futures"""
+        futuro = self.db.assincrono.consultar_produto("Produto A")
+        self.assertEqual(futuro.result(timeout=5), 10)
+        
+    def test_consulta_roda_fora_da_thread_chamadora(self):
+        """Testa que a consulta é executada em thread de trabalho"""
+        futuro = self.db.assincrono.executar(threading.current_thread)
+        self.assertIsNot(futuro.result(timeout=5), threading.current_thread())
+        self.assertTrue(futuro.result().name.startswith("banco"))
+        
+    def test_erro_propagado_pelo_future(self):
+        """Testa que exceções da consulta chegam ao Future"""
+        futuro = self.db.assincrono.execute_query("SELECT * FROM tabela_inexistente")
+        with self.assertRaises(sqlite3.OperationalError):
+            futuro.result(timeout=5)
+            
+    def test_escrita_visivel_para_leitura_assincrona(self):
+        """Testa que escritas da thread principal aparecem nas consultas assíncronas"""
+        self.assertEqual(self.db.assincrono.listar_estoque().result(timeout=5), [("Produto A", 10)])
+        self.db.atualizar_quantidade("Produto A", 3)
+        self.assertEqual(self.db.assincrono.listar_estoque().result(timeout=5), [("Produto A", 3)])
+        
+    def test_fechar_encerra_threads(self):
+        """Testa que fechar o banco encerra a fachada assíncrona"""
+        fachada = self.db.assincrono
+        fachada.executar(lambda: None).result(timeout=5)
+        self.db.fechar()
+        with self.assertRaises(RuntimeError):
+            fachada.executar(lambda: None)
+            
+    def test_aguardar_no_tk_entrega_resultado(self):
+        """Testa a entrega do resultado pelo after() do widget, sem bloquear"""
+        class WidgetFalso:
+            def __init__(self):
+                self.agendados = []
+            def winfo_exists(self):
+                return True
+            def after(self, intervalo, funcao):
+                self.agendados.append(funcao)
+                
+        widget = WidgetFalso()
+        liberar = threading.Event()
+        resultados = []
+        futuro = self.db.assincrono.executar(lambda: liberar.wait(5) and "pronto")
+        
+        aguardar_no_tk(widget, futuro, resultados.append)
+        self.assertEqual(resultados, [])
+        self.assertEqual(len(widget.agendados), 1)
+        
+        liberar.set()
+        futuro.result(timeout=5)
+        widget.agendados.pop()()
+        self.assertEqual(resultados, ["pronto"])
+        
+    def test_aguardar_no_tk_ignora_widget_destruido(self):
+        """Testa que o resultado é descartado se a janela já foi fechada"""
+        class WidgetDestruido:
+            def winfo_exists(self):
+                return False
+                
+        chamadas = []
+        futuro = self.db.assincrono.executar(lambda: 1)
+        futuro.result(timeout=5)
+        aguardar_no_tk(WidgetDestruido(), futuro, chamadas.append, chamadas.append)
+        self.assertEqual(chamadas, [])
+
+
+class TestLeitorCodigoBarras(unittest.TestCase):
+    """Rajadas de teclas do scanner sem precisar de um display"""
+    
+    class CampoFalso:
+        def __init__(self, texto="", estado="normal"):
+            self.texto = texto
+            self.estado = estado
+        def cget(self, opcao):
+            return self.estado
+        def get(self):
+            return self.texto
+        def delete(self, inicio, fim):
+            self.texto = ""
+        def insert(self, indice, texto):
+            self.texto += texto
+    
+    class JanelaFalsa:
+        def __init__(self):
+            self.agendados = {}
+            self.tags = ('janela', 'Toplevel', 'all')
+        def bind_class(self, tag, evento, funcao):
+            pass
+        def bindtags(self, tags=None):
+            if tags is None:
+                return self.tags
+            self.tags = tags
+        def winfo_children(self):
+            return []
+        def after(self, intervalo, funcao):
+            chave = len(self.agendados) + 1
+            self.agendados[chave] = funcao
+            return chave
+        def after_cancel(self, chave):
+            self.agendados.pop(chave, None)
+    
+    def setUp(self):
+        """Configurar leitor sobre uma janela falsa"""
+        self.janela = self.JanelaFalsa()
+        self.lidos = []
+        self.leitor = LeitorCodigoBarras(self.janela, self.lidos.append)
+        self.campo = self.CampoFalso("2")
+        
+    def _teclar(self, texto, inicio=1000, intervalo=5, widget=None):
+        """Simula as teclas (como o Tk, o caractere aceito vai para o campo)"""
+        resultados = []
+        momento = inicio
+        for caractere in texto:
+            if caractere == "\n":
+                evento = mock.Mock(keysym='Return', char='\r', time=momento, widget=widget or self.campo)
+            else:
+                evento = mock.Mock(keysym=caractere, char=caractere, time=momento, widget=widget or self.campo)
+            resultado = self.leitor.processar_tecla(evento)
+            if resultado != "break" and caractere != "\n":
+                self.campo.insert(None, caractere)
+            resultados.append(resultado)
+            momento += intervalo
+        return resultados
+        
+    def test_instala_antes_dos_bindings_da_janela(self):
+        """Testa que o leitor recebe as teclas antes dos bindings da janela"""
+        self.assertTrue(self.janela.tags[0].startswith("LeitorCodigoBarras"))
+        
+    def test_rajada_com_enter_vira_leitura(self):
+        """Testa a leitura completa e a restauração do campo em foco"""
+        resultados = self._teclar("7891234\n")
+        self.assertEqual(self.lidos, ["7891234"])
+        self.assertEqual(resultados[-1], "break")
+        self.assertEqual(self.campo.texto, "2")
+        
+    def test_rajada_sem_enter_conclui_no_timer(self):
+        """Testa scanners configurados sem Enter no fim"""
+        self._teclar("78912")
+        self.assertEqual(len(self.janela.agendados), 1)
+        list(self.janela.agendados.values())[0]()
+        self.assertEqual(self.lidos, ["78912"])
+        
+    def test_digitacao_normal_nao_e_afetada(self):
+        """Testa que teclas lentas chegam ao campo e o Enter segue normalmente"""
+        resultados = self._teclar("15\n", intervalo=200)
+        self.assertEqual(resultados, [None, None, None])
+        self.assertEqual(self.campo.texto, "215")
+        self.assertEqual(self.lidos, [])
+        
+    def test_rajada_curta_devolve_teclas(self):
+        """Testa que duas teclas rápidas (digitação) não se perdem"""
+        self._teclar("12", intervalo=10)
+        self._teclar("\n", inicio=1500)
+        self.assertEqual(self.campo.texto, "212")
+        self.assertEqual(self.lidos, [])
+        
+    def test_varias_leituras_seguidas(self):
+        """Testa 50 leituras em sequência"""
+        for i in range(50):
+            self._teclar(f"{7890000 + i}\n", inicio=1000 + i * 300)
+        self.assertEqual(self.lidos, [str(7890000 + i) for i in range(50)])
+        self.assertEqual(self.campo.texto, "2")
+
+
+class TestAgendadorAtualizacao(unittest.TestCase):
+    """Coleta em segundo plano e agendamento sem precisar de um display"""
+    
+    class JanelaFalsa:
+        def __init__(self):
+            self.agendados = {}
+            self.proximo = 0
+            self.visivel = True
+        def after(self, intervalo, funcao):
+            self.proximo += 1
+            self.agendados[self.proximo] = (intervalo, funcao)
+            return self.proximo
+        def after_cancel(self, chave):
+            self.agendados.pop(chave, None)
+        def winfo_exists(self):
+            return True
+        def winfo_viewable(self):
+            return self.visivel
+        def executar_agendados(self, intervalo=None):
+            """Roda os callbacks agendados (só os do intervalo informado, se houver)"""
+            for chave, (atraso, funcao) in list(self.agendados.items()):
+                if intervalo is None or atraso == intervalo:
+                    del self.agendados[chave]
+                    funcao()
+    
+    def setUp(self):
+        """Configurar agendador com coletas controladas pelo teste"""
+        self.janela = self.JanelaFalsa()
+        self.futuros = []
+        self.aplicados = []
+        self.erros = []
+        self.agendador = AgendadorAtualizacao(
+            self.janela, self._executar, lambda: None, self.aplicados.append,
+            ao_falhar=self.erros.append, intervalo_ms=60000
+        )
+        
+    def _executar(self, funcao):
+        futuro = Future()
+        self.futuros.append(futuro)
+        return futuro
+        
+    def _concluir(self, resultado):
+        """Termina a coleta mais recente e entrega o resultado como faria o Tk"""
+        self.futuros[-1].set_result(resultado)
+        self.janela.executar_agendados(intervalo=50)
+        
+    def test_pedidos_durante_coleta_sao_agrupados(self):
+        """Testa que vários pedidos durante uma coleta geram uma única coleta seguinte"""
+        self.agendador.solicitar()
+        self.agendador.solicitar()
+        self.agendador.solicitar()
+        self.assertEqual(len(self.futuros), 1)
+        self.assertTrue(self.agendador.em_andamento)
+        
+        self._concluir("primeira")
+        self.assertEqual(self.aplicados, ["primeira"])
+        self.assertEqual(len(self.futuros), 2)
+        
+        self._concluir("segunda")
+        self.assertEqual(self.aplicados, ["primeira", "segunda"])
+        self.assertEqual(len(self.futuros), 2)
+        self.assertFalse(self.agendador.em_andamento)
+        
+    def test_atualizacao_automatica_apos_cada_coleta(self):
+        """Testa o timer agendado ao fim de cada atualização e pulado com a janela escondida"""
+        self.agendador.solicitar()
+        self._concluir(1)
+        timers = [atraso for atraso, _ in self.janela.agendados.values()]
+        self.assertEqual(timers, [60000])
+        
+        self.janela.visivel = False
+        self.janela.executar_agendados(intervalo=60000)
+        self.assertEqual(len(self.futuros), 1)
+        self.assertEqual([atraso for atraso, _ in self.janela.agendados.values()], [60000])
+        
+        self.janela.visivel = True
+        self.janela.executar_agendados(intervalo=60000)
+        self.assertEqual(len(self.futuros), 2)
+        self._concluir(2)
+        self.assertEqual(self.aplicados, [1, 2])
+        
+        self.agendador.configurar_intervalo(None)
+        self.assertEqual(self.janela.agendados, {})
+        
+    def test_falha_nao_interrompe_e_parar_descarta(self):
+        """Testa que uma coleta com erro segue o agendamento e que parar() descarta resultados"""
+        self.agendador.solicitar()
+        self.futuros[-1].set_exception(RuntimeError("banco ocupado"))
+        self.janela.executar_agendados(intervalo=50)
+        self.assertEqual([str(erro) for erro in self.erros], ["banco ocupado"])
+        self.assertEqual(len(self.janela.agendados), 1)
+        
+        self.agendador.solicitar()
+        self.agendador.parar()
+        self._concluir("tarde demais")
+        self.assertEqual(self.aplicados, [])
+        self.assertEqual(self.janela.agendados, {})
+        self.agendador.solicitar()
+        self.assertEqual(len(self.futuros), 2)
+
+
+class TestArquivamento(unittest.TestCase):
+    def setUp(self):
+        """Configurar banco com vendas de meses fechados e do mês atual"""
+        self.temp_dir = tempfile.mkdtemp()
+        self.db_path = os.path.join(self.temp_dir, "test_arquivo.db")
+        self.db = DatabaseManager(self.db_path)
+        self.db.inserir_produto("Produto A", 100, 2.0)
+        
+        self.hoje = datetime.now().strftime("%d/%m/%Y")
+        with self.db.pool.escrita() as conn:
+            conn.executemany(
+                """INSERT INTO historico_vendas (produto, quantidade, preco_unitario, valor_total, data_hora)
+                   VALUES ('Produto A', 1, 2.0, 2.0, ?)""",
+                [("10/01/2024 12:00:00",), ("11/01/2024 13:00:00",), ("05/02/2024 09:00:00",)]
+            )
+        self.db.vender("Produto A", 2, 2.0)
+        
+    def tearDown(self):
+        """Limpeza após teste"""
+        self.db.fechar()
+        shutil.rmtree(self.temp_dir)
+        
+    def _contar_principal(self):
+        return self.db.execute_query("SELECT COUNT(*) FROM historico_vendas")[0][0]
+        
+    def test_arquiva_meses_fechados(self):
+        """Testa que meses fechados saem do banco principal para um arquivo por mês"""
+        self.assertEqual(self.db.arquivar_historico(manter_meses=1), ['2024-01', '2024-02'])
+        self.assertEqual(self.db.listar_meses_arquivados(), ['2024-01', '2024-02'])
+        self.assertTrue(os.path.exists(os.path.join(self.temp_dir, "arquivo", "vendas_2024_01.db")))
+        self.assertEqual(self._contar_principal(), 1)
+        
+        # Nada novo para arquivar
+        self.assertEqual(self.db.arquivar_historico(manter_meses=1), [])
+        
+    def test_agregados_mantem_meses_arquivados(self):
+        """Testa que receita e contagem por período não mudam com o arquivamento"""
+        antes = (self.db.obter_receita_periodo("01/01/2024", "31/01/2024"),
+                 self.db.contar_vendas_periodo("01/01/2024", "31/01/2024"))
+        self.db.arquivar_historico(manter_meses=1)
+        depois = (self.db.obter_receita_periodo("01/01/2024", "31/01/2024"),
+                  self.db.contar_vendas_periodo("01/01/2024", "31/01/2024"))
+        self.assertEqual(antes, (4.0, 2))
+        self.assertEqual(depois, antes)
+        
+        # Receita de todo o período também continua contando os meses arquivados
+        self.assertEqual(self.db.obter_receita_total(), 10.0)
+        
+        # A reconstrução também lê os arquivos
+        self.assertTrue(self.db.reconstruir_agregados())
+        self.assertEqual(self.db.contar_vendas_periodo("01/01/2024", "31/01/2024"), 2)
+        self.assertEqual(self.db.contar_vendas_periodo(self.hoje, self.hoje), 1)
+        
+    def test_totais_em_memoria_cobrem_os_mesmos_meses(self):
+        """Testa que ranking e grade em memória descrevem só os meses ativos, também após vendas novas"""
+        agregados = self.db.agregados_vendas
+        self.db.arquivar_historico(manter_meses=1)
+        self.assertEqual(agregados.top_produtos(10), [("Produto A", 4.0, 2)])
+        self.assertEqual(agregados.top_produtos(10), self.db.obter_top_produtos_receita(10))
+        self.assertEqual(sum(map(sum, agregados.cubo_horarios())), 4.0)
+
+        # Atualização depois de uma venda: só a venda nova, sem recarregar o catálogo
+        cargas, recalculos = self.db.catalogo.cargas, agregados.recalculos
+        self.db.vender("Produto A", 1, 2.0)
+        self.assertEqual(agregados.top_produtos(10), [("Produto A", 6.0, 3)])
+        self.assertEqual(sum(map(sum, agregados.cubo_horarios())), 6.0)
+        self.assertEqual((self.db.catalogo.cargas, agregados.recalculos), (cargas, recalculos))
+
+    def test_listagem_com_arquivados(self):
+        """Testa que a listagem completa pode incluir os meses arquivados, mais recentes primeiro"""
+        self.db.arquivar_historico(manter_meses=1)
+        self.assertEqual(len(self.db.listar_historico_completo()), 1)
+        
+        vendas = self.db.listar_historico_completo(incluir_arquivados=True)
+        self.assertEqual([venda[5][:10] for venda in vendas][1:], ["05/02/2024", "11/01/2024", "10/01/2024"])
+        self.assertEqual(vendas[0][1], "Produto A")
+        self.assertEqual(len(self.db.listar_historico_completo(2, incluir_arquivados=True)), 2)
+        
+    def test_view_historico_completo(self):
+        """Testa a view de relatórios históricos com os meses anexados sob demanda"""
+        self.db.arquivar_historico(manter_meses=1)
+        with self.db.historico_completo() as conn:
+            self.assertEqual(conn.execute("SELECT COUNT(*) FROM historico_completo").fetchone()[0], 4)
+        with self.db.historico_completo("01/02/2024", "29/02/2024") as conn:
+            anexados = [linha[1] for linha in conn.execute("PRAGMA database_list")]
+            self.assertIn("arquivo_2024_02", anexados)
+            self.assertNotIn("arquivo_2024_01", anexados)
+            total = conn.execute(
+                "SELECT SUM(valor_total) FROM historico_completo WHERE data_iso >= '2024-02-01' AND data_iso < '2024-03-01'"
+            ).fetchone()[0]
+            self.assertEqual(total, 2.0)
+            
+    def test_venda_tardia_entra_no_arquivo_existente(self):
+        """Testa que arquivar de novo um mês já arquivado acrescenta sem duplicar"""
+        self.db.arquivar_historico(manter_meses=1)
+        with self.db.pool.escrita() as conn:
+            conn.execute("""INSERT INTO historico_vendas (produto, quantidade, preco_unitario, valor_total, data_hora)
+                            VALUES ('Produto A', 1, 2.0, 2.0, '20/01/2024 10:00:00')""")
+        self.assertEqual(self.db.arquivar_historico(manter_meses=1), ['2024-01'])
+        with self.db.historico_completo("01/01/2024", "31/01/2024") as conn:
+            self.assertEqual(conn.execute(
+                "SELECT COUNT(*) FROM historico_completo WHERE data_iso < '2024-02-01'"
+            ).fetchone()[0], 3)
+        self.assertEqual(self.db.contar_vendas_periodo("01/01/2024", "31/01/2024"), 3)
+
+
+class TestPlanoConsultas(unittest.TestCase):
+    """
+    Garante que as consultas do sistema não varrem tabelas grandes inteiras.
+
+    Cobre o SQL emitido pelos métodos do DatabaseManager e as instruções
+    escritas como texto literal em main_funcional.py (caixa, contas, backups).
+    Instruções que main_funcional.py monta em tempo de execução (a lista de
+    contas com filtro) ficam de fora.
+    """
+    
+    LIMITE_LINHAS = 100
+    
+    # Métodos de infraestrutura (não emitem consultas próprias)
+    INFRAESTRUTURA = {'init_database', 'get_connection', 'fechar', 'leitura_consistente',
+                      'historico_completo', 'listar_meses_arquivados',
+                      'execute_query', 'execute_update', 'execute_insert'}
+    
+    # Instruções sobre bancos anexados (o inspetor não os enxerga); ver TestArquivamento
+    USAM_ARQUIVOS = {'arquivar_historico'}
+    
+    # Listagens completas leem a tabela toda por definição
+    VARREDURAS_PERMITIDAS = {'listar_historico', 'listar_historico_completo', 'iter_historico',
+                             'reconstruir_agregados'}
+    
+    # Tamanho limitado (7 x 24 x produtos), não cresce com o histórico
+    TABELAS_TAMANHO_FIXO = {'vendas_semana_hora'}
+    
+    def setUp(self):
+        """Configurar banco temporário com volume acima do limite"""
+        self.temp_dir = tempfile.mkdtemp()
+        self.db_path = os.path.join(self.temp_dir, "test_plano.db")
+        self.db = DatabaseManager(self.db_path)
+        
+        with self.db.pool.escrita() as conn:
+            conn.executemany(
+                "INSERT INTO estoque (produto, quantidade, preco) VALUES (?, ?, ?)",
+                [(f"Produto {i}", i % 30, 1.0 + i) for i in range(300)]
+            )
+            conn.executemany(
+                """INSERT INTO historico_vendas (produto, quantidade, preco_unitario, valor_total, data_hora)
+                   VALUES (?, 1, 2.0, 2.0, ?)""",
+                [(f"Produto {i % 300}", f"{1 + i % 28:02d}/{1 + i % 12:02d}/2024 {i % 24:02d}:00:00")
+                 for i in range(1000)]
+            )
+        
+        self.sql_executado = []
+        with self.db.pool.leitura() as conn:
+            conn.set_trace_callback(self.sql_executado.append)
+        with self.db.pool.escrita() as conn:
+            conn.set_trace_callback(self.sql_executado.append)
+        # Consultas dentro de leitura_consistente() vão pela conexão analítica
+        self.db.pool._obter_leitor(analitico=True).set_trace_callback(self.sql_executado.append)
+            
+    def tearDown(self):
+        """Limpeza após teste"""
+        self.db.fechar()
+        shutil.rmtree(self.temp_dir)
+        
+    def _chamadas(self):
+        """Uma chamada representativa de cada método público do DatabaseManager"""
+        return {
+            'inserir_produto': ("Produto Novo", 5, 3.0),
+            'atualizar_quantidade': ("Produto 10", 7),
+            'atualizar_preco': ("Produto 10", 4.5),
+            'atualizar_produto_completo': ("Produto 10", 7, 4.5, "Geral", ""),
+            'consultar_produto': ("Produto 20",),
+            'consultar_produto_completo': ("Produto 20",),
+            'consultar_por_codigo_barras': ("7890000000001",),
+            'listar_estoque': (),
+            'listar_estoque_completo': (),
+            'buscar_produtos': ("produto 2",),
+            'remover_produto': ("Produto 30",),
+            'registrar_venda': ("Produto 40", 1, 2.0),
+            'registrar_vendas_lote': ([{'produto': "Produto 41", 'quantidade': 2, 'preco_unitario': 2.0}],),
+            'vender': ("Produto 42", 1, 2.0),
+            'vender_lote': ([{'produto': "Produto 43", 'quantidade': 1, 'preco_unitario': 2.0}],),
+            'listar_historico': (50,),
+            'listar_historico_completo': (50,),
+            'iter_historico': (),
+            'pagina_historico': (900, 50, {'vendedor': "Caixa 1", 'produto': "Produto 12"}),
+            'resumo_historico': ({'data_inicio': "01/03/2024", 'data_fim': "31/03/2024"},),
+            'buscar_vendas_por_produto': ("Produto 4",),
+            'obter_estatisticas_vendas': (),
+            'obter_estatisticas_financeiras': (),
+            'obter_receita_total': (),
+            'obter_configuracao': ("moeda",),
+            'atualizar_configuracao': ("moeda", "R$"),
+            'obter_receita_periodo': ("01/03/2024", "31/03/2024"),
+            'contar_vendas_periodo': ("01/03/2024", "31/03/2024"),
+            'contar_vendas_periodos': ([("01/03/2024", "31/03/2024"), ("15/03/2024", "15/03/2024")],),
+            'listar_vendas_periodo': ("01/03/2024", "31/03/2024"),
+            'obter_produto_mais_vendido': (),
+            'obter_valor_total_estoque': (),
+            'obter_snapshot_dashboard': (),
+            'contar_produtos_estoque_baixo': (5,),
+            'obter_vendas_ultimos_dias': (7,),
+            'obter_resumo_mensal': (6,),
+            'reconstruir_agregados': (),
+            'obter_top_produtos_receita': (10,),
+            'obter_vendas_por_horario': (),
+            'obter_cubo_horarios': ("01/03/2024", "31/03/2024", "Produto 3"),
+            'inicio_historico_ativo': (),
+            # Por último: move todo o histórico de teste (2024) para os arquivos
+            'arquivar_historico': (1,),
+        }
+        
+    def _varreduras_completas(self, conn, sql, params=()):
+        """Retorna as tabelas grandes lidas por inteiro (SCAN sem índice) pela instrução"""
+        tabelas = []
+        plano = [linha[-1] for linha in conn.execute("EXPLAIN QUERY PLAN " + sql, params).fetchall()]
+        # Subconsultas materializadas já foram agregadas; suas próprias leituras aparecem no plano
+        subconsultas = {m.group(1) for m in (re.fullmatch(r"(?:MATERIALIZE|CO-ROUTINE) (\w+)", passo)
+                                             for passo in plano) if m}
+        for passo in plano:
+            encontrado = re.fullmatch(r"SCAN (\w+)", passo)
+            if not encontrado:
+                continue
+            tabela = encontrado.group(1)
+            if tabela in self.TABELAS_TAMANHO_FIXO or tabela in subconsultas:
+                continue
+            try:
+                linhas = conn.execute(f"SELECT COUNT(*) FROM {tabela}").fetchone()[0]
+            except sqlite3.OperationalError:
+                linhas = None  # apelido ou subconsulta: tratar como tabela grande
+            if linhas is None or linhas > self.LIMITE_LINHAS:
+                tabelas.append(tabela)
+        return tabelas
+        
+    def test_todos_os_metodos_estao_cobertos(self):
+        """Testa que novos métodos do DatabaseManager entram nesta verificação"""
+        publicos = {nome for nome in dir(DatabaseManager)
+                    if not nome.startswith('_') and callable(getattr(DatabaseManager, nome))}
+        self.assertEqual(publicos - self.INFRAESTRUTURA, set(self._chamadas()))
+        
+    def test_nenhuma_consulta_varre_tabela_grande(self):
+        """Testa com EXPLAIN QUERY PLAN cada instrução emitida pelo sistema"""
+        problemas = []
+        with sqlite3.connect(self.db_path) as inspetor:
+            for metodo, argumentos in self._chamadas().items():
+                self.sql_executado.clear()
+                getattr(self.db, metodo)(*argumentos)
+                if metodo in self.VARREDURAS_PERMITIDAS or metodo in self.USAM_ARQUIVOS:
+                    continue
+                for sql in list(self.sql_executado):
+                    comando = sql.lstrip().split(None, 1)[0].upper()
+                    if comando not in ('SELECT', 'WITH', 'UPDATE', 'DELETE', 'INSERT'):
+                        continue
+                    for tabela in self._varreduras_completas(inspetor, sql):
+                        problemas.append(f"{metodo}: SCAN {tabela} em {' '.join(sql.split())}")
+        inspetor.close()
+        self.assertEqual(problemas, [])
+
+
+    def _sql_do_main_funcional(self):
+        """Instruções SQL escritas como texto literal em main_funcional.py (lido sem importar o Tk)"""
+        caminho = os.path.join(os.path.dirname(__file__), '..', 'main_funcional.py')
+        with open(caminho, encoding='utf-8') as arquivo:
+            arvore = ast.parse(arquivo.read())
+        instrucoes = []
+        for no in ast.walk(arvore):
+            if (isinstance(no, ast.Call) and isinstance(no.func, ast.Attribute)
+                    and no.func.attr in ('execute', 'executemany', 'read_sql_query') and no.args
+                    and isinstance(no.args[0], ast.Constant) and isinstance(no.args[0].value, str)):
+                instrucoes.append((no.lineno, no.args[0].value))
+        return instrucoes
+        
+    def test_consultas_do_main_funcional(self):
+        """Testa com EXPLAIN QUERY PLAN as consultas de caixa, contas e backups de main_funcional.py"""
+        with self.db.pool.escrita() as conn:
+            conn.executemany(
+                """INSERT INTO contas_abertas (cliente_nome, produto, quantidade, preco_unitario, total, pago)
+                   VALUES (?, ?, 1, 2.0, 2.0, ?)""",
+                [(f"Cliente {i % 50}", f"Produto {i % 300}", i % 2) for i in range(500)]
+            )
+            conn.executemany(
+                "INSERT INTO caixa (valor_inicial, funcionario, status) VALUES (100.0, 'Caixa 1', ?)",
+                [('ABERTO' if i == 199 else 'FECHADO',) for i in range(200)]
+            )
+            conn.executemany(
+                "INSERT INTO movimentacoes_caixa (caixa_id, tipo, valor, funcionario) VALUES (?, ?, 10.0, 'Caixa 1')",
+                [(1 + i % 200, ('VENDA', 'SANGRIA', 'REFORCO')[i % 3]) for i in range(1000)]
+            )
+            conn.executemany(
+                "INSERT INTO backups (nome_arquivo, caminho_arquivo, tipo) VALUES (?, ?, 'DADOS')",
+                [(f"backup_{i}.db", f"backups/backup_{i}.db") for i in range(200)]
+            )
+        
+        instrucoes = self._sql_do_main_funcional()
+        self.assertGreater(len(instrucoes), 20)
+        problemas = []
+        with sqlite3.connect(self.db_path) as inspetor:
+            for linha, sql in instrucoes:
+                # Sem WHERE a instrução lê a tabela toda por definição (exportação, listagens)
+                if not re.search(r"\bWHERE\b", sql, re.IGNORECASE):
+                    continue
+                for tabela in self._varreduras_completas(inspetor, sql, (None,) * sql.count('?')):
+                    problemas.append(f"main_funcional.py:{linha}: SCAN {tabela} em {' '.join(sql.split())}")
+        inspetor.close()
+        self.assertEqual(problemas, [])
+
 
 class TestEstoqueController(unittest.TestCase):
     def setUp(self):
@@ -124,16 +1612,13 @@ class TestEstoqueController(unittest.TestCase):
         self.temp_dir = tempfile.mkdtemp()
         self.db_path = os.path.join(self.temp_dir, "test_banco.db")
         
-        # Monkey patch para usar banco temporário
-        self.original_init = DatabaseManager.__init__
-        DatabaseManager.__init__ = lambda self, db_path=self.db_path: self.original_init(db_path)
-        
-        self.controller = EstoqueController()
+        # Banco temporário injetado no controller
+        self.db = DatabaseManager(self.db_path)
+        self.controller = EstoqueController(self.db)
         
     def tearDown(self):
         """Limpeza após teste"""
-        # Restaurar método original
-        DatabaseManager.__init__ = self.original_init
+        self.db.fechar()
         
         if os.path.exists(self.db_path):
             os.remove(self.db_path)
@@ -184,6 +1669,24 @@ class TestEstoqueController(unittest.TestCase):
         self.assertIn("Produto C", nomes_baixo)
         self.assertNotIn("Produto B", nomes_baixo)
         
+    def test_codigo_barras_repetido(self):
+        """Testa que o controlador recusa o código de barras de outro produto"""
+        self.controller.adicionar_produto("Pastel", 5, 7.0, codigo_barras="789")
+        with self.assertRaises(ValueError):
+            self.controller.adicionar_produto("Coxinha", 5, 6.0, codigo_barras="789")
+        self.assertTrue(self.controller.atualizar_produto_completo("Pastel", 5, 8.0, "Salgados", "789"))
+        self.assertEqual(self.controller.consultar_codigo_barras("789")[1:], ("Pastel", 8.0))
+        
+    def test_consultar_preco_pelo_catalogo(self):
+        """Testa o preço servido pelo catálogo em memória"""
+        self.controller.adicionar_produto("pastel", 5, 7.0)
+        self.assertEqual(self.controller.consultar_preco(" Pastel "), 7.0)
+        self.controller.atualizar_produto("Pastel", 5, 8.5)
+        self.assertEqual(self.controller.consultar_preco("pastel"), 8.5)
+        with mock.patch.object(self.db, 'execute_query', side_effect=AssertionError("consultou o banco")):
+            self.assertEqual(self.controller.consultar_preco("Pastel"), 8.5)
+        self.assertIsNone(self.controller.consultar_preco(""))
+        
     def test_buscar_produtos(self):
         """Testa busca de produtos"""
         self.controller.adicionar_produto("Hambúrguer Tradicional", 5)
@@ -22,16 +22,13 @@ class TestHistoricoController(unittest.TestCase):
         self.temp_dir = tempfile.mkdtemp()
         self.db_path = os.path.join(self.temp_dir, "test_banco.db")
         
-        # Monkey patch para usar banco temporário
-        self.original_init = DatabaseManager.__init__
-        DatabaseManager.__init__ = lambda self, db_path=self.db_path: self.original_init(db_path)
-        
-        self.controller = HistoricoController()
+        # Banco temporário injetado no controller
+        self.db = DatabaseManager(self.db_path)
+        self.controller = HistoricoController(self.db)
         
     def tearDown(self):
         """Limpeza após teste"""
-        # Restaurar método original
-        DatabaseManager.__init__ = self.original_init
+        self.db.fechar()
         
         if os.path.exists(self.db_path):
             os.remove(self.db_path)
@@ -110,6 +107,17 @@ class TestHistoricoController(unittest.TestCase):
         mais_vendido = self.controller.produto_mais_vendido()
         self.assertIsNone(mais_vendido)
         
+    def test_pagina_historico(self):
+        """Testa paginação do histórico pelo controller"""
+        self.controller.registrar_venda("Produto A", 1, vendedor="Ana")
+        self.controller.registrar_venda("Produto B", 2, vendedor="Bia")
+        self.controller.registrar_venda("Produto A", 3, vendedor="Bia")
+        
+        pagina = self.controller.pagina_historico(tamanho=2, vendedor="Bia")
+        self.assertEqual([venda[2] for venda in pagina], [3, 2])
+        self.assertEqual(self.controller.pagina_historico(pagina[-1][0], 2, vendedor="Bia"), [])
+        self.assertEqual(len(self.controller.pagina_historico(produto="Produto A")), 2)
+        
     def test_relatorio_vendas(self):
         """Testa geração de relatório de vendas"""
         self.controller.registrar_venda("Produto A", 2)
@@ -122,6 +130,25 @@ class TestHistoricoController(unittest.TestCase):
         self.assertIsNotNone(relatorio['produto_mais_vendido'])
         self.assertIsInstance(relatorio['estatisticas_produtos'], list)
 
+    def test_relatorio_vendas_por_periodo(self):
+        """Testa os totais por período e o mais vendido do relatório"""
+        self.controller.registrar_venda("Produto A", 2, 5.0)
+        self.controller.registrar_venda("Produto B", 3, 4.0)
+        self.controller.registrar_venda("Produto A", 4, 5.0)
+        # Venda antiga: fora do mês atual (os agregados acompanham pelo trigger)
+        self.db.execute_update(
+            "UPDATE historico_vendas SET data_iso = DATETIME(data_iso, '-40 days') WHERE id = 3"
+        )
+
+        relatorio = self.controller.relatorio_vendas()
+
+        self.assertEqual(relatorio['total_vendas'], 3)
+        self.assertEqual(relatorio['total_itens'], 9)
+        self.assertEqual((relatorio['vendas_hoje'], relatorio['vendas_semana'], relatorio['vendas_mes']), (2, 2, 2))
+        self.assertEqual(relatorio['produto_mais_vendido'],
+                         {'produto': "Produto A", 'total_vendido': 6, 'num_vendas': 2})
+        self.assertEqual(relatorio['estatisticas_produtos'], [("Produto A", 6, 2), ("Produto B", 3, 1)])
+
 
 class TestExportController(unittest.TestCase):
     def setUp(self):
@@ -129,11 +156,9 @@ class TestExportController(unittest.TestCase):
         self.temp_dir = tempfile.mkdtemp()
         self.db_path = os.path.join(self.temp_dir, "test_banco.db")
         
-        # Monkey patch para usar banco temporário
-        self.original_init = DatabaseManager.__init__
-        DatabaseManager.__init__ = lambda self, db_path=self.db_path: self.original_init(db_path)
-        
-        self.controller = ExportController()
+        # Banco temporário injetado no controller
+        self.db = DatabaseManager(self.db_path)
+        self.controller = ExportController(self.db)
         
         # Adicionar alguns dados de teste
         self.controller.db.inserir_produto("Pizza", 10)
@@ -142,8 +167,7 @@ class TestExportController(unittest.TestCase):
         
     def tearDown(self):
         """Limpeza após teste"""
-        # Restaurar método original
-        DatabaseManager.__init__ = self.original_init
+        self.db.fechar()
         
         # Limpar arquivos temporários
         import glob
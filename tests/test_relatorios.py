@@ -0,0 +1,200 @@
+"""
+Testes unitários para os gráficos do dashboard
+"""
+
+import unittest
+import os
+import sys
+import gc
+import shutil
+import tempfile
+import tracemalloc
+import warnings
+import weakref
+from unittest import mock
+
+# Adicionar src ao path para imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+from src.estoque.database import DatabaseManager
+from src.relatorios.dashboard import DashboardWindow
+from src.relatorios.graficos import GraficoHorarios, GraficoMensal, GraficoProdutos, GraficoVendasDiarias
+
+
+CORES = {'receita': '#2E8B57', 'vendas': '#4169E1', 'produtos': '#FF8C00',
+         'estoque': '#DC143C', 'crescimento': '#9370DB'}
+
+
+class CanvasRastreado(FigureCanvasAgg):
+    """FigureCanvasAgg que anota os fundos copiados (memória do Agg, invisível ao tracemalloc)"""
+
+    def __init__(self, figura):
+        super().__init__(figura)
+        self.fundos = []
+
+    def copy_from_bbox(self, bbox):
+        fundo = super().copy_from_bbox(bbox)
+        self.fundos.append(weakref.ref(fundo))
+        return fundo
+
+    def fundos_vivos(self):
+        return sum(1 for fundo in self.fundos if fundo() is not None)
+
+
+def dados_da_rodada(rodada):
+    """Dados de uma atualização do dashboard: valores e quantidade de itens se repetem a cada 4 rodadas"""
+    ciclo = rodada % 4
+    dias = 5 + ciclo % 2
+    produtos = 6 + ciclo
+    return {
+        'vendas_diarias': [(f"{dia:02d}/03/2024", 100.0 + (ciclo * 7 + dia) % 40, 10 + (ciclo + dia) % 9)
+                           for dia in range(1, dias + 1)],
+        'produtos': [(f"Produto {i}", 300.0 - i * 20 + ciclo * 3, 40 - i + ciclo % 3)
+                     for i in range(produtos)],
+        'horarios': [[float((dia * hora + ciclo) % 17) for hora in range(24)] for dia in range(7)],
+        'mensal': [{'mes': f"{mes:02d}/2024", 'receita': 500.0 + mes * 10 + ciclo * 4, 'vendas': 40 + mes}
+                   for mes in range(1, 7)],
+    }
+
+
+class TestGraficosDashboard(unittest.TestCase):
+    def setUp(self):
+        """Ignorar avisos de emojis ausentes na fonte dos títulos"""
+        warnings.simplefilter("ignore", UserWarning)
+
+    def tearDown(self):
+        """Restaurar avisos"""
+        warnings.resetwarnings()
+
+    def test_memoria_estavel_com_desenho_a_cada_atualizacao(self):
+        """Testa que atualizações desenhadas reaproveitam figuras e artistas sem acumular memória"""
+        # dpi baixo só para o teste ser rápido: o caminho de desenho é o mesmo da janela
+        graficos = {
+            'vendas_diarias': GraficoVendasDiarias(CORES, dpi=10),
+            'produtos': GraficoProdutos(CORES, dpi=10),
+            'horarios': GraficoHorarios(CORES, dpi=10),
+            'mensal': GraficoMensal(CORES, dpi=10),
+        }
+        for grafico in graficos.values():
+            grafico.conectar(CanvasRastreado(grafico.figura))
+
+        def atualizar(rodadas):
+            for rodada in rodadas:
+                dados = dados_da_rodada(rodada)
+                for chave, grafico in graficos.items():
+                    # Desenho completo (tight_layout, cópia do fundo) ou blit
+                    grafico.atualizar(dados[chave])
+                    # Como o Tk ao expor a janela: desenho completo a cada rodada
+                    grafico.canvas.draw()
+
+        # Aquecimento: caches internos do matplotlib preenchidos com as 4 variações dos dados
+        atualizar(range(8))
+        artistas = {chave: len(grafico.figura.findobj()) for chave, grafico in graficos.items()}
+        renderizadores = {chave: grafico.canvas.get_renderer() for chave, grafico in graficos.items()}
+
+        # O custo do desenho é o layout dos textos, não os pixels: mesmo com
+        # dpi baixo, 1.000 rodadas levariam minutos. Três ciclos de dados
+        # bastam, já que um vazamento cresce a cada desenho. O primeiro ciclo
+        # rastreado só troca objetos criados antes do rastreio e não entra na conta.
+        gc.collect()
+        tracemalloc.start()
+        try:
+            atualizar(range(8, 12))
+            gc.collect()
+            antes = tracemalloc.get_traced_memory()[0]
+            atualizar(range(12, 20))
+            gc.collect()
+            depois = tracemalloc.get_traced_memory()[0]
+        finally:
+            tracemalloc.stop()
+
+        # Um fundo (copy_from_bbox) ou figura retidos por desenho somariam dezenas de KB cada
+        self.assertLess(depois - antes, 32 * 1024)
+        for chave, grafico in graficos.items():
+            self.assertGreaterEqual(grafico.desenhos_completos, 20)
+            # Só o fundo atual continua vivo e o buffer do Agg é sempre o mesmo
+            self.assertGreaterEqual(len(grafico.canvas.fundos), 20)
+            self.assertLessEqual(grafico.canvas.fundos_vivos(), 1)
+            self.assertIs(grafico.canvas.get_renderer(), renderizadores[chave])
+        self.assertEqual({chave: len(grafico.figura.findobj()) for chave, grafico in graficos.items()},
+                         artistas)
+
+    def test_blit_quando_eixos_nao_mudam(self):
+        """Testa o redesenho só dos dados quando limites e rótulos se mantêm"""
+        grafico = GraficoVendasDiarias(CORES, dpi=20)
+        grafico.conectar(FigureCanvasAgg(grafico.figura))
+        dias = [f"{dia:02d}/03/2024" for dia in range(1, 8)]
+
+        grafico.atualizar([(dia, 100.0, 10) for dia in dias])
+        self.assertEqual((grafico.desenhos_completos, grafico.blits), (1, 0))
+
+        # Valores novos dentro da mesma escala: só blit
+        grafico.atualizar([(dia, 104.0, 9) for dia in dias])
+        self.assertEqual((grafico.desenhos_completos, grafico.blits), (1, 1))
+
+        # Receita passou do teto do eixo: desenho completo
+        grafico.atualizar([(dia, 900.0, 9) for dia in dias])
+        self.assertEqual((grafico.desenhos_completos, grafico.blits), (2, 1))
+
+        # Virada do dia: rótulos do eixo X mudam
+        grafico.atualizar([(dia, 900.0, 9) for dia in dias[1:] + ["08/03/2024"]])
+        self.assertEqual((grafico.desenhos_completos, grafico.blits), (3, 1))
+
+    def test_itens_que_sobram_ficam_escondidos(self):
+        """Testa barras e rótulos reservados além dos dados disponíveis"""
+        grafico = GraficoProdutos(CORES)
+        grafico.atualizar([("Pastel", 70.0, 10), ("Um nome de produto bem comprido", 20.0, 4)])
+
+        visiveis = [barra.get_visible() for barra in grafico.barras_receita]
+        self.assertEqual(visiveis, [True, True] + [False] * 8)
+        self.assertEqual(grafico.barras_receita[0].get_width(), 70.0)
+        self.assertEqual(grafico.valores_quantidade[1].get_text(), "4")
+        self.assertFalse(grafico.valores_quantidade[2].get_visible())
+        self.assertEqual([rotulo.get_text() for rotulo in grafico.ax_receita.get_yticklabels()],
+                         ["Pastel", "Um nome de produt..."])
+
+
+if __name__ == '__main__':
+    unittest.main()
+
+
+class TestColetaDashboard(unittest.TestCase):
+    def setUp(self):
+        """Dashboard sem janela sobre um banco temporário (a coleta não toca em widgets)"""
+        self.temp_dir = tempfile.mkdtemp()
+        self.db = DatabaseManager(os.path.join(self.temp_dir, "test_dashboard.db"))
+        self.db.inserir_produto("Pastel", 10, 7.0)
+        self.db.vender("Pastel", 2, 7.0)
+        self.dashboard = DashboardWindow.__new__(DashboardWindow)
+        self.dashboard.db = self.db
+        self.dashboard._filtro_horarios = (None, None)
+
+    def tearDown(self):
+        """Limpeza após teste"""
+        self.db.fechar()
+        shutil.rmtree(self.temp_dir)
+
+    def test_coleta_so_o_grafico_da_aba_visivel(self):
+        """Testa que as consultas dos gráficos das abas escondidas não rodam na atualização"""
+        self.dashboard._chave_visivel = 'produtos'
+        with mock.patch.object(self.db, 'obter_vendas_ultimos_dias') as diarias, \
+             mock.patch.object(self.db, 'obter_resumo_mensal') as mensal, \
+             mock.patch.object(self.db, 'obter_cubo_horarios') as cubo, \
+             mock.patch.object(self.db.agregados_vendas, 'cubo_horarios') as cubo_em_memoria:
+            dados = self.dashboard.coletar_dados()
+        for consulta in (diarias, mensal, cubo, cubo_em_memoria):
+            consulta.assert_not_called()
+        self.assertEqual(dados['produtos'], [("Pastel", 14.0, 2)])
+        self.assertFalse({'vendas_diarias', 'horarios', 'mensal'} & set(dados))
+        self.assertEqual(dados['snapshot'].vendas_hoje, 1)
+
+    def test_aba_mostrada_busca_os_proprios_dados(self):
+        """Testa que com a aba mensal visível só o resumo mensal é coletado, do mesmo cache usado ao trocar de aba"""
+        self.dashboard._chave_visivel = 'mensal'
+        with mock.patch.object(self.db.agregados_vendas, 'top_produtos') as produtos:
+            dados = self.dashboard.coletar_dados()
+            self.assertEqual(self.dashboard._dados_grafico('mensal', (None, None)), dados['mensal'])
+        produtos.assert_not_called()
+        self.assertEqual(dados['mensal'][-1]['receita'], 14.0)